@@ -1,19 +1,52 @@
-from flask import Flask, jsonify, request, send_from_directory, redirect, Response
-import queue
+from flask import Flask, jsonify, request, redirect, Response, g
+from flask.json.provider import DefaultJSONProvider
+import functools
+import hmac
+import json
+import os
+import threading
 import time
+from typing import Any, Dict, NamedTuple
 
+import audience
 import database as db
 import calc
+import assets
+import catalogue as catalogue_mod
+import codec
+import tiles
 from defs import *
 import lobby as lb
+import lockstats
+import metrics
+from events import hub, format_event, parse_event
+from scheduler import phases
+import store
+
+try:
+    from flask_sock import Sock  # optional: enables the /ws WebSocket game channel
+except ImportError:
+    Sock = None
 
 db.init_database()
+assets.index_static()
+
+class CodecJSONProvider(DefaultJSONProvider):
+    # jsonify through the pluggable encoder (see codec.py); payloads are plain JSON data
+    def dumps(self, obj, **kwargs) -> str:
+        return codec.dumps(obj)
 
 app = Flask(__name__, static_folder="static", static_url_path="")
+app.json = CodecJSONProvider(app)
+sock = Sock(app) if Sock is not None else None
 
 # Global debug flag (can be enabled via command-line arg or environment)
 DEBUG_MODE: bool = False
 
+# POST /admin/catalogue/reload only reloads the process that serves it; serve.py turns it off
+# when it runs several workers (they reload through --watch-catalogue instead)
+CATALOGUE_RELOAD_ENDPOINT: bool = True
+
 def dprint(*args, **kwargs):
     if DEBUG_MODE:
         print(*args, **kwargs)
@@ -21,10 +54,10 @@ def dprint(*args, **kwargs):
         pass
     
 def end_game_condition(room_id: str, state: dict):
-    blue_hp = db.get_team_hp(Team.BLUE, room_id)
-    red_hp = db.get_team_hp(Team.RED, room_id)
+    blue_hp = state["hp"]["blue"]
+    red_hp = state["hp"]["red"]
     
-    has_next_round = db.has_next_round(room_id) 
+    has_next_round = state["has_next"]
     
     hp_exhausted = blue_hp <= 0 or red_hp <= 0
     round_exhausted = not has_next_round and not hp_exhausted
@@ -43,57 +76,173 @@ def end_game_condition(room_id: str, state: dict):
     else:
         pass        
 
-def apply_damage(room_id: str, state: dict):
-    dmg_mult = state["dmg_mult"]
+def round_damage(snap: db.RoomSnapshot, answer_coord: Optional[Coord]) -> Tuple[dict, dict]:
+    # per-team damage and distance of the snapshot's round (None for a team without a guess)
+    dmg_mult = snap.dmg_mult
     damage = {}
     distance = {}
     for team in [Team.BLUE, Team.RED]:
-        coord = db.get_team_coord(team, room_id)
+        coord = snap.team_coord[team.slot]
         if coord is not None:
-            mult = db.get_dmg_mult(room_id)
-            dmg = calc.compute_scaled_damage(coord, state.get("answer_coord"), mult)
+            dmg = calc.compute_scaled_damage(coord, answer_coord, dmg_mult)
             damage[team.value.lower()] = dmg
             distance[team.value.lower()] = (dmg / dmg_mult) if dmg_mult else None
         else:
             damage[team.value.lower()] = None
             distance[team.value.lower()] = None
-    state["damage"] = damage
-    state["distance"] = distance
-    # Apply HP once per round after reveal
-    room = db.get_room(room_id)
-    if room.last_damage_applied_round != state["round"]:
-        # subtract hp for each team based on computed damage
-        for team in [Team.BLUE, Team.RED]:
-            dmg = damage.get(team.value.lower())
-            if dmg is None:
-                continue
-            current_hp = db.get_team_hp(team, room_id)
-            db.set_team_hp(team, current_hp - dmg, room_id)
-        room.last_damage_applied_round = state["round"]
-    
-    state["hp"]["blue"] = db.get_team_hp(Team.BLUE, room_id)
-    state["hp"]["red"] = db.get_team_hp(Team.RED, room_id)
-    
-    # judge end_game_condition
-    end_game_condition(room_id, state)
+    return damage, distance
 
-    
-    
+def needs_damage(snap: db.RoomSnapshot) -> bool:
+    return snap.answer_revealed and snap.last_damage_applied_round != snap.round_index + 1
 
-# Simple SSE event queues per room
-event_queues: dict[str, list[queue.Queue]] = {}
-
-def event_stream(q: "queue.Queue[str]"):
-    while True:
-        msg = q.get()  # blocking
-        yield f"data: {msg}\n\n"
+def apply_damage(room_id: str, snap: db.RoomSnapshot, team: Optional[Team], answer_coord: Optional[Coord]) -> db.RoomSnapshot:
+    # subtract the revealed round's damage from HP (once per round, whoever gets here first) and
+    # return a snapshot taken afterwards; the view is then built from that snapshot alone
+    damage, _ = round_damage(snap, answer_coord)
+    to_apply = {team: damage[team.value.lower()] for team in [Team.BLUE, Team.RED]
+                if damage[team.value.lower()] is not None}
+    db.apply_round_damage(snap.round_index + 1, to_apply, room_id)
+    return db.get_snapshot(room_id, team)
 
+# SSE fan-out per room (see events.py); subscribers are dropped on disconnect and room teardown
 def broadcast(room_id: str, msg: str):
-    for q in event_queues.get(room_id, []):
+    if msg == "reveal" and audience.book(room_id) is not None:
+        score_audience(room_id)  # score the audience while the reveal goes out
+    if sse_push_state and msg in ("reveal", "next_round"):
+        push_state(room_id)
+    else:
+        hub.publish(room_id, msg)
+
+def push_state(room_id: str):
+    # serialize each subscribed team's view once and send it as a `state` event;
+    # the event id is that view's ETag so clients can keep revalidating /api/state
+    for team_value in hub.teams(room_id):
         try:
-            q.put(msg)
-        except Exception:
-            pass
+            data, etag = build_state_json(room_id, team_value)
+        except RuntimeError as e:
+            dprint(f"[WARN] push_state failed for room {room_id}: {e}")
+            return
+        hub.publish(room_id, data, event="state", event_id=etag, team=team_value)
+
+# Server-side phase deadlines (see scheduler.py): rooms progress even if no client is left to
+# send the timeout actions, so round timing is decided here rather than in the browser.
+def on_phase_deadline(room_id: str, token: tuple):
+    try:
+        if lb.room_status(room_id) == lb.RoomStatus.ENDED or db.get_phase_token(room_id) != token:
+            return  # the room moved on before the deadline
+        expire_phase(room_id, token)
+    except db.RoomNotFound:
+        pass  # reaped in the meantime
+
+def expire_phase(room_id: str, token: tuple):
+    round_index, phase, _ = token
+    if phase == "guess":
+        if db.expire_guess_phase(token, default_guess, room_id):
+            dprint(f"DEADLINE: auto-submitted round {round_index + 1} in room {room_id}")
+            broadcast(room_id, "reveal")
+    else:
+        # building the state applies this round's damage and detects the end of the game
+        state, _ = build_state(room_id, None)
+        if "winner" in state:
+            return
+        if db.advance_round(round_index, room_id):
+            dprint(f"DEADLINE: auto-advanced room {room_id} past round {round_index + 1}")
+            broadcast(room_id, "next_round")
+
+phases.handler = on_phase_deadline
+
+@app.errorhandler(db.RoomNotFound)
+def room_not_found(e):
+    # unknown (or already reaped) room ids never allocate a room
+    return jsonify({"error": "Room not found"}), 404
+
+# Request metrics (see metrics.py): one histogram sample and one counter bump per response,
+# both in the handling thread's own counters.
+@app.before_request
+def start_timer():
+    g.started_at = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    # a WebSocket route returns only when the session ends; its duration is not a latency
+    if "started_at" in g and not rule.startswith("/ws/"):
+        route = (("route", rule), ("method", request.method))
+        metrics.observe("ggg_http_request_duration_seconds", time.perf_counter() - g.started_at, route)
+        metrics.inc("ggg_http_requests_total", 1, route + (("status", str(response.status_code)),))
+    return response
+
+metrics.define_gauge("ggg_sse_subscribers", "Open event stream subscriptions (SSE and WebSocket).")
+metrics.define_gauge("ggg_phase_deadlines_pending", "Phase deadlines waiting in the scheduler.")
+metrics.add_collector(lambda: [
+    ("ggg_sse_subscribers", (), hub.subscriber_count()),
+    ("ggg_phase_deadlines_pending", (), phases.pending()),
+])
+
+@app.route("/metrics")
+def metrics_endpoint():
+    # Prometheus text format; counters are per process (scrape each worker under serve.py)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# Admin endpoints: debug mode, or the token in GGG_ADMIN_TOKEN (header X-Admin-Token or ?token=)
+ADMIN_TOKEN: str = os.environ.get("GGG_ADMIN_TOKEN", "")
+
+def admin_allowed() -> bool:
+    if DEBUG_MODE:
+        return True
+    given = request.headers.get("X-Admin-Token") or request.args.get("token") or ""
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(given, ADMIN_TOKEN)
+
+@app.route("/admin/locks", methods=["GET", "POST"])
+def admin_locks():
+    """Lock contention report (see lockstats.py), ranked by total wait time.
+    GET ?top=<n>: the report. POST { enabled: <bool>, reset: <bool> }: switch collection, then report.
+    """
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    if request.method == "POST":
+        payload = request.get_json(silent=True) or {}
+        if payload.get("reset"):
+            lockstats.reset()
+        if "enabled" in payload:
+            lockstats.enabled = bool(payload["enabled"])
+    try:
+        top = max(1, int(request.args.get("top", 20)))
+    except ValueError:
+        return jsonify({"error": "Invalid top"}), 400
+    return jsonify(lockstats.report(top))
+
+@app.route("/admin/catalogue", methods=["GET"])
+def admin_catalogue():
+    """Current catalogue version and the versions live rooms are still pinned to."""
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    cat = db.catalogue
+    return jsonify({
+        "version": cat.content_hash,
+        "locations": cat.n_locations,
+        "questions": cat.n_questions,
+        "categories": cat.n_categories,
+        "loaded_versions": sorted(db.catalogues),
+    })
+
+@app.route("/admin/catalogue/reload", methods=["POST"])
+def admin_catalogue_reload():
+    """Reload data/*.csv and the images without a restart (see database.reload_catalogue).
+    New rooms use the new version; running games finish on the one they started with.
+    Invalid data is rejected (400, with the errors) and the current version stays.
+    Under serve.py with several workers this is 409: start it with --watch-catalogue instead.
+    """
+    if not admin_allowed():
+        return jsonify({"error": "Forbidden"}), 403
+    if not CATALOGUE_RELOAD_ENDPOINT:
+        return jsonify({"error": "Reload would only reach one worker; run serve.py with --watch-catalogue",
+                        "version": db.catalogue.content_hash}), 409
+    try:
+        result = db.reload_catalogue()
+    except catalogue_mod.CatalogueError as e:
+        return jsonify({"error": "Invalid catalogue", "errors": e.errors, "version": db.catalogue.content_hash}), 400
+    return jsonify(result)
 
 @app.route("/")
 def index():
@@ -101,114 +250,190 @@ def index():
     team_param = request.args.get("team")
     if not room_id or not team_param:
         return redirect("/lobby")
-    return send_from_directory(app.static_folder, "index.html")
+    return assets.send_page("index.html")
 
-@app.route("/api/state")
-def get_state():
-    room_id = request.args.get("room")
-    if not room_id:
-        return jsonify({"error": "Missing room id"}), 400
-    # Echo team from query (client-side maintained); validate if provided
-    team_param = request.args.get("team")
-    team_value = None
+@app.route("/index.html")
+def index_page():
+    return assets.send_page("index.html")
+
+# Content-addressed static files: cached by browsers for a year, never revalidated
+@app.route("/a/<name>")
+def fingerprinted_asset(name: str):
+    return assets.send_asset(name)
+
+@app.route("/renditions/<name>")
+def rendition(name: str):
+    return assets.send_rendition(name)
+
+# Map tile pyramid (built by `python tiles.py`)
+@app.route("/tiles/<map_name>/meta.json")
+def tile_meta(map_name: str):
+    return tiles.send_meta(map_name)
+
+@app.route("/tiles/<map_name>/<version>/<int:z>/<name>")
+def tile(map_name: str, version: str, z: int, name: str):
+    return tiles.send_tile(map_name, version, z, name)
+
+def parse_team_value(team_param: Optional[str]) -> Optional[str]:
+    # "blue"/"red" for a valid team query param, otherwise None
     if team_param:
         try:
-            team_value = Team(team_param.capitalize()).value.lower()
+            return Team(team_param.capitalize()).value.lower()
         except Exception:
-            team_value = None
-    if db.get_current_round(room_id) < 0:
-        try:
-            db.set_current_round(0, room_id)
-        except RuntimeError as e:
-            return jsonify({"error": str(e)}), 500
-
-    try:
-        question = db.get_current_question(room_id)
-        image_path = question.image_path
-        loc = question.location
-    except RuntimeError as e:
-        return jsonify({"error": str(e)}), 500
+            return None
+    return None
+
+def make_etag(version: str, team_value: Optional[str]) -> str:
+    # the room version covers every mutation; the team decides which coords are visible
+    return f"{version}.{team_value or '-'}.{int(DEBUG_MODE)}"
+
+def state_etag(room_id: str, team_value: Optional[str]) -> str:
+    return make_etag(db.get_room_version(room_id), team_value)
+
+# Static parts of a room's view, serialized once and shared by every room and request that
+# shows the same question in a round with the same multiplier: the question (image, srcset,
+# comment), its answer, total_rounds and dmg_mult. A state response splices this with the small
+# per-request part (phase, timers, hp, coords, ...) instead of encoding the whole view each time.
+class StateFragment(NamedTuple):
+    fields: Dict[str, Any]  # the static keys as build_state returns them
+    json: str               # the same keys encoded by codec.dumps, without the outer braces
+
+@functools.lru_cache(maxsize=4096)
+def static_fragment(catalogue_version: str, question_id: int, dmg_mult: float, debug: bool) -> StateFragment:
+    cat = db.catalogue_for(catalogue_version)
+    question = cat.questions[question_id]
+    image_set = assets.question_image_set(question.image_path)
+    loc = question.location
 
     # Always include the answer coordinate and location in the state
-    answer_coord = db.loc_db.get(loc)
+    answer_coord = cat.locations.get(loc)
     if answer_coord is None:
-        if DEBUG_MODE:
-            print(f"[WARN] Location '{loc}' not found in loc_db.")
+        if debug:
+            print(f"[WARN] Location '{loc}' not found in the catalogue.")
             answer_coord = (0.5, 0.5)
         else:
-            raise RuntimeError(f"Location '{loc}' not found in loc_db.")
-        
-    answer_loc = {
-        "name": loc,
-        "lat": (answer_coord[0] if answer_coord else None),
-        "lon": (answer_coord[1] if answer_coord else None),
+            raise RuntimeError(f"Location '{loc}' not found in the catalogue.")
+
+    fields = {
+        "dmg_mult": dmg_mult,
+        "total_rounds": max_rounds,
+        "question_comment": question.comment,
+        "question_img": image_set["src"],
+        # mime type -> srcset of resized renditions (empty when none were built)
+        "question_srcset": image_set["srcset"],
+        "answer_coord": answer_coord,
+        "answer_loc": {"name": loc, "lat": answer_coord[0], "lon": answer_coord[1]},
     }
+    return StateFragment(fields, codec.dumps(fields)[1:-1])
 
-    def reveal_coord(revealed, team):
-        if revealed:
-            return {
-                    "blue": db.get_team_coord(Team.BLUE, room_id), 
-                    "red": db.get_team_coord(Team.RED, room_id)
-                }
-        else:
-            return {
-                "blue": db.get_team_coord(Team.BLUE, room_id) if team == "blue" else None,
-                "red": db.get_team_coord(Team.RED, room_id) if team == "red" else None,
-            }
+def splice_state(fragment: StateFragment, state: dict) -> str:
+    # JSON of {**fragment.fields, **state}; state never repeats a static key
+    return "{" + fragment.json + "," + codec.dumps(state)[1:]
+
+def build_state_parts(room_id: str, team_value: Optional[str]) -> Tuple[StateFragment, dict, str]:
+    """Compute the client view of a room for one team (None = no team), and its ETag, as the
+    shared static fragment and the per-request fields (see splice_state).
+    Every room field comes from one snapshot, so the view is internally consistent.
+    """
+    if db.get_current_round(room_id) < 0:
+        db.set_current_round(0, room_id)
+
+    team = Team(team_value.capitalize()) if team_value else None
+    snap = db.get_snapshot(room_id, team)
+    while True:
+        if snap.question_id is None:
+            raise RuntimeError("No more questions can be sampled despite the target index is smaller than max_rounds. Check the samplers.")
+        # from the room's pinned catalogue: a reload mid-game does not change its questions
+        cat = db.catalogue_for(snap.catalogue_version)
+        fragment = static_fragment(cat.content_hash, snap.question_id, snap.dmg_mult, DEBUG_MODE)
+        if not needs_damage(snap):
+            break
+        # apply a revealed round's damage first: body and ETag then come from the same snapshot,
+        # even if the room moves on in between (the loop renders whatever round it is in then)
+        snap = apply_damage(room_id, snap, team, fragment.fields["answer_coord"])
 
     # Determine current phase (from room state) and compute remaining seconds server-side
-    current_phase = 'agree_next' if db.get_answer_revealed(room_id) else 'guess'
-    phase_started_at = db.get_phase_started_at(room_id)
+    current_phase = 'agree_next' if snap.answer_revealed else 'guess'
     now_sec = time.time()    
     if current_phase == 'guess':
-        remaining_seconds = place_guess_timeout - (now_sec - phase_started_at)
+        remaining_seconds = place_guess_timeout - (now_sec - snap.phase_started_at)
     else:
-        remaining_seconds = agree_next_timeout - (now_sec - phase_started_at)
+        remaining_seconds = agree_next_timeout - (now_sec - snap.phase_started_at)
     remaining_seconds = max(remaining_seconds, 0)
         
+    def per_team(values):
+        return {"blue": values[Team.BLUE.slot], "red": values[Team.RED.slot]}
 
     state = {
-        "round": db.get_current_round(room_id) + 1, # to 1-indexed.
-        "dmg_mult": db.get_dmg_mult(room_id),
-        "total_rounds": max_rounds,
+        "round": snap.round_index + 1, # to 1-indexed.
         # Synced countdown: backend phase and remaining seconds to avoid clock skew
         "phase": current_phase,
         "phase_remaining_seconds": max(0, int(remaining_seconds)),
-        "question_comment": question.comment,
         "team": team_value,  # session-specific; client controls selection
-        "hp": {
-            "blue": db.get_team_hp(Team.BLUE, room_id),
-            "red": db.get_team_hp(Team.RED, room_id),
-        },
-        "question_img": image_path,
-        "answer_coord": answer_coord,
-        "answer_loc": answer_loc,
-        "answer_revealed": db.get_answer_revealed(room_id),
+        "hp": per_team(snap.team_hp),
+        "answer_revealed": snap.answer_revealed,
         "debug": DEBUG_MODE,
-        # Hide opponent's coords until answer is revealed
-        "coords": reveal_coord(db.get_answer_revealed(room_id), team_value),
-        "has_next": db.has_next_round(room_id),
-        "has_prev": db.has_prev_round(room_id),
+        # Hide opponent's coords until answer is revealed (done by the snapshot)
+        "coords": per_team(snap.team_coord),
+        "has_next": snap.has_next,
+        "has_prev": snap.has_prev,
         # selected_team is deprecated; team is session-specific (via URL)
-        "team_answered": {
-            "blue": db.get_room(room_id).team_answered[Team.BLUE],
-            "red": db.get_room(room_id).team_answered[Team.RED]
-        },
-        "team_ready_next": {
-            "blue": db.get_room(room_id).team_ready_next[Team.BLUE],
-            "red": db.get_room(room_id).team_ready_next[Team.RED]
-        }
+        "team_answered": per_team(snap.team_answered),
+        "team_ready_next": per_team(snap.team_ready_next),
     }
     # If revealed, compute damage and distance consistently for the payload.
     if state["answer_revealed"]:
-        apply_damage(room_id, state)
+        state["damage"], state["distance"] = round_damage(snap, fragment.fields["answer_coord"])
+        end_game_condition(room_id, state)
+        # Let clients warm their cache with the next image during the agree_next window.
+        # Only content-addressed URLs go out, never the file name (which names the location).
+        if state["has_next"] and "winner" not in state and snap.next_question_id is not None:
+            next_set = assets.question_image_set(cat.questions[snap.next_question_id].image_path)
+            state["prefetch"] = {"question_img": next_set["src"], "question_srcset": next_set["srcset"]}
         
-    return jsonify(state)
+    return fragment, state, make_etag(snap.version, team_value)
+
+def build_state(room_id: str, team_value: Optional[str]) -> Tuple[dict, str]:
+    # the whole view as one dict (WebSocket deltas, deadline handling)
+    fragment, state, etag = build_state_parts(room_id, team_value)
+    return {**fragment.fields, **state}, etag
+
+def build_state_json(room_id: str, team_value: Optional[str]) -> Tuple[str, str]:
+    # the whole view, serialized (HTTP responses, SSE pushes)
+    fragment, state, etag = build_state_parts(room_id, team_value)
+    return splice_state(fragment, state), etag
+
+@app.route("/api/state")
+def get_state():
+    room_id = request.args.get("room")
+    if not room_id:
+        return jsonify({"error": "Missing room id"}), 400
+    # Echo team from query (client-side maintained); validate if provided
+    team_value = parse_team_value(request.args.get("team"))
+
+    # Cheap revalidation: nothing changed since the client's copy
+    current = state_etag(room_id, team_value)
+    if request.method == "GET" and request.if_none_match.contains(current):
+        resp = Response(status=304)
+        resp.set_etag(current)
+        resp.headers["Cache-Control"] = "no-cache"
+        return resp
+
+    try:
+        data, etag = build_state_json(room_id, team_value)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 500
+
+    resp = Response(data, mimetype="application/json")
+    # etag of the snapshot the payload was built from (after any damage it applied)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
 
 @app.route("/lobby")
 def lobby():
     # Serve the simple lobby page for choosing a room and team
-    return send_from_directory(app.static_folder, "lobby.html")
+    return assets.send_page("lobby.html")
 
 @app.route("/api/lobby/quick_match", methods=["POST"])
 def lobby_quick_match():
@@ -231,12 +456,23 @@ def lobby_quick_match():
 
 @app.route("/api/lobby/poll", methods=["POST"])
 def lobby_poll():
+    """Match status for a waiting channel.
+    Body: { channel: <id>, wait: <seconds, optional> }. With `wait` the request is held
+    open (long poll, capped at lb.LONG_POLL_MAX) until the match forms or the wait runs out.
+    """
     payload = request.get_json(silent=True) or {}
     channel = payload.get("channel")
     if not channel:
         return jsonify({"error": "Missing channel"}), 400
+    try:
+        wait = float(payload.get("wait") or 0)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid wait"}), 400
     
-    room_id, team = lb.check_match_status(channel)
+    if wait > 0:
+        room_id, team = lb.wait_for_match(channel, wait)
+    else:
+        room_id, team = lb.check_match_status(channel)
     if room_id:
         return jsonify({"matched": True, "room": room_id, "team": team.value.lower()})
     else:
@@ -256,6 +492,8 @@ def exit_game():
     if not room_id:
         return jsonify({"error": "Missing room id"}), 400
     
+    if room_id not in db.rooms:
+        raise db.RoomNotFound(room_id)
     # Mark room as ended
     lb.mark_stale_room(room_id)
     
@@ -310,6 +548,38 @@ def prev_round():
 #         return jsonify({"error": "Invalid team"}), 400
 #     return get_state()
 
+# Game actions, shared by the REST endpoints and the WebSocket channel.
+# Each returns an error message for the client, or None.
+
+def do_place_guess(room_id: str, team: Team, coord: Coord) -> Optional[str]:
+    # Ignore placing a guess after submission (no-op)
+    if db.get_team_answered(team, room_id):
+        return None
+    db.set_team_coord(team, coord, room_id)
+    dprint(f"ACTION: Placed guess for team {team} in room {room_id} at ({coord[0]:.2f}, {coord[1]:.2f})")
+    return None
+
+def do_submit(room_id: str, team: Team) -> Optional[str]:
+    if db.get_team_coord(team, room_id) is None:
+        return "No guess to submit"
+    db.set_team_answered(team, True, room_id)
+
+    dprint(f"ACTION: Submitted guess for team {team} in room {room_id}")
+    # whenever click, broadcast
+    broadcast(room_id, "reveal")
+    return None
+
+def do_agree_next(room_id: str, team: Team) -> Optional[str]:
+    db.set_team_ready_next(team, True, room_id)
+    if db.get_answer_revealed(room_id) and db.get_both_ready_next(room_id) and db.has_next_round(room_id):
+        # compare-and-set: when both teams agree at once only one request advances the round
+        db.advance_round(db.get_current_round(room_id), room_id)
+
+    dprint(f"ACTION: Team {team} agreed to next round in room {room_id}")
+    # Notify both clients to refresh
+    broadcast(room_id, "next_round")
+    return None
+
 @app.route("/api/place_guess", methods=["POST"])
 def place_guess():
     data = request.json
@@ -325,11 +595,9 @@ def place_guess():
         team = Team(team_param.capitalize())
     except Exception:
         return jsonify({"error": "Invalid team"}), 400
-    # Ignore placing a guess after submission (no-op)
-    if db.get_room(room_id).team_answered.get(team):
-        return get_state()
-    db.set_team_coord(team, coord, room_id)
-    dprint(f"ACTION: Placed guess for team {team} in room {room_id} at ({coord[0]:.2f}, {coord[1]:.2f})")
+    err = do_place_guess(room_id, team, coord)
+    if err:
+        return jsonify({"error": err}), 400
     return get_state()
 
 @app.route("/api/submit", methods=["POST"])
@@ -344,13 +612,9 @@ def submit_guess():
         team = Team(team_param.capitalize())
     except Exception:
         return jsonify({"error": "Invalid team"}), 400
-    if db.get_team_coord(team, room_id) is None:
-        return jsonify({"error": "No guess to submit"}), 400
-    db.set_team_answered(team, True, room_id)
-
-    dprint(f"ACTION: Submitted guess for team {team} in room {room_id}")
-    # whenever click, broadcast
-    broadcast(room_id, "reveal")
+    err = do_submit(room_id, team)
+    if err:
+        return jsonify({"error": err}), 400
     return get_state()
 
 @app.route("/api/reveal", methods=["GET"])
@@ -360,9 +624,9 @@ def reveal():
         return jsonify({"error": "Missing room id"}), 400
     # Allow manual reveal (admin/debug). Otherwise, reveal happens when both teams answered.
     if DEBUG_MODE:
-        db.rooms.get(room_id).force_answer_reveal()
+        db.force_answer_reveal(room_id)
     else:
-        if not all(db.rooms.get(room_id).team_answered.values()):
+        if not db.get_answer_revealed(room_id):
             return jsonify({"error": "Not ready to reveal"}), 400
     
     # Notify both clients to refresh
@@ -382,21 +646,199 @@ def agree_next():
         team = Team(team_param.capitalize())
     except Exception:
         return jsonify({"error": "Invalid team"}), 400
-    db.set_team_ready_next(team, True, room_id)
-    if db.get_answer_revealed(room_id) and db.get_both_ready_next(room_id) and db.has_next_round(room_id):
-        db.set_current_round(db.get_current_round(room_id) + 1, room_id)
-        db.reset_round_status(room_id)
-
-    dprint(f"ACTION: Team {team} agreed to next round in room {room_id}")
-    # Notify both clients to refresh
-    broadcast(room_id, "next_round")
+    do_agree_next(room_id, team)
     return get_state()
 
 @app.route("/events/<room_id>")
 def events(room_id: str):
-    q: queue.Queue[str] = queue.Queue()
-    event_queues.setdefault(room_id, []).append(q)
-    return Response(event_stream(q), mimetype="text/event-stream")
+    if room_id not in db.rooms:
+        raise db.RoomNotFound(room_id)
+    team_value = parse_team_value(request.args.get("team"))
+    sub = hub.subscribe(room_id, team_value)
+    # on reconnect, catch the client up if it missed a state event
+    last_id = request.headers.get("Last-Event-ID")
+    if sse_push_state and last_id and last_id != state_etag(room_id, team_value):
+        try:
+            data, etag = build_state_json(room_id, team_value)
+            hub.send(sub, format_event(data, "state", etag))
+        except RuntimeError:
+            pass
+    resp = Response(hub.stream(sub), mimetype="text/event-stream")
+    # keep reverse proxies from buffering the stream
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["X-Accel-Buffering"] = "no"
+    return resp
+
+# WebSocket game channel (only when flask-sock is installed; REST + SSE remain the fallback).
+# Client -> server: {"op": "place_guess", "lat", "lon"} | {"op": "submit"} | {"op": "agree_next"}
+#                   | {"op": "sync"}, each with an optional "seq" echoed in the reply.
+# Server -> client: {"type": "state", "etag", "state"} first, then {"type": "delta", "etag",
+#                   "set": {changed top-level keys}, "unset": [removed keys]} relative to the
+#                   previous message; {"type": "event", "msg"} for other room events and
+#                   {"type": "error", "error"} for rejected actions.
+# One thread receives and applies actions; everything outbound goes through the room's hub
+# subscription and is sent by a second thread, so the socket has a single writer.
+
+def state_delta(old: dict, new: dict) -> Tuple[dict, list]:
+    changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+    removed = [k for k in old if k not in new]
+    return changed, removed
+
+def ws_sender(ws, sub, room_id: str, team_value: Optional[str]):
+    last = None
+    try:
+        for frame in hub.frames(sub):
+            if frame is None:
+                continue  # the WebSocket layer keeps the connection alive itself
+            seq = None
+            if isinstance(frame, tuple):
+                # ("sync", seq) or ("error", seq, message), queued by the receiving thread
+                seq = frame[1]
+                if frame[0] == "error":
+                    ws.send(json.dumps({"type": "error", "seq": seq, "error": frame[2]}))
+                    continue
+                state, etag = build_state(room_id, team_value)
+            else:
+                event, event_id, data = parse_event(frame)
+                if event == "state":
+                    state, etag = data, event_id  # already serialized by push_state
+                elif data in ("reveal", "next_round"):
+                    state, etag = build_state(room_id, team_value)
+                else:
+                    ws.send(json.dumps({"type": "event", "msg": data}))
+                    continue
+            # diff in JSON terms (tuples and lists compare equal once serialized)
+            state = json.loads(state if isinstance(state, str) else codec.dumps(state))
+            if last is None:
+                ws.send(json.dumps({"type": "state", "seq": seq, "etag": etag, "state": state}))
+            else:
+                changed, removed = state_delta(last, state)
+                if changed or removed or seq is not None:
+                    ws.send(json.dumps({"type": "delta", "seq": seq, "etag": etag, "set": changed, "unset": removed}))
+            last = state
+    except Exception as e:
+        dprint(f"[WARN] ws sender for room {room_id} stopped: {e!r}")
+    finally:
+        hub.unsubscribe(sub)
+        try:
+            ws.close()
+        except Exception:
+            pass
+
+def ws_apply(room_id: str, team: Optional[Team], msg: dict) -> Optional[str]:
+    op = msg.get("op")
+    if op == "sync":
+        return None
+    if op not in ("place_guess", "submit", "agree_next"):
+        return "Unknown op"
+    if team is None:
+        return "Missing team"
+    if op == "place_guess":
+        try:
+            coord = (float(msg["lat"]), float(msg["lon"]))
+        except (KeyError, TypeError, ValueError):
+            return "Invalid coordinates"
+        return do_place_guess(room_id, team, coord)
+    if op == "submit":
+        return do_submit(room_id, team)
+    return do_agree_next(room_id, team)
+
+if sock is not None:
+    @sock.route("/ws/<room_id>")
+    def game_socket(ws, room_id: str):
+        if room_id not in db.rooms:
+            ws.send(json.dumps({"type": "error", "error": "Room not found"}))
+            return
+        team_value = parse_team_value(request.args.get("team"))
+        team = Team(team_value.capitalize()) if team_value else None
+        sub = hub.subscribe(room_id, team_value)
+        threading.Thread(target=ws_sender, args=(ws, sub, room_id, team_value), name="ws-sender", daemon=True).start()
+        hub.send(sub, ("sync", None))
+        try:
+            while not sub.closed:
+                raw = ws.receive()
+                try:
+                    msg = json.loads(raw)
+                    seq = msg.get("seq")
+                except (TypeError, ValueError, AttributeError):
+                    hub.send(sub, ("error", None, "Invalid message"))
+                    continue
+                try:
+                    err = ws_apply(room_id, team, msg)
+                except db.RoomNotFound:
+                    err = "Room not found"
+                hub.send(sub, ("error", seq, err) if err else ("sync", seq))
+        except Exception:
+            pass  # client went away
+        finally:
+            # also stops the sender thread
+            hub.disconnect(sub)
+
+# Audience guesses (see audience.py): spectators guess during the guess phase and get their
+# rank once the answer is revealed. Scored in one batch per round, never per request.
+def score_audience(room_id: str) -> Optional[audience.RoundResult]:
+    # the revealed round's result (scored on first call); None before the reveal
+    snap = db.get_snapshot(room_id)
+    book = audience.book(room_id)
+    if not snap.answer_revealed or book is None or snap.question_id is None:
+        return None
+    cat = db.catalogue_for(snap.catalogue_version)
+    answer_coord = cat.locations.get(cat.questions[snap.question_id].location, default_guess)
+    return book.score(snap.round_index, answer_coord, snap.dmg_mult)
+
+@app.route("/api/audience/guess", methods=["POST"])
+def audience_guess():
+    """Body: { member: <client-chosen id>, name: <display name, optional>, lat, lon }.
+    A member may guess again until the reveal; the latest guess counts.
+    """
+    room_id = request.args.get("room")
+    if not room_id:
+        return jsonify({"error": "Missing room id"}), 400
+    data = request.get_json(silent=True) or {}
+    member = str(data.get("member") or "")[:64]
+    if not member:
+        return jsonify({"error": "Missing member id"}), 400
+    try:
+        coord = (float(data["lat"]), float(data["lon"]))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Invalid coordinates"}), 400
+    if not all(0.0 <= v <= 1.0 for v in coord):
+        return jsonify({"error": "Invalid coordinates"}), 400
+    name = str(data.get("name") or "Audience")[:audience.max_name_length]
+
+    round_index, phase, _ = db.get_phase_token(room_id)
+    if phase != "guess":
+        return jsonify({"error": "Guessing is closed for this round"}), 400
+    count = audience.book(room_id, create=True).add(round_index, member, name, coord)
+    if count is None:
+        return jsonify({"error": "Guessing is closed for this round"}), 400
+    if count == 0:
+        return jsonify({"error": "Too many audience guesses this round"}), 503
+    return jsonify({"ok": True, "round": round_index + 1, "count": count})
+
+@app.route("/api/audience/result")
+def audience_result():
+    """?room=<id>&member=<id>: this round's guess count, then after the reveal the
+    leaderboard and the member's own rank, distance and damage."""
+    room_id = request.args.get("room")
+    if not room_id:
+        return jsonify({"error": "Missing room id"}), 400
+    result = score_audience(room_id)
+    if result is None:
+        round_index = db.get_current_round(room_id)
+        book = audience.book(room_id)
+        return jsonify({
+            "round": round_index + 1,
+            "revealed": False,
+            "count": book.count(round_index) if book is not None else 0,
+        })
+    return jsonify({
+        "round": result.round_index + 1,
+        "revealed": True,
+        "count": result.count,
+        "top": result.top,
+        "you": audience.member_result(result, request.args.get("member")),
+    })
 
 @app.route("/api/init", methods=["POST"])
 def init_game():
@@ -404,15 +846,25 @@ def init_game():
     if not room_id:
         return jsonify({"error": "Missing room id"}), 400
     # initialize shared datasets and ensure room exists
-    if not db.loc_db or not db.que_db:
+    if db.catalogue is None:
         db.init_database()
-    # Only initialize a new room if not present; avoid resetting when a second player joins
+    # Rooms are created when a match forms (here, if the lobby ran in another worker process);
+    # only debug mode may open one directly. Never reset an existing room (the second player calls this too)
+    game = lb.room_game(room_id)
+    if game is not None and room_id in db.rooms and db.get_room(room_id).epoch != game:
+        # the previous game under this name, rematched by another worker's lobby
+        lb._destroy_room(room_id)
     if room_id not in db.rooms:
-        db.init_room(room_id)
+        if not DEBUG_MODE and lb.room_status(room_id) != lb.RoomStatus.IN_GAME:
+            raise db.RoomNotFound(room_id)
+        try:
+            db.init_room(room_id, epoch=game)
+        except db.RoomLimitError as e:
+            return jsonify({"error": str(e)}), 503
         db.reset_round_status(room_id)
     return get_state()
 
-def parse_args() -> Tuple[int, bool]:
+def parse_args() -> Tuple[int, bool, str, bool, bool, Optional[int]]:
     import argparse
     parser = argparse.ArgumentParser(description="Geography Guessing Game Server")
     parser.add_argument(
@@ -426,12 +878,43 @@ def parse_args() -> Tuple[int, bool]:
         default=5000,
         help="Port to run the server on (default: 5000).",
     )
+    parser.add_argument(
+        "--store",
+        default=store.default_store_url,
+        help="Game state backend: 'memory' (default) or 'sqlite:///<path>' to share state between worker processes (still route each room to one process, see serve.py).",
+    )
+    parser.add_argument(
+        "--lock-stats",
+        action="store_true",
+        help="Record lock wait/hold times from the start (report at /admin/locks).",
+    )
+    parser.add_argument(
+        "--watch-catalogue",
+        action="store_true",
+        default=os.environ.get("GGG_CATALOGUE_WATCH", "") not in ("", "0"),
+        help="Reload the catalogue whenever data/locations.csv, data/questions.csv or a question image changes.",
+    )
+    parser.add_argument(
+        "--max-rooms",
+        type=int,
+        default=None,
+        help=f"Live room cap; players are told the server is full beyond it (default: {db.max_live_rooms}, or GGG_MAX_LIVE_ROOMS).",
+    )
     args = parser.parse_args()
-    return args.port, args.debug
+    return args.port, args.debug, args.store, args.lock_stats, args.watch_catalogue, args.max_rooms
 
 if __name__ == "__main__":
-    port, DEBUG_MODE = parse_args()
+    port, DEBUG_MODE, store_url, lock_stats, watch, max_rooms = parse_args()
+    if max_rooms is not None:
+        db.max_live_rooms = max_rooms
+    db.configure_store(store_url)
+    lb.configure_store(store_url)
+    if lock_stats:
+        lockstats.enabled = True
+    if watch:
+        db.watch_catalogue()
     
     print(f"DEBUG_MODE = {DEBUG_MODE}")
+    print(f"STORE = {store_url}")
     print(f"Starting server on port {port}...")
     app.run(debug=DEBUG_MODE, port=port)
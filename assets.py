@@ -0,0 +1,300 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from flask import Response, request, send_file
+
+try:
+    import brotli  # optional: enables `br` for pages when installed
+except ImportError:
+    brotli = None
+
+# Static asset handling.
+#
+# Renditions: `python assets.py` reads questions.csv and writes every referenced image at several
+# widths, in WebP and JPEG, to static/renditions/ under content-hashed names, plus a manifest.
+# At runtime the manifest maps a question's image_path to those URLs so clients can pick the
+# smallest adequate file via srcset.
+#
+# Fingerprinting: any other file under static/ is addressable as /a/<content digest><ext>, served
+# with a one-year immutable Cache-Control and a strong ETag. The digest URL also keeps file names
+# (which may name the answer location) out of the client's view. The digest index is built once
+# at startup (index_static); an unknown digest is a 404 and re-walks static/ at most once per
+# `static_reindex_interval`, so unauthenticated misses cannot force a directory walk each.
+#
+# Pages: the HTML entry points are rewritten to reference fingerprinted media, compressed once
+# (gzip, and brotli if available) and served by Accept-Encoding with cheap 304 revalidation.
+
+static_dir = "static"
+rendition_dir = "renditions"  # relative to static/
+manifest_path = os.path.join(static_dir, rendition_dir, "manifest.json")
+
+# hyperparameters for rendition generation
+rendition_widths = (480, 960, 1440)
+rendition_formats = {
+    # format -> (file extension, mime type, PIL save options)
+    "webp": (".webp", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": (".jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+# image_path -> manifest entry (see build_renditions)
+_manifest: Dict[str, dict] = {}
+
+immutable_cache_control = "public, max-age=31536000, immutable"
+digest_length = 16
+static_reindex_interval = 60.0  # seconds; minimum gap between re-walks of static/ on unknown digests
+
+# rel path -> (mtime, size, digest) and digest -> rel path, filled lazily
+_digests: Dict[str, Tuple[float, int, str]] = {}
+_by_digest: Dict[str, str] = {}
+_digest_lock = threading.Lock()
+_index_lock = threading.Lock()
+_indexed_at: Optional[float] = None  # time.monotonic() of the last index_static walk
+
+# page name -> (mtime, {encoding: body}, etag base)
+_pages: Dict[str, Tuple[float, Dict[str, bytes], str]] = {}
+
+# media references inside pages that get fingerprinted
+_page_ref = re.compile(r'(src|href|data-src)="((?:media|dataset)/[^"]+)"')
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(path: str = manifest_path) -> Dict[str, dict]:
+    global _manifest
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            _manifest = json.load(f)
+    except FileNotFoundError:
+        _manifest = {}
+    return _manifest
+
+
+def asset_digest(rel_path: str) -> Optional[str]:
+    # content digest of static/<rel_path>, recomputed only when mtime/size change
+    full = os.path.join(static_dir, rel_path)
+    try:
+        st = os.stat(full)
+    except OSError:
+        return None
+    cached = _digests.get(rel_path)
+    if cached and cached[0] == st.st_mtime and cached[1] == st.st_size:
+        return cached[2]
+    digest = file_digest(full)[:digest_length]
+    with _digest_lock:
+        _digests[rel_path] = (st.st_mtime, st.st_size, digest)
+        _by_digest[digest] = rel_path
+    return digest
+
+
+def asset_url(rel_path: str) -> str:
+    """Fingerprinted URL for a file under static/ (the plain path if it does not exist)."""
+    digest = asset_digest(rel_path)
+    if digest is None:
+        return rel_path
+    return f"/a/{digest}{os.path.splitext(rel_path)[1].lower()}"
+
+
+def index_static() -> None:
+    """Digest every fingerprintable file under static/, so /a/ URLs handed out by another worker
+    or before a restart resolve. Called once at startup."""
+    global _indexed_at
+    for root, _, files in os.walk(static_dir):
+        for name in files:
+            rel = os.path.relpath(os.path.join(root, name), static_dir).replace(os.sep, "/")
+            if not rel.startswith((rendition_dir + "/", "tiles/")):
+                asset_digest(rel)
+    _indexed_at = time.monotonic()
+
+
+def _reindex_on_miss() -> None:
+    # files added since startup; at most one walk per interval, concurrent misses do not wait
+    if _indexed_at is not None and time.monotonic() - _indexed_at < static_reindex_interval:
+        return
+    if not _index_lock.acquire(blocking=False):
+        return
+    try:
+        if _indexed_at is None or time.monotonic() - _indexed_at >= static_reindex_interval:
+            index_static()
+    finally:
+        _index_lock.release()
+
+
+def send_asset(name: str) -> Response:
+    # name is "<digest><ext>"
+    digest = os.path.splitext(name)[0]
+    rel = _by_digest.get(digest)
+    if rel is None:
+        _reindex_on_miss()
+        rel = _by_digest.get(digest)
+    if rel is None or asset_digest(rel) != digest:
+        return Response("Not Found", status=404)
+    return send_immutable(os.path.join(static_dir, rel), digest)
+
+
+def send_rendition(name: str) -> Response:
+    # rendition names are already content digests
+    if "/" in name or "\\" in name:
+        return Response("Not Found", status=404)
+    path = os.path.join(static_dir, rendition_dir, name)
+    if not os.path.isfile(path):
+        return Response("Not Found", status=404)
+    return send_immutable(path, os.path.splitext(name)[0])
+
+
+def send_immutable(path: str, etag: str) -> Response:
+    # conditional=True gives If-None-Match/If-Range handling and byte Range responses
+    resp = send_file(os.path.abspath(path), etag=etag, conditional=True, max_age=31536000)
+    resp.headers["Cache-Control"] = immutable_cache_control
+    return resp
+
+
+def _load_page(name: str) -> Tuple[Dict[str, bytes], str]:
+    path = os.path.join(static_dir, name)
+    mtime = os.stat(path).st_mtime
+    cached = _pages.get(name)
+    if cached and cached[0] == mtime:
+        return cached[1], cached[2]
+    with open(path, "r", encoding="utf-8") as f:
+        html = f.read()
+    html = _page_ref.sub(lambda m: f'{m.group(1)}="{asset_url(m.group(2))}"', html)
+    raw = html.encode("utf-8")
+    bodies = {"identity": raw, "gzip": gzip.compress(raw, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(raw, quality=11)
+    etag = hashlib.sha256(raw).hexdigest()[:digest_length]
+    _pages[name] = (mtime, bodies, etag)
+    return bodies, etag
+
+
+def send_page(name: str) -> Response:
+    """Serve an HTML entry point precompressed, revalidated by strong per-encoding ETags."""
+    bodies, etag = _load_page(name)
+    encoding = "identity"
+    for candidate in ("br", "gzip"):
+        if candidate in bodies and candidate in request.accept_encodings:
+            encoding = candidate
+            break
+    resp = Response(bodies[encoding], mimetype="text/html")
+    if encoding != "identity":
+        resp.headers["Content-Encoding"] = encoding
+    resp.headers["Vary"] = "Accept-Encoding"
+    # entry points are not fingerprinted: always revalidate, which is a 304 when unchanged
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.set_etag(f"{etag}-{encoding}")
+    return resp.make_conditional(request, accept_ranges=True, complete_length=len(bodies[encoding]))
+
+
+def question_image_set(image_path: str) -> dict:
+    """URLs for one question image: a fallback `src` and per-mime-type srcset strings."""
+    entry = _manifest.get(image_path)
+    if not entry:
+        return {"src": asset_url(image_path), "srcset": {}}
+    srcset = {}
+    for fmt, (_, mime, _) in rendition_formats.items():
+        files = entry.get(fmt)
+        if files:
+            srcset[mime] = ", ".join(f"/{url} {width}w" for url, width in files)
+    # largest JPEG is the universally supported fallback
+    jpeg = entry.get("jpeg") or []
+    src = f"/{jpeg[-1][0]}" if jpeg else asset_url(image_path)
+    return {"src": src, "srcset": srcset}
+
+
+def _render(img, width: int, fmt: str) -> bytes:
+    from PIL import Image
+
+    _, _, options = rendition_formats[fmt]
+    if img.width > width:
+        height = round(img.height * width / img.width)
+        img = img.resize((width, height), Image.LANCZOS)
+    if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format=fmt.upper(), **options)
+    return buf.getvalue()
+
+
+def build_renditions(widths: Tuple[int, ...] = rendition_widths, force: bool = False) -> Dict[str, dict]:
+    # Pillow is only needed for this build step, not for serving
+    from PIL import Image
+    import database as db
+
+    if db.catalogue is None:
+        db.init_database()
+    out_dir = os.path.join(static_dir, rendition_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    previous = load_manifest()
+    manifest: Dict[str, dict] = {}
+
+    for image_path in sorted({q.image_path for q in db.catalogue.questions.values()}):
+        src_file = os.path.join(static_dir, image_path)
+        if not os.path.exists(src_file):
+            print(f"[WARN] image referenced by questions.csv is missing: {src_file}")
+            continue
+        source_hash = file_digest(src_file)
+        old = previous.get(image_path)
+        if not force and old and old.get("source") == source_hash and old.get("widths") == list(widths) \
+                and all(os.path.exists(os.path.join(static_dir, url)) for fmt in rendition_formats for url, _ in old.get(fmt, [])):
+            manifest[image_path] = old
+            continue
+
+        with Image.open(src_file) as img:
+            img.load()
+            entry: dict = {"source": source_hash, "widths": list(widths), "width": img.width, "height": img.height}
+            # never upscale: widths beyond the original collapse into one full-size rendition
+            targets = sorted({min(w, img.width) for w in widths})
+            for fmt, (ext, _, _) in rendition_formats.items():
+                files: List[Tuple[str, int]] = []
+                for width in targets:
+                    data = _render(img, width, fmt)
+                    name = f"{hashlib.sha256(data).hexdigest()[:16]}{ext}"
+                    with open(os.path.join(out_dir, name), "wb") as f:
+                        f.write(data)
+                    files.append((f"{rendition_dir}/{name}", width))
+                entry[fmt] = files
+        manifest[image_path] = entry
+        print(f"[INFO] rendered {image_path}: {', '.join(str(w) for w in targets)}")
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+    # drop renditions no longer referenced by the manifest
+    live = {url.split("/", 1)[1] for entry in manifest.values() for fmt in rendition_formats for url, _ in entry.get(fmt, [])}
+    for name in os.listdir(out_dir):
+        if name != os.path.basename(manifest_path) and name not in live:
+            os.remove(os.path.join(out_dir, name))
+
+    load_manifest()
+    return manifest
+
+
+def parse_args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Build resized WebP/JPEG renditions of the question images.")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-render every image even if its source is unchanged.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    manifest = build_renditions(force=args.force)
+    print(f"Wrote {len(manifest)} images to {os.path.join(static_dir, rendition_dir)}")
+else:
+    load_manifest()
@@ -0,0 +1,117 @@
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+import calc
+from defs import Coord
+
+# Audience guesses: spectators (e.g. phones in the hall) guess alongside the two teams.
+#
+# Guesses are buffered per room for the round being played, in a preallocated coordinate array
+# (a member guessing again overwrites their row). At reveal the whole round is scored in one
+# vectorized pass (calc.score_guesses) and the result is kept until the next round, so every
+# later result lookup is a dict hit. Books live in the process that owns the room (serve.py
+# routes by room id).
+
+# hyperparameters for audience guesses
+max_audience = 2000     # guesses accepted per room and round
+leaderboard_size = 10   # entries in the published top list
+max_name_length = 24
+
+
+class RoundResult(NamedTuple):
+    round_index: int
+    count: int
+    top: List[dict]
+    rows: Dict[str, int]  # member -> row in the arrays below
+    distance: np.ndarray
+    damage: np.ndarray
+    rank: np.ndarray
+
+
+class AudienceBook():
+    # one room: the round being collected and the last scored round
+    __slots__ = ("lock", "round_index", "rows", "names", "coords", "result")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.round_index = -1
+        self.rows: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.coords = np.empty((64, 2), dtype=np.float64)
+        self.result: Optional[RoundResult] = None
+
+    def add(self, round_index: int, member: str, name: str, coord: Coord) -> Optional[int]:
+        # returns the number of guesses this round; 0 when the round is full, None once it is scored
+        with self.lock:
+            if round_index != self.round_index:
+                self.round_index = round_index
+                self.rows = {}
+                self.names = []
+            elif self.result is not None and self.result.round_index == round_index:
+                return None
+            row = self.rows.get(member)
+            if row is None:
+                row = len(self.rows)
+                if row >= max_audience:
+                    return 0
+                if row == len(self.coords):
+                    grown = np.empty((2 * len(self.coords), 2), dtype=np.float64)
+                    grown[:row] = self.coords
+                    self.coords = grown
+                self.rows[member] = row
+                self.names.append(name)
+            else:
+                self.names[row] = name
+            self.coords[row] = coord
+            return len(self.rows)
+
+    def score(self, round_index: int, answer: Coord, mult: float) -> RoundResult:
+        with self.lock:
+            if self.result is not None and self.result.round_index == round_index:
+                return self.result
+            n = len(self.rows) if self.round_index == round_index else 0
+            scored = calc.score_guesses(self.coords[:n], answer, mult)
+            top = []
+            for row in np.argsort(scored.distance, kind="stable")[:leaderboard_size]:
+                top.append({
+                    "name": self.names[row],
+                    "rank": int(scored.rank[row]),
+                    "distance": float(scored.distance[row]),
+                    "damage": float(scored.damage[row]),
+                })
+            self.result = RoundResult(round_index, n, top, dict(self.rows) if n else {},
+                                      scored.distance, scored.damage, scored.rank)
+            return self.result
+
+    def count(self, round_index: int) -> int:
+        return len(self.rows) if self.round_index == round_index else 0
+
+
+_books: Dict[str, AudienceBook] = {}
+_books_lock = threading.Lock()
+
+
+def book(room_id: str, create: bool = False) -> Optional[AudienceBook]:
+    found = _books.get(room_id)
+    if found is None and create:
+        with _books_lock:
+            found = _books.setdefault(room_id, AudienceBook())
+    return found
+
+
+def member_result(result: RoundResult, member: Optional[str]) -> Optional[dict]:
+    row = result.rows.get(member) if member else None
+    if row is None:
+        return None
+    return {
+        "rank": int(result.rank[row]),
+        "distance": float(result.distance[row]),
+        "damage": float(result.damage[row]),
+    }
+
+
+def drop_room(room_id: str) -> None:
+    with _books_lock:
+        _books.pop(room_id, None)
@@ -1,3 +1,7 @@
+from typing import NamedTuple
+
+import numpy as np
+
 import database as db
 from defs import *
 
@@ -15,3 +19,19 @@ def compute_scaled_damage(xy1: Coord, xy2: Coord, mult: int) -> float:
     damage = dist * mult
     return damage
 
+# Batch scoring: the same formulas over many guesses in one vectorized pass
+# (audience guesses, see audience.py). Two teams stay on the scalar functions above.
+
+class BatchScore(NamedTuple):
+    distance: np.ndarray  # scaled distance per guess
+    damage: np.ndarray    # distance * mult
+    rank: np.ndarray      # 1 = closest; equal distances share a rank
+
+def score_guesses(guesses: np.ndarray, answer: Coord, mult: float) -> BatchScore:
+    # guesses: (n, 2) array of coords
+    guesses = np.asarray(guesses, dtype=np.float64).reshape(-1, 2)
+    delta = guesses - np.asarray(answer, dtype=np.float64)
+    dist = np.sqrt(np.einsum("ij,ij->i", delta, delta)) * distance_scale
+    # competition ranking: 1 + number of strictly closer guesses
+    rank = np.searchsorted(np.sort(dist), dist, side="left") + 1
+    return BatchScore(dist, dist * mult, rank)
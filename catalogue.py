@@ -0,0 +1,524 @@
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from defs import Question, Coord
+
+# Compiled question/location catalogue.
+#
+#   python catalogue.py            # validate data/*.csv and the images, write data/catalogue.bin
+#   python catalogue.py --check    # validate only
+#
+# Compiling parses both CSV files, checks every row (coordinates in [0, 1], unique names and
+# ids, each question's location defined, its image present and at least min_image_side pixels
+# per side) and rejects the whole catalogue on any error. The snapshot is a flat, little-endian
+# binary file: a header with section offsets and a SHA-256 content hash, fixed-size columns
+# (sorted names and ids, so lookups are binary searches) and one string table.
+#
+# At startup the server memory-maps the snapshot and reads rows in place on first use, so
+# startup cost does not grow with the catalogue, and forked workers share the same pages. The
+# snapshot records a stamp of its sources: the CSV files (names and content, not paths, so it
+# survives moving the checkout) and the size and mtime of every referenced image. If any of
+# them changed, the server compiles (and validates) the catalogue in memory instead and says so.
+#
+# A running server can pick up edits without a restart (database.reload_catalogue, triggered by
+# POST /admin/catalogue/reload or the data/ watcher): reload_catalogue compiles a new version
+# that reuses the previous one's parsed rows and image checks, so only edited rows are parsed
+# and only changed images are opened again.
+
+loc_sheet_path = "data/locations.csv"  # format: loc, lat, lon (no header)
+que_sheet_path = "data/questions.csv"  # format: global_id, image_filename, loc, category[, comment] (no header)
+que_image_dir = "dataset/"  # relative to static/ folder
+static_dir = "static"
+snapshot_path = "data/catalogue.bin"
+
+# hyperparameters for validation
+min_image_side = 64  # pixels
+
+_MAGIC = b"GGGCAT\x00\x00"
+_FORMAT = 1
+_NO_STRING = 0xFFFFFFFF
+_SECTIONS = ("loc_names", "loc_coords", "que_ids", "que_rows", "cat_names", "cat_starts", "cat_members",
+             "str_offsets", "str_blob", "end")
+# magic, format, content hash, source stamp, counts (loc, que, cat, str), section offsets
+_HEADER = struct.Struct("<8sI32s32s4I" + "I" * len(_SECTIONS))
+# image path, location, category, comment (string ids), width, height, image size, image mtime_ns
+_QUE_ROW = struct.Struct("<6IQQ")
+
+
+class CatalogueError(ValueError):
+    def __init__(self, errors: List[str]):
+        super().__init__(f"{len(errors)} catalogue error(s):\n  " + "\n  ".join(errors))
+        self.errors = errors
+
+
+def source_stamp(loc_path: str = loc_sheet_path, que_path: str = que_sheet_path) -> bytes:
+    # identifies the CSV files by name and content (not path, so moving the checkout keeps the
+    # snapshot valid) and every image questions.csv references by size and mtime, like the
+    # image checks do. Only small files are read and the images are only stat()ed, so this is
+    # cheap enough for every watcher pass.
+    h = hashlib.sha256()
+    for path in (loc_path, que_path):
+        with open(path, "rb") as f:
+            data = f.read()
+        h.update(f"{os.path.basename(path)}:{len(data)}\n".encode("utf-8"))
+        h.update(data)
+    images = set()
+    for line in data.decode("utf-8-sig", errors="replace").splitlines():
+        parts = line.split(",")
+        if len(parts) >= 2 and parts[1].strip():
+            images.add(parts[1].strip())
+    for name in sorted(images):
+        try:
+            st = os.stat(os.path.join(static_dir, que_image_dir, name))
+            h.update(f"{name}:{st.st_size}:{st.st_mtime_ns}\n".encode("utf-8"))
+        except OSError:
+            h.update(f"{name}:missing\n".encode("utf-8"))
+    return h.digest()
+
+
+def image_info(path: str) -> Tuple[int, int, int, int]:
+    # (width, height, size, mtime_ns); width/height are 0 when Pillow is not installed
+    st = os.stat(path)
+    try:
+        from PIL import Image
+    except ImportError:
+        return 0, 0, st.st_size, st.st_mtime_ns
+    with Image.open(path) as img:  # reads the header only
+        return img.width, img.height, st.st_size, st.st_mtime_ns
+
+
+def parse_locations(path: str, errors: List[str]) -> Dict[str, Coord]:
+    locations: Dict[str, Coord] = {}
+    # use 'utf-8-sig' to gracefully handle files that may include a UTF-8 BOM
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            parts = [p.strip() for p in line.split(",")]
+            where = f"{path}:{n}"
+            if len(parts) != 3 or not parts[0]:
+                errors.append(f"{where}: expected 'loc, lat, lon', got {line!r}")
+                continue
+            try:
+                lat, lon = float(parts[1]), float(parts[2])
+            except ValueError:
+                errors.append(f"{where}: coordinates are not numbers: {line!r}")
+                continue
+            if not (0.0 <= lat <= 1.0 and 0.0 <= lon <= 1.0):
+                errors.append(f"{where}: coordinates must be normalized to [0, 1]: {line!r}")
+            if parts[0] in locations:
+                errors.append(f"{where}: duplicate location {parts[0]!r}")
+            locations[parts[0]] = (lat, lon)
+    return locations
+
+
+def parse_question_row(line: str, where: str, locations: Dict[str, Coord], errors: List[str],
+                       image_cache: Optional[Dict[str, tuple]] = None,
+                       row_cache: Optional[Dict[str, tuple]] = None,
+                       stats: Optional[Dict[str, int]] = None) -> Optional[Tuple[int, Question, tuple]]:
+    # one questions.csv row -> (id, question, image info), or None (errors appended)
+    # row_cache: line text -> (id, question) from an earlier compile; a line seen before is not
+    # parsed again, only re-checked against the current locations and its image
+    cached_row = row_cache.get(line) if row_cache is not None else None
+    if cached_row is not None:
+        qid, question = cached_row
+    else:
+        parts = [p.strip() for p in line.split(",")]
+        if len(parts) < 4:
+            errors.append(f"{where}: expected 'id, image, loc, category[, comment]', got {line!r}")
+            return None
+        id_str, image_filename, loc, category = parts[:4]
+        comment = parts[4] if len(parts) >= 5 else None
+        try:
+            qid = int(id_str)
+        except ValueError:
+            errors.append(f"{where}: question id is not an integer: {id_str!r}")
+            return None
+        question = Question(image_path=os.path.join(que_image_dir, image_filename), location=loc,
+                            category=category, comment=comment)
+        if row_cache is not None:
+            row_cache[line] = (qid, question)
+        if stats is not None:
+            stats["rows_parsed"] = stats.get("rows_parsed", 0) + 1
+    ok = True
+    if question.location not in locations:
+        errors.append(f"{where}: question {qid} uses undefined location {question.location!r}")
+        ok = False
+    if not question.category:
+        errors.append(f"{where}: question {qid} has no category")
+        ok = False
+    file = os.path.join(static_dir, question.image_path)
+    info = None
+    try:
+        st = os.stat(file)
+        cached = (image_cache or {}).get(question.image_path)
+        # unchanged file (same size and mtime): reuse its earlier validation
+        if cached is not None and cached[2:] == (st.st_size, st.st_mtime_ns):
+            info = cached
+        else:
+            info = image_info(file)
+            if stats is not None:
+                stats["images_checked"] = stats.get("images_checked", 0) + 1
+    except FileNotFoundError:
+        errors.append(f"{where}: question {qid} image is missing: {file}")
+        ok = False
+    except Exception as e:
+        errors.append(f"{where}: question {qid} image cannot be read ({file}): {e}")
+        ok = False
+    if info is not None and info[0] and min(info[0], info[1]) < min_image_side:
+        errors.append(f"{where}: question {qid} image is {info[0]}x{info[1]}, below {min_image_side}px: {file}")
+        ok = False
+    if not ok:
+        return None
+    return qid, question, info
+
+
+def parse_questions(path: str, locations: Dict[str, Coord], errors: List[str],
+                    image_cache: Optional[Dict[str, tuple]] = None,
+                    row_cache: Optional[Dict[str, tuple]] = None,
+                    stats: Optional[Dict[str, int]] = None) -> Dict[int, Tuple[Question, tuple]]:
+    questions: Dict[int, Tuple[Question, tuple]] = {}
+    lines = set()
+    # use 'utf-8-sig' so a BOM on the first line doesn't end up in the id string
+    with open(path, "r", encoding="utf-8-sig") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            lines.add(line)
+            row = parse_question_row(line, f"{path}:{n}", locations, errors, image_cache, row_cache, stats)
+            if row is None:
+                continue
+            qid, question, info = row
+            if qid in questions:
+                errors.append(f"{path}:{n}: duplicate question id {qid}")
+            questions[qid] = (question, info)
+    if row_cache is not None:
+        # keep only the rows of this version of the file
+        for line in [line for line in row_cache if line not in lines]:
+            del row_cache[line]
+    return questions
+
+
+def build_snapshot(locations: Dict[str, Coord], questions: Dict[int, Tuple[Question, tuple]], stamp: bytes) -> bytes:
+    strings: Dict[str, int] = {}
+
+    def sid(value: Optional[str]) -> int:
+        if value is None:
+            return _NO_STRING
+        return strings.setdefault(value, len(strings))
+
+    loc_names = sorted(locations)
+    que_ids = sorted(questions)
+    by_category: Dict[str, List[int]] = {}
+    for qid in que_ids:
+        by_category.setdefault(questions[qid][0].category, []).append(qid)
+    cat_names = sorted(by_category)
+
+    sections: Dict[str, bytes] = {}
+    sections["loc_names"] = struct.pack(f"<{len(loc_names)}I", *(sid(name) for name in loc_names))
+    sections["loc_coords"] = struct.pack(f"<{2 * len(loc_names)}d", *(v for name in loc_names for v in locations[name]))
+    sections["que_ids"] = struct.pack(f"<{len(que_ids)}i", *que_ids)
+    rows = []
+    for qid in que_ids:
+        q, (width, height, size, mtime_ns) = questions[qid]
+        rows.append(_QUE_ROW.pack(sid(q.image_path), sid(q.location), sid(q.category), sid(q.comment),
+                                  width, height, size, mtime_ns))
+    sections["que_rows"] = b"".join(rows)
+    sections["cat_names"] = struct.pack(f"<{len(cat_names)}I", *(sid(name) for name in cat_names))
+    starts = [0]
+    for name in cat_names:
+        starts.append(starts[-1] + len(by_category[name]))
+    sections["cat_starts"] = struct.pack(f"<{len(starts)}I", *starts)
+    sections["cat_members"] = struct.pack(f"<{starts[-1]}i", *(qid for name in cat_names for qid in by_category[name]))
+    encoded = [s.encode("utf-8") for s in strings]  # insertion order = string id
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    sections["str_offsets"] = struct.pack(f"<{len(offsets)}I", *offsets)
+    sections["str_blob"] = b"".join(encoded)
+
+    body = bytearray()
+    positions = []
+    for name in _SECTIONS[:-1]:
+        body += b"\0" * (-(_HEADER.size + len(body)) % 8)  # 8-byte aligned columns
+        positions.append(_HEADER.size + len(body))
+        body += sections[name]
+    positions.append(_HEADER.size + len(body))
+    header = _HEADER.pack(_MAGIC, _FORMAT, hashlib.sha256(body).digest(), stamp,
+                          len(loc_names), len(que_ids), len(cat_names), len(strings), *positions)
+    return header + bytes(body)
+
+
+def compile_catalogue(loc_path: str = loc_sheet_path, que_path: str = que_sheet_path,
+                      image_cache: Optional[Dict[str, tuple]] = None,
+                      row_cache: Optional[Dict[str, tuple]] = None,
+                      stats: Optional[Dict[str, int]] = None) -> bytes:
+    # image_cache: image infos from an earlier snapshot; unchanged images are not reopened
+    # row_cache: parsed question rows by line text (see parse_question_row), filled as it goes
+    errors: List[str] = []
+    locations = parse_locations(loc_path, errors)
+    questions = parse_questions(que_path, locations, errors, image_cache, row_cache, stats)
+    if not questions:
+        errors.append(f"{que_path}: no questions")
+    if errors:
+        raise CatalogueError(errors)
+    return build_snapshot(locations, questions, source_stamp(loc_path, que_path))
+
+
+class Catalogue():
+    """A compiled catalogue read in place from a snapshot buffer (an mmap or bytes).
+    `locations`, `questions` and `by_category` are read-only mappings with the shapes of the
+    old loc_db / que_db / que_by_category dicts; rows are decoded on first access and cached."""
+
+    def __init__(self, buf):
+        if sys.byteorder != "little":
+            raise CatalogueError(["catalogue snapshots are little-endian; compile in memory on this host"])
+        if len(buf) < _HEADER.size:
+            raise CatalogueError(["catalogue snapshot is truncated"])
+        fields = _HEADER.unpack_from(buf, 0)
+        magic, fmt, content_hash, stamp = fields[:4]
+        if magic != _MAGIC or fmt != _FORMAT:
+            raise CatalogueError(["not a catalogue snapshot (or an older format); recompile it"])
+        self._buf = buf
+        self.content_hash: str = content_hash.hex()
+        self.source_stamp: bytes = stamp
+        self.n_locations, self.n_questions, self.n_categories = fields[4:7]
+        offsets = dict(zip(_SECTIONS, fields[8:]))
+        if offsets["end"] != len(buf):
+            raise CatalogueError(["catalogue snapshot is truncated"])
+        view = memoryview(buf)
+
+        def column(name: str, fmt: str, count: int) -> memoryview:
+            start = offsets[name]
+            return view[start:start + count * struct.calcsize(fmt)].cast(fmt)
+
+        n_strings = fields[7]
+        self._loc_names = column("loc_names", "I", self.n_locations)
+        self._loc_coords = column("loc_coords", "d", 2 * self.n_locations)
+        self._que_ids = column("que_ids", "i", self.n_questions)
+        self._que_rows = view[offsets["que_rows"]:offsets["que_rows"] + self.n_questions * _QUE_ROW.size]
+        self._cat_names = column("cat_names", "I", self.n_categories)
+        self._cat_starts = column("cat_starts", "I", self.n_categories + 1)
+        self._cat_members = column("cat_members", "i", self._cat_starts[-1])
+        self._str_offsets = column("str_offsets", "I", n_strings + 1)
+        self._str_blob = view[offsets["str_blob"]:offsets["end"]]
+        self._strings: Dict[int, str] = {}
+        # line text -> (id, question) of the rows this catalogue was compiled from, when it was
+        # compiled in this process (empty for a mapped snapshot); reused by reload_catalogue
+        self.row_cache: Dict[str, tuple] = {}
+
+        self.locations = _Locations(self)
+        self.questions = _Questions(self)
+        self.by_category = _Categories(self)
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id == _NO_STRING:
+            return None
+        value = self._strings.get(string_id)
+        if value is None:
+            a, b = self._str_offsets[string_id], self._str_offsets[string_id + 1]
+            value = self._strings[string_id] = bytes(self._str_blob[a:b]).decode("utf-8")
+        return value
+
+    def question_row(self, position: int) -> tuple:
+        return _QUE_ROW.unpack_from(self._que_rows, position * _QUE_ROW.size)
+
+    def image_infos(self) -> Dict[str, tuple]:
+        # image_path -> (width, height, size, mtime_ns) as validated at compile time
+        infos = {}
+        for i in range(self.n_questions):
+            row = self.question_row(i)
+            infos[self.string(row[0])] = row[4:8]
+        return infos
+
+    def verify(self) -> bool:
+        # full integrity check (reads every byte); the loader only checks header and length
+        return hashlib.sha256(self._buf[_HEADER.size:]).hexdigest() == self.content_hash
+
+
+class _StringColumn():
+    # sorted column of string ids, indexable as strings (for bisect)
+    def __init__(self, catalogue: Catalogue, ids: memoryview):
+        self._catalogue, self._ids = catalogue, ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, i: int) -> str:
+        return self._catalogue.string(self._ids[i])
+
+
+class _Locations(Mapping):
+
+    def __init__(self, catalogue: Catalogue):
+        self._c = catalogue
+        self._names = _StringColumn(catalogue, catalogue._loc_names)
+        self._cache: Dict[str, Coord] = {}
+
+    def __getitem__(self, name: str) -> Coord:
+        coord = self._cache.get(name)
+        if coord is None:
+            i = bisect.bisect_left(self._names, name)
+            if i == len(self._names) or self._names[i] != name:
+                raise KeyError(name)
+            coord = self._cache[name] = (self._c._loc_coords[2 * i], self._c._loc_coords[2 * i + 1])
+        return coord
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._names[i] for i in range(len(self._names)))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+class _Questions(Mapping):
+
+    def __init__(self, catalogue: Catalogue):
+        self._c = catalogue
+        self._cache: Dict[int, Question] = {}
+
+    def __getitem__(self, qid: int) -> Question:
+        question = self._cache.get(qid)
+        if question is None:
+            ids = self._c._que_ids
+            i = bisect.bisect_left(ids, qid)
+            if i == len(ids) or ids[i] != qid:
+                raise KeyError(qid)
+            row = self._c.question_row(i)
+            s = self._c.string
+            question = self._cache[qid] = Question(image_path=s(row[0]), location=s(row[1]),
+                                                   category=s(row[2]), comment=s(row[3]))
+        return question
+
+    def __contains__(self, qid: object) -> bool:
+        ids = self._c._que_ids
+        if not isinstance(qid, int):
+            return False
+        i = bisect.bisect_left(ids, qid)
+        return i < len(ids) and ids[i] == qid
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._c._que_ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self._c._que_ids)
+
+
+class _Categories(Mapping):
+    # category -> question ids, ascending
+
+    def __init__(self, catalogue: Catalogue):
+        self._c = catalogue
+        self._names = _StringColumn(catalogue, catalogue._cat_names)
+        self._cache: Dict[str, List[int]] = {}
+
+    def __getitem__(self, name: str) -> List[int]:
+        ids = self._cache.get(name)
+        if ids is None:
+            i = bisect.bisect_left(self._names, name)
+            if i == len(self._names) or self._names[i] != name:
+                raise KeyError(name)
+            a, b = self._c._cat_starts[i], self._c._cat_starts[i + 1]
+            ids = self._cache[name] = self._c._cat_members[a:b].tolist()
+        return ids
+
+    def __iter__(self) -> Iterator[str]:
+        return (self._names[i] for i in range(len(self._names)))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+def map_snapshot(path: str = snapshot_path) -> Catalogue:
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return Catalogue(buf)
+
+
+def write_snapshot(data: bytes, path: str = snapshot_path) -> None:
+    # atomic replace: a running server keeps its own mapping of the old file
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def open_catalogue(loc_path: str = loc_sheet_path, que_path: str = que_sheet_path,
+                   path: str = snapshot_path) -> Catalogue:
+    """The snapshot if it was compiled from the current CSV files, otherwise the CSV files
+    compiled in memory. Raises CatalogueError for invalid data."""
+    previous = None
+    if os.path.exists(path):
+        try:
+            previous = map_snapshot(path)
+            if previous.source_stamp == source_stamp(loc_path, que_path):
+                return previous
+            print(f"[INFO] {path} is older than the CSV files or images; compiling in memory (run `python catalogue.py`).")
+        except CatalogueError as e:
+            print(f"[WARN] ignoring {path}: {e}")
+    row_cache: Dict[str, tuple] = {}
+    catalogue = Catalogue(compile_catalogue(loc_path, que_path, previous.image_infos() if previous else None, row_cache))
+    catalogue.row_cache = row_cache
+    return catalogue
+
+
+def reload_catalogue(previous: Catalogue, loc_path: str = loc_sheet_path, que_path: str = que_sheet_path,
+                     path: Optional[str] = snapshot_path) -> Tuple[Catalogue, Dict[str, int]]:
+    """Compile the CSV files again, reusing what `previous` already validated: rows whose text
+    is unchanged are not parsed again and images whose size and mtime are unchanged are not
+    reopened. Returns `previous` itself if the content did not change. On success the snapshot
+    is rewritten (when `path` is given) so the next start maps it. Raises CatalogueError."""
+    stats = {"rows_parsed": 0, "images_checked": 0}
+    if previous.source_stamp == source_stamp(loc_path, que_path):
+        return previous, stats
+    # copied: rows parsed by a failed reload must not leak into the live catalogue's cache
+    row_cache = dict(previous.row_cache)
+    data = compile_catalogue(loc_path, que_path, previous.image_infos(), row_cache, stats)
+    catalogue = Catalogue(data)
+    catalogue.row_cache = row_cache
+    if catalogue.content_hash == previous.content_hash:
+        # same rows (e.g. only blank lines changed): keep the version rooms are pinned to
+        previous.source_stamp, previous.row_cache = catalogue.source_stamp, row_cache
+        catalogue = previous
+    if path is not None:
+        try:
+            write_snapshot(data, path)
+        except OSError as e:
+            print(f"[WARN] catalogue reloaded but {path} could not be written: {e}")
+    return catalogue, stats
+
+
+def parse_args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Validate the question catalogue and compile its snapshot.")
+    parser.add_argument("--check", action="store_true", help="Validate only; do not write the snapshot.")
+    parser.add_argument("--out", default=snapshot_path, help=f"Snapshot file (default: {snapshot_path}).")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    previous = None
+    if os.path.exists(args.out):
+        try:
+            previous = map_snapshot(args.out).image_infos()
+        except CatalogueError:
+            pass
+    try:
+        data = compile_catalogue(image_cache=previous)
+    except CatalogueError as e:
+        sys.exit(str(e))
+    catalogue = Catalogue(data)
+    print(f"catalogue OK: {catalogue.n_locations} locations, {catalogue.n_questions} questions, "
+          f"{catalogue.n_categories} categories, {len(data)} bytes, sha256 {catalogue.content_hash}")
+    if not args.check:
+        write_snapshot(data, args.out)
+        print(f"written to {args.out}")
@@ -0,0 +1,42 @@
+import json
+import os
+from typing import Any, Callable, Dict
+
+# JSON encoding for API responses and pushed state (SSE, WebSocket).
+#
+# `dumps(obj) -> str` is the encoder in use: orjson when it is installed (`pip install orjson`,
+# several times faster), otherwise the standard library with compact separators. Pick one
+# explicitly with GGG_JSON=json|orjson or use(name). Output is always compact, single-line UTF-8,
+# so it can go straight into an SSE `data:` line. The app routes jsonify through it as well.
+
+try:
+    import orjson  # optional: faster encoder
+except ImportError:
+    orjson = None
+
+
+def _stdlib_dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def _orjson_dumps(obj: Any) -> str:
+    return orjson.dumps(obj).decode("utf-8")
+
+
+# name -> encoder; register others here
+encoders: Dict[str, Callable[[Any], str]] = {"json": _stdlib_dumps}
+if orjson is not None:
+    encoders["orjson"] = _orjson_dumps
+
+name: str = ""
+dumps: Callable[[Any], str] = _stdlib_dumps
+
+
+def use(encoder: str) -> None:
+    global name, dumps
+    if encoder not in encoders:
+        raise ValueError(f"JSON encoder {encoder!r} is not available (have: {', '.join(encoders)})")
+    name, dumps = encoder, encoders[encoder]
+
+
+use(os.environ.get("GGG_JSON") or ("orjson" if orjson is not None else "json"))
@@ -1,42 +1,81 @@
-import time
-from typing import Iterable, Dict, Optional, List, Callable
 import os
+import time
+from array import array
+from typing import Dict, Optional, List, Callable, NamedTuple, Tuple
+import functools
+import hashlib
+import secrets
 import threading
+import uuid
 
 from defs import *
-
-# hyperparameters for database paths
-
-loc_sheet_path = "data/locations.csv" # format: loc, lat, lon (no header)
-que_sheet_path = "data/questions.csv" # format: global_id, image_filename, loc, category (no header)
-
-que_image_dir = "dataset/" # relative to static/ folder
-
-# global, shared datasets (room-independent)
-# loc -> (lat, lon)
-loc_db: Dict[Loc, Coord] = {}
-
-# global index -> Question (shared catalogue)
-que_db: Dict[int, Question] = {}
+import catalogue as catalogue_mod
+import lockstats
+import metrics
+import store
+from scheduler import phases
+
+# global, shared datasets (room-independent), read from the compiled catalogue (see catalogue.py).
+# `catalogue` is the single reference new rooms draw from: its `locations` (loc -> (lat, lon)),
+# `questions` (global index -> Question) and `by_category` (category -> ascending question ids)
+# are swapped together by replacing it. Rooms pin the version they started with (see
+# room_catalogue), so a reload never changes the questions of a game in progress.
+catalogue: Optional["catalogue_mod.Catalogue"] = None
+
+# content hash -> catalogue, for every version a live room may still be pinned to
+catalogues: Dict[str, "catalogue_mod.Catalogue"] = {}
+# serializes reloads, and room creation against pruning old versions
+_catalogue_lock = threading.Lock()
+
+# hyperparameters for catalogue reloads
+catalogue_watch_interval = 2.0  # seconds between checks of the CSV files and images by the watcher
 
 # Per-room runtime state (ephemeral)
 
+class RoomSnapshot(NamedTuple):
+    # immutable copy of everything a client view needs, taken under one room lock
+    version: str                                 # epoch.version at the time of the copy
+    catalogue_version: str                       # content hash of the room's pinned catalogue
+    round_index: int
+    question_id: Optional[int]                   # None if the schedule ran out
+    next_question_id: Optional[int]
+    dmg_mult: float
+    team_hp: Tuple[float, float]                 # per-team tuples are indexed by Team.slot
+    team_coord: Tuple[Optional[Coord], Optional[Coord]]  # opponent's coord hidden until reveal
+    team_answered: Tuple[bool, bool]
+    team_ready_next: Tuple[bool, bool]
+    answer_revealed: bool
+    phase_started_at: float
+    last_damage_applied_round: Optional[int]
+    has_next: bool
+    has_prev: bool
+
 class RoomState():
+    # Kept small (a few hundred bytes plus the lock) so one worker can hold thousands of rooms:
+    # __slots__ instead of a __dict__, per-team fields as two-element lists indexed by
+    # Team.slot, the schedule as a packed int array, and the damage multiplier selector shared
+    # by all rooms (see defs.get_dmg_mult_selector).
+    __slots__ = (
+        "seed", "dmg_mult_selector", "schedule", "round_index", "team_hp", "team_coord",
+        "team_answered", "team_ready_next", "last_damage_applied_round", "phase_started_at",
+        "epoch", "version", "last_active_at", "catalogue_version", "lock",
+    )
+
     # sampler
-    category_sampler: Optional[Iterable[Category]]
-    question_sampler: Iterable[int]
     dmg_mult_selector: Callable[[int], float]
     
-    # persistent history
-    que_history: List[int]
+    # question ids for every round, drawn up front (read-only afterwards)
+    schedule: "array[int]"
     round_index: int
-    team_hp: Dict[Team, float]
+
+    # per-team fields, indexed by Team.slot (blue, red)
+    team_hp: List[float]
     
     # round state
-    team_coord: Dict[Team, Optional[Coord]]
+    team_coord: List[Optional[Coord]]
     
-    team_answered: Dict[Team, bool]
-    team_ready_next: Dict[Team, bool]
+    team_answered: List[bool]
+    team_ready_next: List[bool]
     
     # track if damage has been applied for the current round to avoid double-subtraction
     last_damage_applied_round: Optional[int]
@@ -44,36 +83,34 @@ class RoomState():
     # server-side timestamp
     phase_started_at: float
 
-    # per-room lock
-    lock: Optional[threading.Lock]
+    # bumped on every mutation; (epoch, version) identifies a unique room state
+    epoch: str
+    version: int
+
+    # time of the last mutation, for the idle reaper (see lobby.reap_rooms)
+    last_active_at: float
+
+    # content hash of the catalogue the schedule was drawn from (see room_catalogue)
+    catalogue_version: str
+
+    # per-room lock (re-entrant: guarded setters may call each other)
+    lock: Optional[threading.RLock]
     
-    def __init__(self, seed: int):
-        # sampler (fresh per instance)
-        self.category_sampler = get_category_sampler(seed)
-        self.question_sampler = get_question_sampler(seed)
+    def __init__(self, seed: int, cat: "catalogue_mod.Catalogue"):
+        self.seed = seed
+        # shared across rooms; nothing per-room is allocated for it
         self.dmg_mult_selector = get_dmg_mult_selector(seed)
 
-        # persistent history
-        self.que_history: List[int] = []
+        # whole game drawn once from the room's seed, from the catalogue it stays pinned to
+        self.catalogue_version = cat.content_hash
+        self.schedule = array("i", draw_schedule(seed, cat))
         self.round_index: int = -1
-        self.team_hp: Dict[Team, float] = {
-            Team.BLUE: max_hp,
-            Team.RED: max_hp
-        }
+        self.team_hp = [max_hp, max_hp]
 
         # round state
-        self.team_coord: Dict[Team, Optional[Coord]] = {
-            Team.BLUE: None,
-            Team.RED: None
-        }
-        self.team_answered: Dict[Team, bool] = {
-            Team.BLUE: False,
-            Team.RED: False
-        }
-        self.team_ready_next: Dict[Team, bool] = {
-            Team.BLUE: False,
-            Team.RED: False
-        }
+        self.team_coord = [None, None]
+        self.team_answered = [False, False]
+        self.team_ready_next = [False, False]
 
         # track if damage already applied
         self.last_damage_applied_round: Optional[int] = None
@@ -81,96 +118,182 @@ class RoomState():
         # phase tracking for synced countdown
         self.phase_started_at = time.time()
 
+        # state versioning (epoch distinguishes a re-created room with the same id)
+        self.epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.last_active_at = time.time()
+
         # per-room lock
-        self.lock = threading.Lock()
+        self.lock = threading.RLock()
+
+    # pickling (shared stores): the selector and the lock are process-local and rebuilt from the seed
+
+    def __getstate__(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__ if name not in ("dmg_mult_selector", "lock")}
+
+    def __setstate__(self, state: dict) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.dmg_mult_selector = get_dmg_mult_selector(self.seed)
+        self.lock = threading.RLock()
 
     @property
     def answer_revealed(self) -> bool:
-        return all(self.team_answered.values())
+        return all(self.team_answered)
 
     @property
     def both_ready_next(self) -> bool:
-        return all(self.team_ready_next.values())
+        return all(self.team_ready_next)
+
+    def touch(self) -> None:
+        self.version += 1
+        self.last_active_at = time.time()
+
+    def snapshot(self, team: Optional[Team] = None) -> RoomSnapshot:
+        # caller holds self.lock; `team` decides whose coordinate is visible before the reveal
+        idx = self.round_index
+        revealed = self.answer_revealed
+        if revealed:
+            coords = tuple(self.team_coord)
+        else:
+            coords = tuple(c if team is not None and i == team.slot else None for i, c in enumerate(self.team_coord))
+        return RoomSnapshot(
+            version=f"{self.epoch}.{self.version}",
+            catalogue_version=self.catalogue_version,
+            round_index=idx,
+            question_id=self.schedule[idx] if 0 <= idx < len(self.schedule) else None,
+            next_question_id=self.schedule[idx + 1] if 0 <= idx + 1 < len(self.schedule) else None,
+            dmg_mult=self.dmg_mult_selector(idx),
+            team_hp=tuple(self.team_hp),
+            team_coord=coords,
+            team_answered=tuple(self.team_answered),
+            team_ready_next=tuple(self.team_ready_next),
+            answer_revealed=revealed,
+            phase_started_at=self.phase_started_at,
+            last_damage_applied_round=self.last_damage_applied_round,
+            has_next=idx + 1 < max_rounds,
+            has_prev=idx - 1 >= 0,
+        )
 
     def force_answer_reveal(self) -> None:
-        for team in self.team_answered:
-            self.team_answered[team] = True
+        self.team_answered[:] = (True, True)
+        self.touch()
 
     def reset_round_status(self) -> None:
-        self.team_coord = {Team.BLUE: None, Team.RED: None}
-        self.team_answered = {Team.BLUE: False, Team.RED: False}
-        self.team_ready_next = {Team.BLUE: False, Team.RED: False}
+        self.team_coord[:] = (None, None)
+        self.team_answered[:] = (False, False)
+        self.team_ready_next[:] = (False, False)
         self.last_damage_applied_round = None
         # start guess phase and timestamp
         self.phase_started_at = time.time()
-        
-# rooms registry
-rooms: Dict[str, RoomState] = {}
+        self.touch()
+
+class RoomNotFound(KeyError):
+    # unknown room ids are rejected instead of allocating a room (the app answers 404)
+    pass
+
+class RoomLimitError(RuntimeError):
+    pass
+
+# derive each room's seed from its id instead of drawing a random one, so runs are reproducible
+# (benchmarks, debugging); otherwise every game, even a rematch in the same room, is a new draw
+seed_from_room_id = False
+
+def room_seed(room_id: str) -> int:
+    if seed_from_room_id:
+        return int.from_bytes(hashlib.sha256(room_id.encode("utf-8")).digest()[:8], "little")
+    return secrets.randbits(64)
+
+# hard cap on live rooms; new rooms are refused beyond it until the reaper frees some.
+# Counted per process: under serve.py each worker holds at most this many (its share of the
+# rooms), so the host total is workers * max_live_rooms. A room takes about 1 KB, so the
+# default bounds a worker's rooms to tens of MB. Set with --max-rooms or GGG_MAX_LIVE_ROOMS.
+max_live_rooms = int(os.environ.get("GGG_MAX_LIVE_ROOMS", 20000))
+
+# rooms registry (in-process dict by default; see store.py for the shared backend)
+rooms: store.RoomStore = store.open_room_store()
+
+def configure_store(url: str) -> None:
+    global rooms
+    rooms = store.open_room_store(url)
 
 def room_lock_guard(func):
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         room_id = kwargs.get('room_id') or args[-1]
-        room = get_room(room_id)
-        if room.lock is None:
-            raise RuntimeError("Room lock is not initialized.")
-        with room.lock:
+        get_room(room_id)
+        if lockstats.enabled:
+            return _timed_room_call(func, room_id, args, kwargs)
+        # exclusive for this room across threads (and workers, for shared stores);
+        # changes made by func are persisted when the transaction closes
+        with rooms.transaction(room_id):
             return func(*args, **kwargs)
     return wrapper
 
+def _timed_room_call(func, room_id: str, args, kwargs):
+    # room_lock_guard with contention statistics (see lockstats.py)
+    requested = time.perf_counter()
+    with rooms.transaction(room_id):
+        entered = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            lockstats.record("room", room_id, func.__name__, entered - requested, time.perf_counter() - entered)
+
 def get_room(room_id: str) -> RoomState:
-    if room_id not in rooms:
-        # rooms[room_id] = RoomState()
-        # bugfix: seed was not passed to constructor
-        rooms[room_id] = RoomState(seed=sum(ord(c) for c in room_id))
-    return rooms[room_id]
+    room = rooms.get(room_id)
+    if room is None:
+        # rooms are only created by init_room (i.e. when the lobby starts a game)
+        raise RoomNotFound(room_id)
+    return room
 
-def sample_question(room_id: str) -> Question:
+def at_room_capacity() -> bool:
+    return len(rooms) >= max_live_rooms
+
+def draw_schedule(seed: int, cat: Optional["catalogue_mod.Catalogue"] = None) -> List[int]:
     # two mode:
     # 1. if category_sampler is provided, question_sampler is just rng for choosing one from valid questions. 
     # 2. if category_sampler is None, question_sampler must provide non-repeating global indices (i.e., select a series of questions directly)
     
-    # in either case, any iterable raises StopIteration will terminate the sampling process.
+    # in either case, any iterable raising StopIteration (or running out of questions) ends the
+    # schedule early; get_question_at reports rounds beyond it.
+    cat = cat or catalogue
+    category_sampler = get_category_sampler(seed)
+    question_sampler = get_question_sampler(seed)
+    schedule: List[int] = []
+    # per-category pools of unused ids, copied lazily; drawn ids are swap-removed in O(1)
+    remaining: Dict[Category, List[int]] = {}
     try:
-        room = get_room(room_id)
-        if room.category_sampler is not None:
-            cat = next(room.category_sampler)
-            valid_ques = [idx for idx, q in que_db.items() if q.category == cat and idx not in room.que_history]
-            if not valid_ques:
-                raise RuntimeError(f"No more valid questions available for category {cat}.")
-            if room.question_sampler is None:
-                raise RuntimeError("question_sampler is not configured for this room.")
-            idx = next(room.question_sampler) % len(valid_ques)
-            idx = valid_ques[idx]
-            room.que_history.append(idx)
-            return que_db[idx]
-        else:
-            if room.question_sampler is None:
-                raise RuntimeError("question_sampler is not configured for this room.")
-            idx = next(room.question_sampler)
-            if idx in room.que_history:
-                raise RuntimeError(f"Question index {idx} has already been used.")
-            elif idx not in que_db:
-                raise RuntimeError(f"Question index {idx} is out of bounds.")
-            room.que_history.append(idx)
-            return que_db[idx]
-
+        while len(schedule) < max_rounds:
+            if category_sampler is not None:
+                category = next(category_sampler)
+                pool = remaining.get(category)
+                if pool is None:
+                    pool = remaining[category] = list(cat.by_category.get(category, ()))
+                if not pool:
+                    print(f"[WARN] No more valid questions available for category {category}.")
+                    break
+                pos = next(question_sampler) % len(pool)
+                pool[pos], pool[-1] = pool[-1], pool[pos]
+                schedule.append(pool.pop())
+            else:
+                idx = next(question_sampler)
+                if idx in schedule:
+                    raise RuntimeError(f"Question index {idx} has already been used.")
+                elif idx not in cat.questions:
+                    raise RuntimeError(f"Question index {idx} is out of bounds.")
+                schedule.append(idx)
     except StopIteration:
-        raise StopIteration
-        # raise RuntimeError("Category selector or question sampler is exhausted.")
+        pass
+    return schedule
 
-# get question at specific history index
-# if the index is out of current history range, sample more questions until reaching that index
-@room_lock_guard
+# get question at specific round index: a plain lookup into the room's precomputed schedule
 def get_question_at(target_index: int, room_id: str) -> Question:
     assert 0 <= target_index < max_rounds, f"Target index {target_index} out of bounds."
     room = get_room(room_id)
-    while len(room.que_history) <= target_index:
-        try:
-            sample_question(room_id)
-        except StopIteration:
-            raise RuntimeError("No more questions can be sampled despite the target index is smaller than max_rounds. Check the samplers.")
-    room.round_index = target_index
-    return que_db[room.que_history[target_index]]
+    if target_index >= len(room.schedule):
+        raise RuntimeError("No more questions can be sampled despite the target index is smaller than max_rounds. Check the samplers.")
+    return catalogue_for(room.catalogue_version).questions[room.schedule[target_index]]
 
 def get_current_question(room_id: str) -> Question:
     return get_question_at(get_current_round(room_id), room_id)
@@ -178,8 +301,25 @@ def get_current_question(room_id: str) -> Question:
 def get_current_round(room_id: str) -> int:
     return get_room(room_id).round_index
 
+@room_lock_guard
 def set_current_round(target_index: int, room_id: str):
-    get_question_at(target_index, room_id)
+    get_question_at(target_index, room_id)  # validates the round exists
+    room = get_room(room_id)
+    if room.round_index != target_index:
+        room.round_index = target_index
+        room.touch()
+
+@room_lock_guard
+def advance_round(expected_index: int, room_id: str) -> bool:
+    # compare-and-set round transition: only the first caller that still sees
+    # `expected_index` moves the room on; concurrent duplicates are no-ops
+    room = get_room(room_id)
+    if room.round_index != expected_index or expected_index + 1 >= max_rounds:
+        return False
+    set_current_round(expected_index + 1, room_id)
+    room.reset_round_status()
+    schedule_phase_deadline(room_id)
+    return True
     
 def has_next_round(room_id: str) -> bool:
     return get_room(room_id).round_index + 1 < max_rounds
@@ -187,46 +327,78 @@ def has_next_round(room_id: str) -> bool:
 def has_prev_round(room_id: str) -> bool:
     return get_room(room_id).round_index - 1 >= 0
     
-def get_dmg_mult(room_id: str) -> float:
+def get_room_version(room_id: str) -> str:
     room = get_room(room_id)
-    if room.dmg_mult_selector is None:
-        raise RuntimeError("dmg_mult_selector is not configured for this room.")
-    return room.dmg_mult_selector(get_room(room_id).round_index)
+    return f"{room.epoch}.{room.version}"
 
-def get_team_hp(team: Team, room_id: str) -> float:
-    return get_room(room_id).team_hp[team]
+def get_snapshot(room_id: str, team: Optional[Team] = None) -> RoomSnapshot:
+    # one lock acquisition for the whole view; shared stores hand out a private copy anyway
+    room = get_room(room_id)
+    with room.lock:
+        return room.snapshot(team)
 
 @room_lock_guard
 def set_team_hp(team: Team, hp: float, room_id: str):
-    get_room(room_id).team_hp[team] = hp
+    room = get_room(room_id)
+    room.team_hp[team.slot] = hp
+    room.touch()
     
 def get_team_coord(team: Team, room_id: str) -> Optional[Coord]:
-    return get_room(room_id).team_coord[team]
+    return get_room(room_id).team_coord[team.slot]
 
 @room_lock_guard
 def set_team_coord(team: Team, coord: Optional[Coord], room_id: str):
-    get_room(room_id).team_coord[team] = coord
+    room = get_room(room_id)
+    room.team_coord[team.slot] = coord
+    room.touch()
 
 @room_lock_guard
 def set_team_answered(team: Team, answered: bool, room_id: str) -> None:
     room = get_room(room_id)
     before = room.answer_revealed
-    room.team_answered[team] = answered
+    room.team_answered[team.slot] = answered
     after = room.answer_revealed
     if before != after:
         # phase started at update
         room.phase_started_at = time.time()
+        schedule_phase_deadline(room_id)
+    room.touch()
+
+@room_lock_guard
+def apply_round_damage(round_number: int, damage: Dict[Team, float], room_id: str) -> bool:
+    # subtract `damage` from HP once per round (round_number is 1-indexed, as shown to clients);
+    # check and update happen under the same lock, so concurrent reveals cannot double-apply,
+    # and a caller that saw an earlier round cannot charge its damage to the current one
+    room = get_room(room_id)
+    if room.last_damage_applied_round == round_number or room.round_index + 1 != round_number:
+        return False
+    for team, dmg in damage.items():
+        room.team_hp[team.slot] -= dmg
+    room.last_damage_applied_round = round_number
+    room.touch()
+    metrics.inc("ggg_rounds_completed_total")
+    return True
+
+@room_lock_guard
+def force_answer_reveal(room_id: str) -> None:
+    get_room(room_id).force_answer_reveal()
 
 @room_lock_guard
 def reset_round_status(room_id: str) -> None:
     get_room(room_id).reset_round_status()
+    schedule_phase_deadline(room_id)
 
 def get_answer_revealed(room_id: str) -> bool:
     return get_room(room_id).answer_revealed
 
+def get_team_answered(team: Team, room_id: str) -> bool:
+    return get_room(room_id).team_answered[team.slot]
+
 @room_lock_guard
 def set_team_ready_next(team: Team, ready: bool, room_id: str) -> None:
-    get_room(room_id).team_ready_next[team] = ready
+    room = get_room(room_id)
+    room.team_ready_next[team.slot] = ready
+    room.touch()
 
 def get_both_ready_next(room_id: str) -> bool:
     return get_room(room_id).both_ready_next
@@ -234,45 +406,140 @@ def get_both_ready_next(room_id: str) -> bool:
 # def get_phase(room_id: str) -> str:
 #     return get_room(room_id)
 
-def get_phase_started_at(room_id: str) -> float:
-    return get_room(room_id).phase_started_at
+def get_phase_token(room_id: str) -> tuple:
+    # identifies one phase of one round; stale once the room moves on
+    room = get_room(room_id)
+    phase = "agree_next" if room.answer_revealed else "guess"
+    return (room.round_index, phase, room.phase_started_at)
 
-def init_database():    
-    # load loc_db
-    # use 'utf-8-sig' to gracefully handle files that may include a UTF-8 BOM
-    with open(loc_sheet_path, "r", encoding="utf-8-sig") as loc_file:
-        for line in loc_file:
-            line = line.strip()
-            if not line:
-                continue
-            loc, lat_str, lon_str = line.split(",")
-            lat, lon = float(lat_str), float(lon_str)
-            loc_db[loc] = (lat, lon)
-    
-    # load que_db (supports 4 or 5 columns: id, image_filename, loc, category[, comment])
-    # use 'utf-8-sig' so a BOM on the first line doesn't end up in the id string
-    with open(que_sheet_path, "r", encoding="utf-8-sig") as que_file:
-        for line in que_file:
-            line = line.strip()
-            if not line:
-                continue
-            parts = [p.strip() for p in line.split(",")]
-            if len(parts) < 4:
-                # malformed row, skip
-                print(f"[WARN] questions.csv row has <4 columns and will be skipped: {line}")
-                continue
-            id_str, image_filename, loc, category = parts[:4]
-            comment = parts[4] if len(parts) >= 5 else None
-            image_path = os.path.join(que_image_dir, image_filename)
-            q = Question(image_path=image_path, location=loc, category=category, comment=comment)
-            que_db[int(id_str)] = q
+def schedule_phase_deadline(room_id: str) -> None:
+    # hand the current phase's deadline to the server-side scheduler
+    room = get_room(room_id)
+    timeout = agree_next_timeout if room.answer_revealed else place_guess_timeout
+    phases.schedule(room_id, room.phase_started_at + timeout, get_phase_token(room_id))
+
+@room_lock_guard
+def expire_guess_phase(token: tuple, default_coord: Coord, room_id: str) -> bool:
+    # guess deadline passed: submit every team that has not, placing `default_coord` for teams
+    # without a guess. Returns False (and does nothing) if the room already left that phase.
+    if get_phase_token(room_id) != token:
+        return False
+    room = get_room(room_id)
+    for team in Team:
+        if not room.team_answered[team.slot]:
+            if room.team_coord[team.slot] is None:
+                set_team_coord(team, default_coord, room_id)
+            set_team_answered(team, True, room_id)
+    return True
+
+def init_database():
+    # map the compiled catalogue (or compile the CSV files in memory); invalid data raises
+    # catalogue.CatalogueError here, before the server accepts any request
+    install_catalogue(catalogue_mod.open_catalogue())
 
     # Do not create/reset any default room here; rooms are created via init_room
 
-def init_room(room_id: str):
+def catalogue_for(version: str) -> "catalogue_mod.Catalogue":
+    # a room's pinned catalogue; a version this process never loaded (a room created by another
+    # worker of a shared store after a reload there) falls back to the current one
+    return catalogues.get(version) or catalogue
+
+def room_catalogue(room_id: str) -> "catalogue_mod.Catalogue":
+    return catalogue_for(get_room(room_id).catalogue_version)
+
+def install_catalogue(new: "catalogue_mod.Catalogue") -> None:
+    # new rooms draw from `new` from here on; running rooms keep their pinned version
+    global catalogue
+    with _catalogue_lock:
+        catalogues[new.content_hash] = new
+        catalogue = new
+        _prune_catalogues()
+
+def _prune_catalogues() -> None:
+    # caller holds _catalogue_lock; drops versions no live room is pinned to
+    if len(catalogues) <= 1:
+        return
+    pinned = {catalogue.content_hash}
+    for room_id in rooms.ids():
+        room = rooms.get(room_id)
+        if room is not None:
+            pinned.add(room.catalogue_version)
+    for version in [v for v in catalogues if v not in pinned]:
+        del catalogues[version]
+
+def prune_catalogues() -> None:
+    # called by the reaper, so versions are released once their last room is gone
+    if len(catalogues) > 1:
+        with _catalogue_lock:
+            _prune_catalogues()
+
+_reload_lock = threading.Lock()
+
+def reload_catalogue() -> dict:
+    """Compile the CSV files again (incrementally, see catalogue.reload_catalogue) and make the
+    result current. Raises catalogue.CatalogueError for invalid data; the current catalogue
+    stays in place then. Returns what changed."""
+    with _reload_lock:
+        previous = catalogue
+        started = time.perf_counter()
+        new, stats = catalogue_mod.reload_catalogue(previous)
+        if new is not previous:
+            install_catalogue(new)
+        with _catalogue_lock:
+            loaded = sorted(catalogues)
+        return {
+            "changed": new is not previous,
+            "version": new.content_hash,
+            "previous": previous.content_hash,
+            "locations": new.n_locations,
+            "questions": new.n_questions,
+            "rows_parsed": stats["rows_parsed"],
+            "images_checked": stats["images_checked"],
+            "loaded_versions": loaded,
+            "seconds": round(time.perf_counter() - started, 4),
+        }
+
+_watcher: Optional[threading.Thread] = None
+
+def _watch_loop() -> None:
+    seen = catalogue_mod.source_stamp()
+    while True:
+        time.sleep(catalogue_watch_interval)
+        try:
+            stamp = catalogue_mod.source_stamp()
+            if stamp == seen:
+                continue
+            seen = stamp
+            result = reload_catalogue()
+            if result["changed"]:
+                print(f"[INFO] catalogue reloaded: version {result['version'][:12]}, "
+                      f"{result['rows_parsed']} row(s) parsed, {result['images_checked']} image(s) checked")
+        except catalogue_mod.CatalogueError as e:
+            print(f"[WARN] catalogue change rejected, keeping version {catalogue.content_hash[:12]}: {e}")
+        except Exception as e:
+            print(f"[WARN] catalogue watcher pass failed: {e!r}")
+
+def watch_catalogue() -> None:
+    # reload whenever the CSV files under data/ or the images they reference change (compared by
+    # catalogue.source_stamp; one background thread per process)
+    global _watcher
+    with _reload_lock:
+        if _watcher is None:
+            _watcher = threading.Thread(target=_watch_loop, name="catalogue-watcher", daemon=True)
+            _watcher.start()
+
+def init_room(room_id: str, enforce_cap: bool = True, epoch: Optional[str] = None):
     # Initialize a new room with its own samplers and selectors
+    # (the lobby checks capacity itself before pairing, so it passes enforce_cap=False;
+    # it also passes its game id as the epoch, see lobby.room_game)
     if room_id in rooms:
         pass
     else:
-        rooms[room_id] = RoomState(seed=sum(ord(c) for c in room_id))
+        if enforce_cap and at_room_capacity():
+            raise RoomLimitError(f"Live room limit ({max_live_rooms}) reached.")
+        with _catalogue_lock:  # pin and insert before prune_catalogues can look at the rooms
+            room = RoomState(seed=room_seed(room_id), cat=catalogue)
+            if epoch is not None:
+                room.epoch = epoch
+            rooms.setdefault(room_id, room)
     set_current_round(0, room_id)
\ No newline at end of file
@@ -1,19 +1,23 @@
-from typing import Tuple, Iterable, Optional, Callable
+from typing import Tuple, Iterable, Optional, Callable, NamedTuple
 
 from enum import Enum
 
-from pydantic import BaseModel
-
 class Team(str, Enum):
     BLUE = "Blue"
     RED = "Red"
 
+    @property
+    def slot(self) -> int:
+        # index into RoomState's per-team lists
+        return 0 if self is Team.BLUE else 1
+
 Coord = Tuple[float, float]
 Sampler = Iterable
 Loc = str
 Category = str
 
-class Question(BaseModel):
+class Question(NamedTuple):
+    # plain record: one per catalogue row, read on every state request
     image_path: str
     location: Loc
     category: Category
@@ -28,6 +32,10 @@ max_hp = 100.0
 
 place_guess_timeout = 30 # in seconds
 agree_next_timeout = 10 # in seconds
+default_guess: Tuple[float, float] = (0.5, 0.5) # placed for a team that lets the guess timer run out
+
+# push each team's full state over SSE on reveal/next_round instead of a bare refresh ping
+sse_push_state = True
 
 # remark: the internal coordinate system normalizes to [0, 1]
 distance_scale = 100
@@ -38,12 +46,20 @@ def get_category_sampler(seed: int) -> Sampler[Category]:
     
 def get_question_sampler(seed: int) -> Sampler:
     import random
+    rng = random.Random(seed)  # per-room generator; never touches the global random state
     def sampler():
         while True:
-            yield random.randint(0, 1000000)
+            yield rng.randint(0, 1000000)
     return sampler()
 
+# damage multiplier by round index: x1 for the first half, x2 for the next quarter, x4 afterwards.
+# One immutable table shared by every room.
+_split = [max_rounds // 2, max_rounds // 4]
+dmg_mult_table: Tuple[float, ...] = tuple([1.0] * _split[0] + [2.0] * _split[1] + [4.0] * (max_rounds - sum(_split)))
+
+def _table_dmg_mult(idx: int) -> float:
+    return dmg_mult_table[min(idx, len(dmg_mult_table) - 1)]
+
 def get_dmg_mult_selector(seed: int) -> Callable[[int], float]:
-    split = [max_rounds // 2, max_rounds // 4]
-    dmg_mults = [1.0] * split[0] + [2.0] * split[1] + [4.0] * 10000
-    return lambda idx: dmg_mults[idx]
\ No newline at end of file
+    # must not allocate per room: return a shared function (or one cached per seed)
+    return _table_dmg_mult
\ No newline at end of file
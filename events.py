@@ -0,0 +1,202 @@
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+# hyperparameters for the SSE hub
+heartbeat_interval = 15.0  # seconds between keep-alive comments
+reconnect_retry_ms = 2000  # EventSource reconnect delay after a dropped stream (`retry:` field)
+max_subscribers_per_room = 16  # oldest subscriber is evicted beyond this
+subscriber_queue_size = 64  # pending frames per subscriber before it is dropped as too slow
+
+# control frames (compared by identity, never sent verbatim)
+_HEARTBEAT = object()
+_CLOSE = object()
+
+# publish() target meaning "every subscriber regardless of team"
+ALL_TEAMS = object()
+
+
+def format_event(data: str, event: Optional[str] = None, event_id: Optional[str] = None) -> str:
+    # one SSE frame; `data` must already be a single line (e.g. compact JSON)
+    head = ""
+    if event_id is not None:
+        head += f"id: {event_id}\n"
+    if event is not None:
+        head += f"event: {event}\n"
+    return f"{head}data: {data}\n\n"
+
+
+def parse_event(frame: str) -> Tuple[Optional[str], Optional[str], str]:
+    # inverse of format_event for frames produced by it: (event, event_id, data)
+    event = event_id = None
+    data = ""
+    for line in frame.split("\n"):
+        field, _, value = line.partition(": ")
+        if field == "id":
+            event_id = value
+        elif field == "event":
+            event = value
+        elif field == "data":
+            data = value
+    return event, event_id, data
+
+
+class Subscriber():
+    __slots__ = ("room_id", "team", "queue", "closed")
+
+    def __init__(self, room_id: str, team: Optional[str] = None):
+        self.room_id = room_id
+        self.team = team
+        self.queue: "queue.Queue" = queue.Queue(maxsize=subscriber_queue_size)
+        self.closed = False
+
+    def offer(self, frame) -> bool:
+        # never block the publisher; a full queue means the client stopped reading
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except queue.Full:
+            return False
+
+
+class EventHub():
+    """Room-scoped fan-out of server-sent events.
+
+    A single dispatcher thread emits heartbeats to every subscriber so that a
+    dead connection surfaces as a write error, at which point the stream's
+    generator exits and the subscriber is removed. Rooms are dropped entirely
+    via `close_room` once the game ends.
+    """
+
+    def __init__(self, heartbeat: float = heartbeat_interval):
+        self.heartbeat = heartbeat
+        self._lock = threading.Lock()
+        self._rooms: Dict[str, List[Subscriber]] = {}
+        self._dispatcher: Optional[threading.Thread] = None
+
+    # subscription management
+
+    def subscribe(self, room_id: str, team: Optional[str] = None) -> Subscriber:
+        self._ensure_dispatcher()
+        sub = Subscriber(room_id, team)
+        evicted = None
+        with self._lock:
+            subs = self._rooms.setdefault(room_id, [])
+            subs.append(sub)
+            if len(subs) > max_subscribers_per_room:
+                evicted = subs.pop(0)
+        if evicted is not None:
+            self._close(evicted)
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        sub.closed = True
+        with self._lock:
+            subs = self._rooms.get(sub.room_id)
+            if not subs:
+                return
+            try:
+                subs.remove(sub)
+            except ValueError:
+                pass
+            if not subs:
+                del self._rooms[sub.room_id]
+
+    def disconnect(self, sub: Subscriber) -> None:
+        # unsubscribe and wake whoever is reading the subscriber's frames
+        self._drop(sub)
+
+    def close_room(self, room_id: str) -> None:
+        with self._lock:
+            subs = self._rooms.pop(room_id, [])
+        for sub in subs:
+            self._close(sub)
+
+    def subscriber_count(self, room_id: Optional[str] = None) -> int:
+        with self._lock:
+            if room_id is not None:
+                return len(self._rooms.get(room_id, ()))
+            return sum(len(subs) for subs in self._rooms.values())
+
+    def room_ids(self) -> List[str]:
+        with self._lock:
+            return list(self._rooms)
+
+    def teams(self, room_id: str) -> Set[Optional[str]]:
+        # distinct team views currently subscribed to a room
+        with self._lock:
+            return {sub.team for sub in self._rooms.get(room_id, ())}
+
+    # publishing
+
+    def publish(self, room_id: str, msg: str, event: Optional[str] = None,
+                event_id: Optional[str] = None, team: Any = ALL_TEAMS) -> None:
+        frame = format_event(msg, event, event_id)
+        with self._lock:
+            subs = [sub for sub in self._rooms.get(room_id, ()) if team is ALL_TEAMS or sub.team == team]
+        for sub in subs:
+            self.send(sub, frame)
+
+    def send(self, sub: Subscriber, frame: str) -> None:
+        if not sub.closed:
+            if not sub.offer(frame):
+                # slow consumer: cut it loose, the client will reconnect and refetch
+                self._drop(sub)
+
+    def frames(self, sub: Subscriber) -> Iterator[Any]:
+        # raw queued frames until the subscriber is closed; heartbeats come out as None
+        while not sub.closed:
+            frame = sub.queue.get()
+            if frame is _CLOSE:
+                break
+            yield None if frame is _HEARTBEAT else frame
+
+    def stream(self, sub: Subscriber) -> Iterator[str]:
+        try:
+            # tell EventSource how long to wait before reconnecting
+            yield f"retry: {reconnect_retry_ms}\n\n"
+            for frame in self.frames(sub):
+                yield ": ping\n\n" if frame is None else frame
+        finally:
+            # runs on normal exit and when the server closes the generator after a failed write
+            self.unsubscribe(sub)
+
+    # internals
+
+    def _drop(self, sub: Subscriber) -> None:
+        self.unsubscribe(sub)
+        self._close(sub)
+
+    def _close(self, sub: Subscriber) -> None:
+        sub.closed = True
+        try:
+            sub.queue.put_nowait(_CLOSE)
+        except queue.Full:
+            # make room for the close marker; pending frames are moot now
+            try:
+                sub.queue.get_nowait()
+                sub.queue.put_nowait(_CLOSE)
+            except (queue.Empty, queue.Full):
+                pass
+
+    def _ensure_dispatcher(self) -> None:
+        if self._dispatcher is not None:
+            return
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._heartbeat_loop, name="sse-heartbeat", daemon=True)
+                self._dispatcher.start()
+
+    def _heartbeat_loop(self) -> None:
+        while True:
+            time.sleep(self.heartbeat)
+            with self._lock:
+                subs = [sub for room in self._rooms.values() for sub in room]
+            for sub in subs:
+                if not sub.offer(_HEARTBEAT):
+                    self._drop(sub)
+
+
+# process-wide hub shared by app and lobby
+hub = EventHub()
@@ -1,11 +1,19 @@
+import functools
+import heapq
 import threading
 import time
 import uuid
+from collections import OrderedDict
 from enum import Enum
-from typing import Optional, Tuple, List, Dict
+from typing import Optional, Tuple, List, Dict, Callable
 
+import audience
 import database as db
 from defs import Team
+from events import hub
+import lockstats
+import metrics
+import store
 
 class RoomStatus(Enum):
     EMPTY = "empty"
@@ -13,184 +21,413 @@ class RoomStatus(Enum):
     IN_GAME = "in_game"
     ENDED = "ended"
 
-# Tracks lobby room statuses
-room_status: dict[str, RoomStatus] = {}
+# hyperparameters for waiting channels
+WAITER_TIMEOUT = 15.0     # a waiter not seen for this long leaves its queue
+CHANNEL_TTL = 120.0       # after this long unseen, the channel and any unclaimed match are forgotten
+# hyperparameters for the room reaper
+REAP_INTERVAL = 10.0      # seconds between reaper passes
+ROOM_ENDED_TTL = 60.0     # an ended room stays readable this long (final scores), then is destroyed
+ROOM_IDLE_TTL = 1800.0    # a room with no state change for this long is destroyed
+LOBBY_SHARDS = 16         # independent lobby locks (shard 0: quick match, others: by room id)
+LONG_POLL_MAX = 25.0      # longest a poll request is held open waiting for a match
+LIVENESS_INTERVAL = 5.0   # a held poll refreshes its channel's last-seen this often
 
-# Queues
-# Quick match: list of channel_ids
-quick_match_queue: List[str] = []
-# Room match: room_id -> list of channel_ids
-room_queues: Dict[str, List[str]] = {}
+class LobbyState():
+    # One shard of the lobby. Every queue is an insertion-ordered hash (OrderedDict of channel_id
+    # -> time joined), so join, cancel and matching the two oldest waiters are all O(1).
+    def __init__(self):
+        # Tracks lobby room statuses (rooms hashed to this shard)
+        self.room_status: Dict[str, RoomStatus] = {}
 
-# Match results: channel_id -> {room_id, team}
-# Used to pass info back to the request that triggered the match
-match_results: Dict[str, dict] = {}
+        # Queues
+        # Quick match: channel_id -> joined at (used in shard 0 only)
+        self.quick_match_queue: "OrderedDict[str, float]" = OrderedDict()
+        # Room match: room_id -> (channel_id -> joined at)
+        self.room_queues: Dict[str, "OrderedDict[str, float]"] = {}
+        # channel_id -> room it waits for (None: quick match), for O(1) cancel
+        self.waiting: Dict[str, Optional[str]] = {}
 
-# Last seen timestamp for channels (for pruning)
-channel_last_seen: dict[str, float] = {}
+        # Match results: channel_id -> {room_id, team}
+        # Used to pass info back to the request that triggered the match
+        self.match_results: Dict[str, dict] = {}
 
-lobby_lock = threading.Lock()
+        # Last seen timestamp for channels (for pruning)
+        self.channel_last_seen: Dict[str, float] = {}
 
-# Pruning state
-last_prune_time = 0.0
-PRUNE_INTERVAL = 5.0  # Run pruning at most every 5 seconds
+        # (deadline, channel_id) min-heap; entries are re-checked against channel_last_seen
+        # when they come due, so polls never have to touch the heap
+        self.expiry: List[Tuple[float, str]] = []
 
-def lobby_lock_guard(func):
-    def wrapper(*args, **kwargs):
-        with lobby_lock:
-            return func(*args, **kwargs)
-    return wrapper
+        # rooms marked ENDED and not yet destroyed: room_id -> ended at (insertion = time order)
+        self.ended_rooms: Dict[str, float] = {}
 
-def get_room_status(room_id: str) -> RoomStatus:
-    return room_status.get(room_id, RoomStatus.EMPTY)
+        # room_id -> id of the game last started in it (the RoomState epoch), so a worker can
+        # tell a rematch under the same name from the earlier game's leftover room
+        self.room_games: Dict[str, str] = {}
 
-def set_room_status(room_id: str, status: RoomStatus) -> None:
-    room_status[room_id] = status
+# lobby state lives in a store so several worker processes can share it (see store.py)
+lobby_store: store.LobbyStore = store.open_lobby_store(LobbyState, shards=LOBBY_SHARDS)
 
-def mark_channel_seen(channel_id: str) -> None:
-    channel_last_seen[channel_id] = time.time()
+def configure_store(url: str) -> None:
+    global lobby_store
+    lobby_store = store.open_lobby_store(LobbyState, url, shards=LOBBY_SHARDS)
 
-def _prune_stale_waiters_internal(timeout_sec: float = 15) -> None:
-    now = time.time()
-    
-    # Quick match queue
-    global quick_match_queue
-    valid_q = []
-    for ch in quick_match_queue:
-        last = channel_last_seen.get(ch, now)
-        if now - last <= timeout_sec:
-            valid_q.append(ch)
-    quick_match_queue = valid_q
-    
-    # Room queues
-    for room_id, q in list(room_queues.items()):
-        valid_room_q = []
-        for ch in q:
-            last = channel_last_seen.get(ch, now)
-            if now - last <= timeout_sec:
-                valid_room_q.append(ch)
-        room_queues[room_id] = valid_room_q
-        if not valid_room_q:
-            del room_queues[room_id]
-
-    # Cleanup channel_last_seen for very old entries
-    cleanup_threshold = 120.0 # 2 minutes
-    to_remove = []
-    for ch, last in channel_last_seen.items():
-        if now - last > cleanup_threshold:
-            to_remove.append(ch)
-    
-    for ch in to_remove:
-        channel_last_seen.pop(ch, None)
-        match_results.pop(ch, None)
-
-def prune_stale_rooms() -> None:
-    """Destroy rooms that have been marked ENDED."""
+# Room ownership when rooms are partitioned across worker processes (see serve.py): a process
+# only instantiates and reaps the rooms it owns; the others are created by their owner on /api/init.
+def _owns_every_room(room_id: str) -> bool:
+    return True
+
+owns_room: Callable[[str], bool] = _owns_every_room
+
+def _at_room_capacity(room_id: Optional[str]) -> bool:
+    # the room cap is per process (database.max_live_rooms): a room owned by another worker is
+    # refused by that worker on /api/init, and a quick match checks the room it is about to make
+    if owns_room is _owns_every_room or (room_id is not None and owns_room(room_id)):
+        return db.at_room_capacity()
+    return False
+
+_reaper: Optional[threading.Thread] = None
+_reaper_lock = threading.Lock()
+
+# channel_id -> Event set when a match result is stored for it (process-local wakeups for
+# long polls; with a shared store a match made by another worker is seen on the next recheck)
+_match_events: Dict[str, threading.Event] = {}
+_match_events_lock = threading.Lock()
+
+def _notify_match(channel_id: str) -> None:
+    ev = _match_events.get(channel_id)
+    if ev is not None:
+        ev.set()
+
+def room_shard(room_id: Optional[str]) -> int:
+    return lobby_store.shard_for(room_id)
+
+def channel_shard(channel_id: str) -> int:
+    # channel ids are "wait:<shard>:<hex>"
     try:
-        to_destroy: list[str] = [
-            room_id for room_id, status in room_status.items()
-            if status == RoomStatus.ENDED
-        ]
-        for room_id in to_destroy:
-            room_status.pop(room_id, None)
-            db.rooms.pop(room_id, None)
-    except Exception:
-        pass
-
-def _perform_matching():
-    # 1. Quick Match
-    while len(quick_match_queue) >= 2:
-        p1 = quick_match_queue.pop(0)
-        p2 = quick_match_queue.pop(0)
-        
-        new_room = f"room_{uuid.uuid4().hex}"
-        set_room_status(new_room, RoomStatus.IN_GAME)
-        if new_room not in db.rooms:
-            db.init_room(new_room)
-            db.reset_round_status(new_room)
-            
-        match_results[p1] = {"room": new_room, "team": Team.BLUE}
-        match_results[p2] = {"room": new_room, "team": Team.RED}
-
-    # 2. Room Match
-    for room_id, q in list(room_queues.items()):
-        if len(q) >= 2:
-            p1 = q.pop(0)
-            p2 = q.pop(0)
-            
-            set_room_status(room_id, RoomStatus.IN_GAME)
-            if room_id not in db.rooms:
-                db.init_room(room_id)
-                db.reset_round_status(room_id)
-            
-            match_results[p1] = {"room": room_id, "team": Team.BLUE}
-            match_results[p2] = {"room": room_id, "team": Team.RED}
-            
-            # Clean up empty queue
-            if not q:
-                del room_queues[room_id]
+        shard = int(channel_id.split(":")[1])
+    except (IndexError, ValueError):
+        return 0
+    return shard if 0 <= shard < lobby_store.shard_count else 0
 
-@lobby_lock_guard
-def join_match(optional_room_id: Optional[str]) -> Tuple[Optional[str], str, Optional[Team], Optional[str]]:
-    """Unified join logic.
-    Returns (room_id, channel_id, assigned_team, error_message).
+def lobby_lock_guard(shard_of: Callable[..., int]):
+    # runs func(lobby, ...) inside an exclusive transaction on the shard picked by shard_of(*args)
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            shard = shard_of(*args, **kwargs)
+            if lockstats.enabled:
+                return _timed_lobby_call(func, shard, args, kwargs)
+            with lobby_store.transaction(shard) as lobby:
+                return func(lobby, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def _timed_lobby_call(func, shard: int, args, kwargs):
+    # lobby_lock_guard with contention statistics (see lockstats.py)
+    requested = time.perf_counter()
+    with lobby_store.transaction(shard) as lobby:
+        entered = time.perf_counter()
+        try:
+            return func(lobby, *args, **kwargs)
+        finally:
+            lockstats.record("lobby", f"shard {shard}", func.__name__, entered - requested, time.perf_counter() - entered)
+
+def get_room_status(lobby: LobbyState, room_id: str) -> RoomStatus:
+    return lobby.room_status.get(room_id, RoomStatus.EMPTY)
+
+def set_room_status(lobby: LobbyState, room_id: str, status: RoomStatus) -> None:
+    lobby.room_status[room_id] = status
+
+def mark_channel_seen(lobby: LobbyState, channel_id: str) -> None:
+    lobby.channel_last_seen[channel_id] = time.time()
+
+def _remove_waiter(lobby: LobbyState, channel_id: str) -> None:
+    if channel_id not in lobby.waiting:
+        return
+    room_id = lobby.waiting.pop(channel_id)
+    if room_id is None:
+        lobby.quick_match_queue.pop(channel_id, None)
+        return
+    q = lobby.room_queues.get(room_id)
+    if q is not None:
+        q.pop(channel_id, None)
+        if not q:
+            del lobby.room_queues[room_id]
+            if get_room_status(lobby, room_id) == RoomStatus.MATCHING:
+                # EMPTY is the default; dropping the entry keeps abandoned ids from piling up
+                lobby.room_status.pop(room_id, None)
+
+def _prune_expired(lobby: LobbyState) -> None:
+    # pop only entries that are due; O(log n) each, nothing else is scanned
+    now = time.time()
+    while lobby.expiry and lobby.expiry[0][0] <= now:
+        _, ch = heapq.heappop(lobby.expiry)
+        last = lobby.channel_last_seen.get(ch)
+        if last is None:
+            continue  # cancelled or already forgotten
+        if ch in lobby.waiting:
+            if now - last <= WAITER_TIMEOUT:
+                heapq.heappush(lobby.expiry, (last + WAITER_TIMEOUT, ch))
+                continue
+            _remove_waiter(lobby, ch)
+        if now - last <= CHANNEL_TTL:
+            heapq.heappush(lobby.expiry, (last + CHANNEL_TTL, ch))
+            continue
+        lobby.channel_last_seen.pop(ch, None)
+        lobby.match_results.pop(ch, None)
+
+def _destroy_room(room_id: str) -> None:
+    db.rooms.pop(room_id, None)
+    hub.close_room(room_id)
+    audience.drop_room(room_id)
+
+def reap_rooms() -> int:
+    """One reaper pass. Destroys rooms ended more than ROOM_ENDED_TTL ago and rooms idle for
+    ROOM_IDLE_TTL, expires lobby channels, and drops SSE subscribers of rooms that no longer exist.
+    Returns the number of rooms destroyed.
     """
-    global last_prune_time
     now = time.time()
-    if now - last_prune_time > PRUNE_INTERVAL:
-        _prune_stale_waiters_internal()
-        prune_stale_rooms()
-        last_prune_time = now
-    
-    my_channel_id = f"wait:{uuid.uuid4().hex}"
-    mark_channel_seen(my_channel_id)
-    
+    destroyed = 0
+    for shard in range(lobby_store.shard_count):
+        with lobby_store.transaction(shard) as lobby:
+            _prune_expired(lobby)
+            # ended_rooms is in ending order, so only the due prefix is visited
+            for room_id, ended_at in list(lobby.ended_rooms.items()):
+                if now - ended_at < ROOM_ENDED_TTL:
+                    break
+                if not owns_room(room_id):
+                    continue  # left for the process holding it
+                del lobby.ended_rooms[room_id]
+                if lobby.room_status.get(room_id) != RoomStatus.ENDED:
+                    continue  # reused since it was marked
+                lobby.room_status.pop(room_id, None)
+                lobby.room_games.pop(room_id, None)
+                _destroy_room(room_id)
+                destroyed += 1
+
+    for room_id in db.rooms.ids():
+        room = db.rooms.get(room_id)
+        if room is None or now - room.last_active_at < ROOM_IDLE_TTL:
+            continue
+        with lobby_store.transaction(room_shard(room_id)) as lobby:
+            lobby.room_status.pop(room_id, None)
+            lobby.ended_rooms.pop(room_id, None)
+            lobby.room_games.pop(room_id, None)
+        _destroy_room(room_id)
+        destroyed += 1
+
+    # subscribers whose room is gone (e.g. destroyed by another worker)
+    for room_id in hub.room_ids():
+        if room_id not in db.rooms:
+            hub.close_room(room_id)
+    # catalogue versions left behind by a reload, once their last game is over
+    db.prune_catalogues()
+    return destroyed
+
+def _reaper_loop() -> None:
+    while True:
+        time.sleep(REAP_INTERVAL)
+        try:
+            reap_rooms()
+        except Exception as e:
+            print(f"[WARN] room reaper pass failed: {e!r}")
+
+def ensure_reaper() -> None:
+    # one background reaper per process, started on first use
+    global _reaper
+    if _reaper is not None:
+        return
+    with _reaper_lock:
+        if _reaper is None:
+            _reaper = threading.Thread(target=_reaper_loop, name="room-reaper", daemon=True)
+            _reaper.start()
+
+def _start_game(room_id: str, p1: str, p2: str, lobby: LobbyState, room_lobby: LobbyState) -> None:
+    # lobby is the shard holding both channels, room_lobby the one holding the room's status.
+    # Always a new game: a room left under this name (a finished private game still within
+    # ROOM_ENDED_TTL, or an idle one) is replaced, and its ended mark dropped so the reaper
+    # judges the new game on its own.
+    game = uuid.uuid4().hex[:8]
+    room_lobby.room_games[room_id] = game
+    room_lobby.ended_rooms.pop(room_id, None)
+    if owns_room(room_id):
+        _destroy_room(room_id)
+        db.init_room(room_id, enforce_cap=False, epoch=game)
+        db.reset_round_status(room_id)
+    # otherwise the owning worker creates it on /api/init (see room_game)
+
+    lobby.match_results[p1] = {"room": room_id, "team": Team.BLUE}
+    lobby.match_results[p2] = {"room": room_id, "team": Team.RED}
+    _notify_match(p1)
+    _notify_match(p2)
+
+def _record_match_wait(mode: str, *joined_at: Optional[float]) -> None:
+    now = time.time()
+    for t in joined_at:
+        if t is not None:
+            metrics.observe("ggg_match_wait_seconds", now - t, (("mode", mode),))
+
+def _perform_matching(lobby: LobbyState, room_id: Optional[str]):
+    # only the queue that just grew can have become matchable;
+    # at capacity, waiters stay queued until the reaper frees a room
+    if room_id is None:
+        # 1. Quick Match
+        while len(lobby.quick_match_queue) >= 2:
+            new_room = f"room_{uuid.uuid4().hex}"
+            if _at_room_capacity(new_room):
+                break
+            p1, t1 = lobby.quick_match_queue.popitem(last=False)
+            p2, t2 = lobby.quick_match_queue.popitem(last=False)
+            del lobby.waiting[p1], lobby.waiting[p2]
+            _record_match_wait("quick", t1, t2)
+
+            # the new room's status lives in its own shard (lock order: shard 0 -> room shard)
+            with lobby_store.transaction(room_shard(new_room)) as room_lobby:
+                set_room_status(room_lobby, new_room, RoomStatus.IN_GAME)
+                _start_game(new_room, p1, p2, lobby, room_lobby)
+    else:
+        # 2. Room Match
+        q = lobby.room_queues.get(room_id)
+        if q is not None and len(q) >= 2 and not _at_room_capacity(room_id):
+            p1, t1 = q.popitem(last=False)
+            p2, t2 = q.popitem(last=False)
+            del lobby.waiting[p1], lobby.waiting[p2]
+            _record_match_wait("room", t1, t2)
+
+            set_room_status(lobby, room_id, RoomStatus.IN_GAME)
+            _start_game(room_id, p1, p2, lobby, lobby)
+
+            # Clean up empty queue
+            if not q:
+                del lobby.room_queues[room_id]
+
+@lobby_lock_guard(lambda optional_room_id: room_shard(optional_room_id or None))
+def _join(lobby: LobbyState, optional_room_id: Optional[str]) -> Tuple[Optional[str], str, Optional[Team], Optional[str]]:
+    _prune_expired(lobby)
+    if _at_room_capacity(optional_room_id or None):
+        return None, "", None, "Server is full. Please try again in a few minutes."
+
+    my_channel_id = f"wait:{room_shard(optional_room_id or None)}:{uuid.uuid4().hex}"
+    mark_channel_seen(lobby, my_channel_id)
+
     if optional_room_id:
         room_id = optional_room_id
-        status = get_room_status(room_id)
+        status = get_room_status(lobby, room_id)
         if status == RoomStatus.IN_GAME:
             return None, my_channel_id, None, "Room already in game. Please choose another room."
-        
-        if room_id not in room_queues:
-            room_queues[room_id] = []
-        room_queues[room_id].append(my_channel_id)
-        set_room_status(room_id, RoomStatus.MATCHING)
+
+        lobby.room_queues.setdefault(room_id, OrderedDict())[my_channel_id] = time.time()
+        lobby.waiting[my_channel_id] = room_id
+        set_room_status(lobby, room_id, RoomStatus.MATCHING)
     else:
-        quick_match_queue.append(my_channel_id)
-        
-    _perform_matching()
-    
+        room_id = None
+        lobby.quick_match_queue[my_channel_id] = time.time()
+        lobby.waiting[my_channel_id] = None
+    heapq.heappush(lobby.expiry, (time.time() + WAITER_TIMEOUT, my_channel_id))
+
+    _perform_matching(lobby, room_id)
+
     # Check if I was matched immediately
-    if my_channel_id in match_results:
-        res = match_results.pop(my_channel_id)
+    if my_channel_id in lobby.match_results:
+        res = lobby.match_results.pop(my_channel_id)
         return res["room"], my_channel_id, res["team"], None
     else:
         # Still waiting
         return None, my_channel_id, Team.BLUE, None
 
-@lobby_lock_guard
+def join_match(optional_room_id: Optional[str]) -> Tuple[Optional[str], str, Optional[Team], Optional[str]]:
+    """Unified join logic.
+    Returns (room_id, channel_id, assigned_team, error_message).
+    """
+    ensure_reaper()
+    return _join(optional_room_id)
+
+@lobby_lock_guard(channel_shard)
+def _poll_channel(lobby: LobbyState, channel_id: str) -> Tuple[Optional[str], Optional[Team], bool]:
+    # (room, team, channel still known); cancelled or expired channels are not revived
+    if channel_id not in lobby.channel_last_seen:
+        return None, None, False
+    mark_channel_seen(lobby, channel_id)
+    if channel_id in lobby.match_results:
+        res = lobby.match_results.pop(channel_id)
+        return res["room"], res["team"], True
+    return None, None, True
+
 def check_match_status(channel_id: str) -> Tuple[Optional[str], Optional[Team]]:
-    mark_channel_seen(channel_id)
-    if channel_id in match_results:
-        res = match_results.pop(channel_id)
-        return res["room"], res["team"]
-    return None, None
-
-@lobby_lock_guard
-def cancel_waiting(channel_id: str) -> None:
-    if channel_id in quick_match_queue:
-        quick_match_queue.remove(channel_id)
-    
-    for room_id, q in list(room_queues.items()):
-        if channel_id in q:
-            q.remove(channel_id)
-            if not q:
-                del room_queues[room_id]
-                set_room_status(room_id, RoomStatus.EMPTY)
-    
-    channel_last_seen.pop(channel_id, None)
-    match_results.pop(channel_id, None)
-
-@lobby_lock_guard
-def mark_stale_room(room_id: str):
-    room_status[room_id] = RoomStatus.ENDED
\ No newline at end of file
+    room_id, team, _ = _poll_channel(channel_id)
+    return room_id, team
+
+def wait_for_match(channel_id: str, timeout: float) -> Tuple[Optional[str], Optional[Team]]:
+    """Long-poll: block until the channel is matched or `timeout` seconds pass.
+    While held, the open request itself keeps the channel alive.
+    """
+    timeout = max(0.0, min(timeout, LONG_POLL_MAX))
+    deadline = time.time() + timeout
+    recheck = LIVENESS_INTERVAL if isinstance(lobby_store, store.MemoryLobbyStore) else 0.5
+    with _match_events_lock:
+        ev = _match_events.setdefault(channel_id, threading.Event())
+    try:
+        while True:
+            room_id, team, known = _poll_channel(channel_id)
+            remaining = deadline - time.time()
+            if room_id or not known or remaining <= 0:
+                return room_id, team
+            # a result stored before clear() is still picked up by the check above
+            ev.wait(min(remaining, recheck))
+            ev.clear()
+    finally:
+        with _match_events_lock:
+            if _match_events.get(channel_id) is ev:
+                del _match_events[channel_id]
+
+@lobby_lock_guard(channel_shard)
+def cancel_waiting(lobby: LobbyState, channel_id: str) -> None:
+    _remove_waiter(lobby, channel_id)
+    lobby.channel_last_seen.pop(channel_id, None)
+    lobby.match_results.pop(channel_id, None)
+    # release a long poll still held for this channel
+    _notify_match(channel_id)
+
+@lobby_lock_guard(room_shard)
+def room_status(lobby: LobbyState, room_id: str) -> RoomStatus:
+    return get_room_status(lobby, room_id)
+
+@lobby_lock_guard(room_shard)
+def room_game(lobby: LobbyState, room_id: str) -> Optional[str]:
+    # id of the game last started in the room (None: no match made it, e.g. a debug room)
+    return lobby.room_games.get(room_id)
+
+@lobby_lock_guard(room_shard)
+def mark_stale_room(lobby: LobbyState, room_id: str):
+    if lobby.room_status.get(room_id) != RoomStatus.ENDED:
+        lobby.ended_rooms[room_id] = time.time()
+    lobby.room_status[room_id] = RoomStatus.ENDED
+
+# gauges for /metrics, computed on scrape
+metrics.define_gauge("ggg_rooms", "Rooms known to the lobby, by status.")
+metrics.define_gauge("ggg_rooms_live", "Rooms holding game state in this process.")
+metrics.define_gauge("ggg_quick_match_queue_depth", "Players waiting for a quick match.")
+metrics.define_gauge("ggg_room_queue_depth", "Players waiting in private room queues.")
+metrics.define_gauge("ggg_room_queues", "Private rooms with at least one waiting player.")
+
+def collect_metrics() -> List[Tuple[str, tuple, float]]:
+    by_status = {status: 0 for status in RoomStatus if status != RoomStatus.EMPTY}
+    quick = queued = queues = 0
+    for shard in range(lobby_store.shard_count):
+        with lobby_store.transaction(shard) as lobby:
+            for status in lobby.room_status.values():
+                by_status[status] = by_status.get(status, 0) + 1
+            quick += len(lobby.quick_match_queue)
+            queues += len(lobby.room_queues)
+            queued += sum(len(q) for q in lobby.room_queues.values())
+    samples = [("ggg_rooms", (("status", status.value),), count) for status, count in by_status.items()]
+    samples += [
+        ("ggg_rooms_live", (), len(db.rooms)),
+        ("ggg_quick_match_queue_depth", (), quick),
+        ("ggg_room_queue_depth", (), queued),
+        ("ggg_room_queues", (), queues),
+    ]
+    return samples
+
+metrics.add_collector(collect_metrics)
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from threadtables import ThreadTables
+
+# Opt-in lock contention statistics for room_lock_guard (database.py) and lobby_lock_guard
+# (lobby.py).
+#
+# When enabled, each guarded call records how long it waited to enter the lock (room lock or
+# store transaction) and how long it held it, per lock (room id / lobby shard) and per wrapped
+# function. Like metrics.py, records go to the calling thread's own table and are merged when
+# a report is taken (see threadtables.py). When disabled, the guards only test `enabled` and
+# skip all timing.
+#
+# Enable with GGG_LOCK_STATS=1, `python app.py --lock-stats`, or at runtime through
+# POST /admin/locks. Dump a report with:
+#
+#   python lockstats.py --url http://127.0.0.1:5000 --token $GGG_ADMIN_TOKEN
+
+enabled: bool = os.environ.get("GGG_LOCK_STATS", "") not in ("", "0")
+
+# hyperparameters for lock statistics
+max_tracked_keys = 5000  # per-lock rows kept after merging; the least contended are dropped beyond this
+fold_every = 256         # thread registrations between folds of finished threads
+
+# (kind, "lock" | "func", name) -> [calls, wait total, wait max, hold total, hold max]
+Key = Tuple[str, str, str]
+Row = List[float]
+
+
+class _ThreadTable():
+    __slots__ = ("thread", "rows")
+
+    def __init__(self, thread: Optional[threading.Thread]):
+        self.thread = thread
+        self.rows: Dict[Key, Row] = {}
+
+    def merge_into(self, other: "_ThreadTable") -> None:
+        for key, row in list(self.rows.items()):
+            target = other.rows.get(key)
+            if target is None:
+                other.rows[key] = list(row)
+            else:
+                target[0] += row[0]
+                target[1] += row[1]
+                target[2] = max(target[2], row[2])
+                target[3] += row[3]
+                target[4] = max(target[4], row[4])
+
+    def clear(self) -> None:
+        self.rows.clear()
+
+
+def _trim(table: _ThreadTable) -> None:
+    lock_keys = [key for key in table.rows if key[1] == "lock"]
+    if len(lock_keys) <= max_tracked_keys:
+        return
+    lock_keys.sort(key=lambda key: table.rows[key][1])
+    for key in lock_keys[:len(lock_keys) - max_tracked_keys // 2]:
+        del table.rows[key]
+
+
+_tables: ThreadTables[_ThreadTable] = ThreadTables(_ThreadTable, fold_every, after_fold=_trim)
+_started_at = time.time()
+
+
+def _add(rows: Dict[Key, Row], key: Key, wait: float, hold: float) -> None:
+    row = rows.get(key)
+    if row is None:
+        rows[key] = [1, wait, wait, hold, hold]
+        return
+    row[0] += 1
+    row[1] += wait
+    row[3] += hold
+    if wait > row[2]:
+        row[2] = wait
+    if hold > row[4]:
+        row[4] = hold
+
+
+def record(kind: str, lock: str, func: str, wait: float, hold: float) -> None:
+    # kind: "room" or "lobby"; lock: room id or lobby shard; times in seconds
+    rows = _tables.mine().rows
+    _add(rows, (kind, "lock", lock), wait, hold)
+    _add(rows, (kind, "func", func), wait, hold)
+
+
+def reset() -> None:
+    global _started_at
+    _tables.clear()
+    _started_at = time.time()
+
+
+def report(top: int = 20) -> dict:
+    """Ranked contention report: for each kind of lock, the `top` locks and functions by
+    total wait time (the time callers spent blocked), with hold times alongside."""
+    merged = _tables.merged()
+
+    def as_row(name: str, row: Row) -> dict:
+        calls, wait_total, wait_max, hold_total, hold_max = row
+        return {
+            "name": name,
+            "calls": int(calls),
+            "wait_total_ms": round(wait_total * 1000, 3),
+            "wait_avg_ms": round(wait_total / calls * 1000, 4),
+            "wait_max_ms": round(wait_max * 1000, 3),
+            "hold_total_ms": round(hold_total * 1000, 3),
+            "hold_avg_ms": round(hold_total / calls * 1000, 4),
+            "hold_max_ms": round(hold_max * 1000, 3),
+        }
+
+    sections: Dict[str, Dict[str, list]] = {}
+    for (kind, group, name), row in merged.rows.items():
+        section = sections.setdefault(kind, {"lock": [], "func": []})
+        section[group].append(as_row(name, row))
+    for section in sections.values():
+        for group in section.values():
+            group.sort(key=lambda r: (r["wait_total_ms"], r["hold_total_ms"]), reverse=True)
+            del group[top:]
+    return {
+        "enabled": enabled,
+        "window_seconds": round(time.time() - _started_at, 1),
+        "locks": {kind: {"by_lock": s["lock"], "by_function": s["func"]} for kind, s in sorted(sections.items())},
+    }
+
+
+def format_report(data: dict) -> str:
+    lines = [f"lock stats ({'on' if data['enabled'] else 'off'}), window {data['window_seconds']}s"]
+    columns = ("calls", "wait_total_ms", "wait_avg_ms", "wait_max_ms", "hold_total_ms", "hold_avg_ms", "hold_max_ms")
+    header = f"  {'name':40}" + "".join(f"{c:>14}" for c in columns)
+    for kind, section in data["locks"].items():
+        for group in ("by_lock", "by_function"):
+            lines.append(f"\n{kind} {group.replace('_', ' ')}:")
+            lines.append(header)
+            for row in section[group]:
+                lines.append(f"  {row['name'][:40]:40}" + "".join(f"{row[c]:>14}" for c in columns))
+    if not data["locks"]:
+        lines.append("no guarded calls recorded")
+    return "\n".join(lines)
+
+
+def parse_args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Print the lock contention report of a running server.")
+    parser.add_argument("--url", default="http://127.0.0.1:5000", help="Server (or worker) base URL.")
+    parser.add_argument("--token", default=os.environ.get("GGG_ADMIN_TOKEN", ""), help="Admin token (default: $GGG_ADMIN_TOKEN).")
+    parser.add_argument("--top", type=int, default=20, help="Rows per table.")
+    parser.add_argument("--enable", action="store_true", help="Turn collection on (and reset) instead of printing.")
+    parser.add_argument("--disable", action="store_true", help="Turn collection off.")
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON report.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    import json
+    import urllib.error
+    import urllib.request
+
+    args = parse_args()
+    url = f"{args.url.rstrip('/')}/admin/locks?top={args.top}"
+    headers = {"X-Admin-Token": args.token, "Content-Type": "application/json"}
+    if args.enable or args.disable:
+        body = json.dumps({"enabled": args.enable, "reset": args.enable}).encode()
+        req = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    else:
+        req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req) as resp:
+            data = json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        raise SystemExit(f"{url}: HTTP {e.code} (admin endpoints need debug mode or the server's GGG_ADMIN_TOKEN)")
+    print(json.dumps(data, indent=1) if args.json else format_report(data))
@@ -0,0 +1,172 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from threadtables import ThreadTables
+
+# Process-local metrics, rendered in the Prometheus text format by /metrics.
+#
+# Hot paths only write to their own thread's counters, merged on scrape (see threadtables.py).
+# Gauges are computed at scrape time by collector callbacks, so they cost nothing between scrapes.
+
+# hyperparameters for metrics
+latency_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+fold_every = 256  # thread registrations between folds of finished threads
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Labels, float]
+
+
+class _ThreadMetrics():
+    __slots__ = ("thread", "counters", "histograms", "minutes")
+
+    def __init__(self, thread: Optional[threading.Thread]):
+        self.thread = thread
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        # (name, labels, minute) -> count, for per-minute rates
+        self.minutes: Dict[Tuple[str, Labels, int], float] = {}
+
+    def merge_into(self, other: "_ThreadMetrics") -> None:
+        for key, value in list(self.counters.items()):
+            other.counters[key] = other.counters.get(key, 0) + value
+        for key, values in list(self.histograms.items()):
+            target = other.histograms.get(key)
+            if target is None:
+                other.histograms[key] = list(values)
+            else:
+                for i, v in enumerate(values):
+                    target[i] += v
+        for key, value in list(self.minutes.items()):
+            other.minutes[key] = other.minutes.get(key, 0) + value
+
+    def clear(self) -> None:
+        self.counters.clear()
+        self.histograms.clear()
+        self.minutes.clear()
+
+
+# metric name -> (type, help text, buckets)
+_meta: Dict[str, Tuple[str, str, tuple]] = {}
+# counter name -> name of the per-minute rate gauge derived from it
+_per_minute: Dict[str, str] = {}
+_collectors: List[Callable[[], Iterable[Sample]]] = []
+
+
+def define_counter(name: str, help: str, per_minute: Optional[str] = None) -> None:
+    _meta[name] = ("counter", help, ())
+    if per_minute:
+        _per_minute[name] = per_minute
+        _meta[per_minute] = ("gauge", f"{help.rstrip('.')} per minute (sliding window).", ())
+
+
+def define_histogram(name: str, help: str, buckets: tuple = latency_buckets) -> None:
+    _meta[name] = ("histogram", help, tuple(buckets))
+
+
+def define_gauge(name: str, help: str) -> None:
+    _meta[name] = ("gauge", help, ())
+
+
+def add_collector(collect: Callable[[], Iterable[Sample]]) -> None:
+    # collect() returns (name, labels, value) gauge samples; called on every scrape
+    _collectors.append(collect)
+
+
+def inc(name: str, value: float = 1, labels: Labels = ()) -> None:
+    mine = _tables.mine()
+    key = (name, labels)
+    mine.counters[key] = mine.counters.get(key, 0) + value
+    if name in _per_minute:
+        minute = int(time.time() // 60)
+        minute_key = (name, labels, minute)
+        if minute_key not in mine.minutes:
+            _drop_old_minutes(mine, minute)
+        mine.minutes[minute_key] = mine.minutes.get(minute_key, 0) + value
+
+
+def _drop_old_minutes(metrics: _ThreadMetrics, minute: int) -> None:
+    # only the current and the previous minute feed the rate gauges
+    for key in [key for key in metrics.minutes if key[2] < minute - 1]:
+        del metrics.minutes[key]
+
+
+_tables: ThreadTables[_ThreadMetrics] = ThreadTables(
+    _ThreadMetrics, fold_every, after_fold=lambda retired: _drop_old_minutes(retired, int(time.time() // 60)))
+
+
+def observe(name: str, value: float, labels: Labels = ()) -> None:
+    buckets = _meta[name][2]
+    mine = _tables.mine()
+    key = (name, labels)
+    values = mine.histograms.get(key)
+    if values is None:
+        values = mine.histograms[key] = [0.0] * (len(buckets) + 2)
+    # first bucket whose upper bound is >= value; len(buckets) is the +Inf bucket
+    values[bisect.bisect_left(buckets, value)] += 1
+    values[-1] += value
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    merged = _tables.merged()
+    samples: Dict[str, List[str]] = {name: [] for name in _meta}
+
+    for (name, labels), value in sorted(merged.counters.items()):
+        samples[name].append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    # sliding one-minute window: this minute so far plus the unexpired part of the last one
+    now = time.time()
+    minute, fraction = int(now // 60), (now % 60) / 60
+    rates: Dict[Tuple[str, Labels], float] = {}
+    for (name, labels, m), value in merged.minutes.items():
+        weight = 1.0 if m == minute else (1.0 - fraction) if m == minute - 1 else 0.0
+        if weight:
+            key = (_per_minute[name], labels)
+            rates[key] = rates.get(key, 0) + value * weight
+    for name in _per_minute.values():
+        rates.setdefault((name, ()), 0.0)
+    for (name, labels), value in sorted(rates.items()):
+        samples[name].append(f"{name}{_format_labels(labels)} {_format_value(round(value, 3))}")
+
+    for (name, labels), values in sorted(merged.histograms.items()):
+        buckets = _meta[name][2]
+        cumulative = 0.0
+        for bound, count in zip(buckets + (float("inf"),), values):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            samples[name].append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {_format_value(cumulative)}")
+        samples[name].append(f"{name}_sum{_format_labels(labels)} {_format_value(values[-1])}")
+        samples[name].append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+
+    for collect in _collectors:
+        for name, labels, value in collect():
+            samples[name].append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    lines = []
+    for name, (kind, help, _) in _meta.items():
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(samples[name])
+    return "\n".join(lines) + "\n"
+
+
+# series shared by several modules
+
+define_histogram("ggg_http_request_duration_seconds", "Time to produce a response, by route.")
+define_counter("ggg_http_requests_total", "Responses sent, by route and status.")
+define_histogram("ggg_match_wait_seconds", "Time from joining a queue to being matched.",
+                 buckets=(0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0))
+define_counter("ggg_rounds_completed_total", "Rounds resolved (damage applied).", per_minute="ggg_rounds_per_minute")
@@ -0,0 +1,66 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+# Server-side phase deadlines.
+#
+# Every phase transition (a round starting, an answer being revealed) pushes one entry onto a
+# single min-heap keyed by its deadline: O(log n) per transition, one thread for all rooms.
+# Entries are never removed early; when one comes due the handler re-checks it against the
+# room (round index and phase_started_at) and ignores it if the room has moved on.
+
+# hyperparameters for the scheduler
+deadline_grace = 2.0  # seconds past a deadline before the server acts, so clients' own timeouts land first
+
+
+class PhaseScheduler():
+
+    def __init__(self, grace: float = deadline_grace):
+        self.grace = grace
+        # called as handler(room_id, token) once the deadline for `token` has passed
+        self.handler: Optional[Callable[[str, Any], None]] = None
+        self._heap: List[Tuple[float, int, str, Any]] = []
+        self._seq = itertools.count()  # tie-breaker, tokens need not be comparable
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, room_id: str, deadline: float, token: Any) -> None:
+        # no-op until a handler is installed (e.g. scripts importing database only)
+        if self.handler is None:
+            return
+        self._ensure_thread()
+        with self._cond:
+            heapq.heappush(self._heap, (deadline + self.grace, next(self._seq), room_id, token))
+            # only a new earliest deadline changes how long the worker should sleep
+            if self._heap[0][2] == room_id and self._heap[0][3] is token:
+                self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="phase-scheduler", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.time():
+                    self._cond.wait(self._heap[0][0] - time.time() if self._heap else None)
+                _, _, room_id, token = heapq.heappop(self._heap)
+            # handlers take room locks; never call them while holding the heap lock
+            try:
+                self.handler(room_id, token)
+            except Exception as e:
+                print(f"[WARN] phase deadline for room {room_id} failed: {e!r}")
+
+
+# process-wide scheduler; app.py installs the handler
+phases = PhaseScheduler()
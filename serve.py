@@ -0,0 +1,264 @@
+import asyncio
+import gc
+import os
+import signal
+import sys
+import tempfile
+import zlib
+from typing import Dict, Optional
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Production entry point: pre-fork workers behind a room-affinity router.
+#
+#   python serve.py --workers 4 --port 5000
+#
+# The catalogue (memory-mapped from data/catalogue.bin when compiled) is opened once in this
+# process and the workers are forked from it, so they share those pages. Each worker serves the
+# app on a private loopback port with rooms kept in its own memory. The router listens on the
+# public port and sends every request for a room (`?room=`, /events/<room>, /ws/<room>) to the
+# worker that owns the room (crc32 of the id), so all RoomState access for a room stays in one
+# process. Everything else, including the quick-match queue, goes to worker 0. Lobby state (who
+# waits, which rooms are in game) is shared through the SQLite lobby store; a quick match may
+# create a room owned by another worker, which instantiates it on the players' first /api/init.
+#
+# Each worker runs its own room reaper, and database.max_live_rooms caps each worker's rooms
+# separately: a worker at its cap answers /api/init for a new room with 503 (server full).
+# Each worker also holds its own catalogue, so with more than one worker catalogue edits are
+# picked up by --watch-catalogue, and POST /admin/catalogue/reload (which would only reach
+# worker 0) answers 409.
+
+# hyperparameters for the launcher
+worker_port_base = 15000  # worker i listens on 127.0.0.1:(worker_port_base + i)
+max_head_size = 64 * 1024  # request line + headers
+
+
+def worker_for(room_id: str, workers: int) -> int:
+    # stable across processes and restarts (unlike hash())
+    return zlib.crc32(room_id.encode("utf-8")) % workers
+
+
+def route_key(target: str) -> Optional[str]:
+    # room id a request belongs to, or None for lobby/static traffic
+    parts = urlsplit(target)
+    room = parse_qs(parts.query).get("room")
+    if room and room[0]:
+        return room[0]
+    segments = parts.path.split("/")
+    if len(segments) >= 3 and segments[1] in ("events", "ws") and segments[2]:
+        return unquote(segments[2])
+    return None
+
+
+# worker side
+
+def run_worker(index: int, workers: int, lobby_url: str, store_url: str, port: int, debug: bool,
+               watch_catalogue: bool = False) -> None:
+    from werkzeug.serving import make_server
+    import app as game
+    import database as db
+    import lobby as lb
+
+    game.DEBUG_MODE = debug
+    if store_url != "memory":
+        # room state is shared, but each room's events and deadlines still live in the worker
+        # the router sends it to
+        db.configure_store(store_url)
+        lb.configure_store(store_url)
+    else:
+        lb.configure_store(lobby_url)
+        lb.owns_room = lambda room_id: worker_for(room_id, workers) == index
+    if watch_catalogue:
+        # each worker reloads its own copy
+        db.watch_catalogue()
+    # an admin reload would only reach the worker that serves it
+    game.CATALOGUE_RELOAD_ENDPOINT = workers == 1
+    # every worker reaps the rooms it owns; the lobby would only start it on worker 0
+    lb.ensure_reaper()
+    server = make_server("127.0.0.1", port, game.app, threaded=True)
+    print(f"[INFO] worker {index} (pid {os.getpid()}) on 127.0.0.1:{port}")
+    server.serve_forever()
+
+
+def spawn_worker(index: int, args) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            run_worker(index, args.workers, args.lobby_url, args.store, worker_port_base + index, args.debug,
+                       args.watch_catalogue)
+        except BaseException as e:
+            print(f"[WARN] worker {index} exited: {e!r}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+# router side
+
+def _set_connection_close(head: bytes) -> bytes:
+    # one request per upstream connection: the worker closes after its response,
+    # which also ends the client connection (so keep-alive never crosses workers)
+    lines = head.split(b"\r\n")
+    kept = [line for line in lines[1:] if line and not line.lower().startswith(b"connection:")]
+    return b"\r\n".join([lines[0]] + kept + [b"Connection: close", b"", b""])
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        while True:
+            chunk = await reader.read(1 << 16)
+            if not chunk:
+                break
+            writer.write(chunk)
+            await writer.drain()
+    except (ConnectionError, asyncio.CancelledError):
+        pass
+    finally:
+        try:
+            writer.close()
+        except Exception:
+            pass
+
+
+class Router():
+
+    def __init__(self, workers: int):
+        self.workers = workers
+
+    def pick(self, target: str) -> int:
+        key = route_key(target)
+        return worker_for(key, self.workers) if key is not None else 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.LimitOverrunError:
+            writer.write(b"HTTP/1.1 431 Request Header Fields Too Large\r\nConnection: close\r\n\r\n")
+            writer.close()
+            return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        try:
+            _, target, _ = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ", 2)
+        except ValueError:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nConnection: close\r\n\r\n")
+            writer.close()
+            return
+        index = self.pick(target)
+        try:
+            up_reader, up_writer = await asyncio.open_connection("127.0.0.1", worker_port_base + index)
+        except OSError:
+            writer.write(b"HTTP/1.1 502 Bad Gateway\r\nConnection: close\r\n\r\n")
+            writer.close()
+            return
+        # WebSocket upgrades keep their Connection header and stay piped both ways
+        if b"\r\nupgrade:" not in head.lower():
+            head = _set_connection_close(head)
+        up_writer.write(head)
+        await asyncio.gather(_pipe(reader, up_writer), _pipe(up_reader, writer))
+
+
+async def serve_router(args, pids: Dict[int, int]) -> None:
+    router = Router(args.workers)
+    server = await asyncio.start_server(router.handle, args.host, args.port, limit=max_head_size)
+    print(f"[INFO] router on {args.host}:{args.port} -> {args.workers} workers")
+    async with server:
+        while True:
+            await asyncio.sleep(1.0)
+            # restart crashed workers (forked from this process, so the catalogue is still shared)
+            for index, pid in list(pids.items()):
+                done, status = os.waitpid(pid, os.WNOHANG)
+                if done:
+                    print(f"[WARN] worker {index} (pid {pid}) died with status {status}; restarting")
+                    pids[index] = spawn_worker(index, args)
+
+
+def parse_args():
+    import argparse
+    import store
+    parser = argparse.ArgumentParser(description="Run the game server with several worker processes.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Number of worker processes (default: CPU count).",
+    )
+    parser.add_argument(
+        "--host",
+        default="0.0.0.0",
+        help="Address the router listens on (default: 0.0.0.0).",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=5000,
+        help="Port the router listens on (default: 5000).",
+    )
+    parser.add_argument(
+        "--store",
+        default=store.default_store_url,
+        help="Room store shared by all workers; 'memory' (default) keeps each room in its owning worker.",
+    )
+    parser.add_argument(
+        "--lobby-db",
+        default=os.path.join(tempfile.gettempdir(), f"ggg-lobby-{os.getpid()}.db"),
+        help="SQLite file coordinating the lobby between workers (recreated at startup).",
+    )
+    parser.add_argument(
+        "--debug",
+        action="store_true",
+        help="Enable debug mode with verbose logging.",
+    )
+    parser.add_argument(
+        "--watch-catalogue",
+        action="store_true",
+        default=os.environ.get("GGG_CATALOGUE_WATCH", "") not in ("", "0"),
+        help="Have every worker reload the catalogue when data/*.csv or a question image changes.",
+    )
+    parser.add_argument(
+        "--max-rooms",
+        type=int,
+        default=None,
+        help="Live room cap per worker (default: database.max_live_rooms, or GGG_MAX_LIVE_ROOMS).",
+    )
+    args = parser.parse_args()
+    args.workers = max(1, args.workers)
+    args.lobby_url = f"sqlite:///{args.lobby_db}"
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs os.fork (Linux/macOS); use `python app.py` on this platform.")
+    # the lobby file only describes this run
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(args.lobby_db + ".lobby" + suffix)
+        except FileNotFoundError:
+            pass
+
+    # importing the app loads the catalogue once; forked workers share it copy-on-write
+    import app  # noqa: F401
+    import database as db
+    if args.max_rooms is not None:
+        db.max_live_rooms = args.max_rooms  # inherited by every forked worker
+    # keep the GC from touching (and so copying) the inherited objects in every worker
+    gc.freeze()
+
+    pids: Dict[int, int] = {i: spawn_worker(i, args) for i in range(args.workers)}
+
+    def shutdown(*_):
+        for pid in pids.values():
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        os._exit(0)
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    asyncio.run(serve_router(args, pids))
@@ -0,0 +1,278 @@
+import os
+import pickle
+import sqlite3
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Storage backends for game state.
+#
+# "memory"            - plain dicts in this process (default, single worker)
+# "sqlite:///<path>"  - SQLite in WAL mode, shared by every worker process on the host;
+#                       rooms live in <path>, lobby state in <path>.lobby (separate files so
+#                       a room write inside a lobby transaction never waits on itself)
+#
+# Stored objects are opaque to the store: rooms are pickled RoomState instances, the lobby
+# is one pickled LobbyState per shard. Mutations happen inside `transaction()`, which is exclusive
+# per room (memory: the room's own lock; sqlite: BEGIN IMMEDIATE) and writes the object back
+# on exit, so read-check-write sequences such as round transitions are atomic across workers.
+#
+# A shared store is not enough on its own to serve one room from several processes: SSE and
+# WebSocket fan-out (events.hub), phase deadlines (scheduler.phases) and audience guesses stay in
+# the process that handled the request, so a broadcast or deadline armed in worker A never
+# reaches a client of worker B. Every request for a room must still reach the same process, as
+# serve.py's room-affinity routing ensures.
+
+default_store_url = os.environ.get("GGG_STORE", "memory")
+
+sqlite_busy_timeout = 10.0  # seconds a writer waits for another worker's transaction
+
+
+class RoomStore(ABC):
+
+    @abstractmethod
+    def get(self, room_id: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def setdefault(self, room_id: str, room: Any) -> Any:
+        # insert unless present; returns whichever room is stored afterwards
+        ...
+
+    @abstractmethod
+    def pop(self, room_id: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def ids(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    def transaction(self, room_id: str) -> Iterator[Any]:
+        # context manager yielding the room for exclusive read-modify-write
+        ...
+
+    # dict-style sugar so call sites read like the old `rooms` dict
+
+    def __contains__(self, room_id: str) -> bool:
+        return self.get(room_id) is not None
+
+    def __getitem__(self, room_id: str) -> Any:
+        room = self.get(room_id)
+        if room is None:
+            raise KeyError(room_id)
+        return room
+
+    def __len__(self) -> int:
+        return len(self.ids())
+
+
+class MemoryRoomStore(RoomStore):
+
+    def __init__(self):
+        self._rooms: Dict[str, Any] = {}
+
+    def get(self, room_id: str, default: Any = None) -> Any:
+        return self._rooms.get(room_id, default)
+
+    def setdefault(self, room_id: str, room: Any) -> Any:
+        # dict.setdefault is atomic under the GIL
+        return self._rooms.setdefault(room_id, room)
+
+    def pop(self, room_id: str, default: Any = None) -> Any:
+        return self._rooms.pop(room_id, default)
+
+    def ids(self) -> List[str]:
+        return list(self._rooms)
+
+    def __len__(self) -> int:
+        return len(self._rooms)
+
+    @contextmanager
+    def transaction(self, room_id: str) -> Iterator[Any]:
+        room = self._rooms[room_id]
+        if room.lock is None:
+            raise RuntimeError("Room lock is not initialized.")
+        with room.lock:
+            yield room
+
+
+class _SQLite():
+    # one connection per thread; sqlite3 connections must not be shared across threads
+
+    def __init__(self, path: str, schema: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self.conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(schema)
+
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=sqlite_busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        # BEGIN IMMEDIATE takes the write lock up front, so the read that follows is
+        # guaranteed current until COMMIT (no lost updates between workers)
+        conn = self.conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+
+
+class SQLiteRoomStore(RoomStore):
+
+    def __init__(self, path: str):
+        self._db = _SQLite(path, "CREATE TABLE IF NOT EXISTS rooms (id TEXT PRIMARY KEY, state BLOB NOT NULL)")
+        # rooms currently inside a transaction on this thread, so nested get_room() calls
+        # see (and mutate) the object that will be written back
+        self._active = threading.local()
+
+    def _active_rooms(self) -> Dict[str, Any]:
+        active = getattr(self._active, "rooms", None)
+        if active is None:
+            active = self._active.rooms = {}
+        return active
+
+    def get(self, room_id: str, default: Any = None) -> Any:
+        active = self._active_rooms()
+        if room_id in active:
+            return active[room_id]
+        row = self._db.conn().execute("SELECT state FROM rooms WHERE id = ?", (room_id,)).fetchone()
+        return pickle.loads(row[0]) if row else default
+
+    def setdefault(self, room_id: str, room: Any) -> Any:
+        with self._db.write() as conn:
+            conn.execute("INSERT OR IGNORE INTO rooms (id, state) VALUES (?, ?)", (room_id, pickle.dumps(room)))
+            row = conn.execute("SELECT state FROM rooms WHERE id = ?", (room_id,)).fetchone()
+        return pickle.loads(row[0])
+
+    def pop(self, room_id: str, default: Any = None) -> Any:
+        with self._db.write() as conn:
+            row = conn.execute("SELECT state FROM rooms WHERE id = ?", (room_id,)).fetchone()
+            conn.execute("DELETE FROM rooms WHERE id = ?", (room_id,))
+        return pickle.loads(row[0]) if row else default
+
+    def ids(self) -> List[str]:
+        return [row[0] for row in self._db.conn().execute("SELECT id FROM rooms")]
+
+    @contextmanager
+    def transaction(self, room_id: str) -> Iterator[Any]:
+        active = self._active_rooms()
+        if room_id in active:
+            # re-entrant: the outer transaction writes back
+            yield active[room_id]
+            return
+        with self._db.write() as conn:
+            row = conn.execute("SELECT state FROM rooms WHERE id = ?", (room_id,)).fetchone()
+            if row is None:
+                raise KeyError(room_id)
+            room = pickle.loads(row[0])
+            active[room_id] = room
+            try:
+                yield room
+            finally:
+                del active[room_id]
+            conn.execute("UPDATE rooms SET state = ? WHERE id = ?", (pickle.dumps(room), room_id))
+
+
+class LobbyStore(ABC):
+    # The lobby is split into `shard_count` independent LobbyState objects, each with its own
+    # transaction, so unrelated rooms never contend. Shard 0 is reserved for keyless state
+    # (the quick-match queue); keyed state goes to shard_for(key). A transaction may open one
+    # on another shard while held, but only from shard 0 outwards, so lock order is fixed.
+
+    shard_count: int = 1
+
+    def shard_for(self, key: Optional[str]) -> int:
+        if key is None or self.shard_count == 1:
+            return 0
+        # crc32 rather than hash(): stable across processes and restarts
+        return 1 + zlib.crc32(key.encode("utf-8")) % (self.shard_count - 1)
+
+    @abstractmethod
+    def transaction(self, shard: int = 0) -> Iterator[Any]:
+        # context manager yielding the shard's LobbyState for exclusive read-modify-write
+        ...
+
+
+class MemoryLobbyStore(LobbyStore):
+
+    def __init__(self, factory: Callable[[], Any], shards: int = 1):
+        self.shard_count = max(1, shards)
+        self._states = [factory() for _ in range(self.shard_count)]
+        self._locks = [threading.Lock() for _ in range(self.shard_count)]
+
+    @contextmanager
+    def transaction(self, shard: int = 0) -> Iterator[Any]:
+        with self._locks[shard]:
+            yield self._states[shard]
+
+
+class SQLiteLobbyStore(LobbyStore):
+    # one row per shard; SQLite has a single writer anyway, but small rows keep each
+    # transaction's pickle cheap. Nested transactions join the outer one.
+
+    def __init__(self, path: str, factory: Callable[[], Any], shards: int = 1):
+        self._db = _SQLite(path, "CREATE TABLE IF NOT EXISTS lobby (id INTEGER PRIMARY KEY, state BLOB NOT NULL)")
+        self._factory = factory
+        self.shard_count = max(1, shards)
+        self._active = threading.local()
+
+    @contextmanager
+    def transaction(self, shard: int = 0) -> Iterator[Any]:
+        active = getattr(self._active, "states", None)
+        if active is not None:
+            # already inside a write transaction on this thread
+            if shard not in active:
+                active[shard] = self._load(self._db.conn(), shard)
+            yield active[shard]
+            return
+        active = self._active.states = {}
+        try:
+            with self._db.write() as conn:
+                active[shard] = self._load(conn, shard)
+                yield active[shard]
+                for key, state in active.items():
+                    conn.execute("INSERT OR REPLACE INTO lobby (id, state) VALUES (?, ?)", (key, pickle.dumps(state)))
+        finally:
+            self._active.states = None
+
+    def _load(self, conn: sqlite3.Connection, shard: int) -> Any:
+        row = conn.execute("SELECT state FROM lobby WHERE id = ?", (shard,)).fetchone()
+        return pickle.loads(row[0]) if row else self._factory()
+
+
+def _sqlite_path(url: str) -> Optional[str]:
+    prefix = "sqlite:///"
+    return url[len(prefix):] if url.startswith(prefix) else None
+
+
+def open_room_store(url: str = default_store_url) -> RoomStore:
+    if url == "memory":
+        return MemoryRoomStore()
+    path = _sqlite_path(url)
+    if path:
+        return SQLiteRoomStore(path)
+    raise ValueError(f"Unsupported store url: {url}")
+
+
+def open_lobby_store(factory: Callable[[], Any], url: str = default_store_url, shards: int = 1) -> LobbyStore:
+    if url == "memory":
+        return MemoryLobbyStore(factory, shards)
+    path = _sqlite_path(url)
+    if path:
+        return SQLiteLobbyStore(path + ".lobby", factory, shards)
+    raise ValueError(f"Unsupported store url: {url}")
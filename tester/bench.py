@@ -0,0 +1,309 @@
+# Microbenchmarks for the per-request server paths
+#
+# Runs in-process (Flask test client and direct calls) against a server state of realistic size:
+# BENCH_ROOMS live rooms and BENCH_WAITERS players waiting in private room queues. Each benchmark
+# reports operations per second (best of several repeats); the results are compared with
+# tester/bench_baseline.json and the run fails when any benchmark is slower than its baseline
+# by more than the tolerance.
+#
+#   python tester/bench.py                 # compare with the baseline (exit code 1 on regression)
+#   python tester/bench.py --save          # record a new baseline after an intended change
+#   python tester/bench.py --only state    # benchmarks whose name contains "state"
+#
+# Throughput depends on the machine: re-record the baseline when moving to other hardware.
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # data paths in database.py are relative to the repo root
+
+import app as game  # noqa: E402  (loads the catalogue)
+import database as db  # noqa: E402
+import lobby as lb  # noqa: E402
+from defs import Team  # noqa: E402
+from events import hub  # noqa: E402
+from scheduler import phases  # noqa: E402
+
+# hyperparameters for the benchmarks
+BENCH_ROOMS = 500          # live rooms while benchmarking
+BENCH_WAITERS = 200        # players waiting in private room queues
+BENCH_SPECTATORS = 6       # extra SSE subscribers per room in the broadcast benchmarks
+MIN_TIME = 0.2             # seconds per timed repeat
+REPEATS = 5                # repeats per benchmark; the best one counts
+DEFAULT_TOLERANCE = 0.30   # allowed throughput loss against the baseline
+BASELINE_PATH = os.path.join(ROOT, "tester", "bench_baseline.json")
+
+# name -> setup(); setup builds the state a benchmark needs and returns the operation to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], None]]] = {}
+# rooms created by the current benchmark, destroyed before the next one starts
+_bench_rooms: List[str] = []
+
+
+def benchmark(name: str):
+    def register(setup: Callable[[], Callable[[], None]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def make_rooms(prefix: str, count: int, revealed: bool = False) -> List[str]:
+    room_ids = []
+    for i in range(count):
+        room_id = f"bench_{prefix}_{i}"
+        db.init_room(room_id)
+        db.reset_round_status(room_id)
+        if revealed:
+            for team, coord in ((Team.BLUE, (0.3, 0.4)), (Team.RED, (0.6, 0.7))):
+                db.set_team_coord(team, coord, room_id)
+                db.set_team_answered(team, True, room_id)
+        room_ids.append(room_id)
+    _bench_rooms.extend(room_ids)
+    return room_ids
+
+
+def cycle(values: list) -> Callable[[], object]:
+    # cheap round-robin over values
+    state = {"i": 0}
+    n = len(values)
+
+    def next_value():
+        state["i"] = (state["i"] + 1) % n
+        return values[state["i"]]
+    return next_value
+
+
+@benchmark("http_state_guess")
+def bench_http_state_guess():
+    client = game.app.test_client()
+    next_url = cycle([f"/api/state?room={r}&team=blue" for r in make_rooms("guess", BENCH_ROOMS)])
+    return lambda: client.get(next_url())
+
+
+@benchmark("http_state_revealed")
+def bench_http_state_revealed():
+    client = game.app.test_client()
+    next_url = cycle([f"/api/state?room={r}&team=red" for r in make_rooms("revealed", BENCH_ROOMS, revealed=True)])
+    return lambda: client.get(next_url())
+
+
+@benchmark("http_state_not_modified")
+def bench_http_state_not_modified():
+    client = game.app.test_client()
+    requests = [(f"/api/state?room={r}&team=blue", {"If-None-Match": f'"{game.state_etag(r, "blue")}"'})
+                for r in make_rooms("etag", BENCH_ROOMS)]
+    next_request = cycle(requests)
+
+    def op():
+        url, headers = next_request()
+        client.get(url, headers=headers)
+    return op
+
+
+@benchmark("build_state_revealed")
+def bench_build_state():
+    next_room = cycle(make_rooms("build", BENCH_ROOMS, revealed=True))
+    return lambda: game.build_state(next_room(), "blue")
+
+
+@benchmark("round_damage_view")
+def bench_round_damage_view():
+    # the steady state after a reveal: damage already applied, every state read recomputes the
+    # damage/distance view and the end-of-game check
+    rooms = make_rooms("damage", BENCH_ROOMS, revealed=True)
+    inputs = []
+    for room_id in rooms:
+        state, _ = game.build_state(room_id, "blue")
+        inputs.append((room_id, db.get_snapshot(room_id, Team.BLUE), state))
+    next_input = cycle(inputs)
+
+    def op():
+        room_id, snap, state = next_input()
+        view = dict(state)
+        view["damage"], view["distance"] = game.round_damage(snap, state["answer_coord"])
+        game.end_game_condition(room_id, view)
+    return op
+
+
+@benchmark("get_question_at")
+def bench_get_question_at():
+    rooms = make_rooms("question", BENCH_ROOMS)
+    next_pair = cycle([(i % db.max_rounds, room_id) for i, room_id in enumerate(rooms)])
+    return lambda: db.get_question_at(*next_pair())
+
+
+@benchmark("draw_schedule")
+def bench_draw_schedule():
+    next_seed = cycle(list(range(1000)))
+    return lambda: db.draw_schedule(next_seed())
+
+
+def fill_lobby() -> None:
+    # a lobby under load: many private rooms each with one waiting player
+    for i in range(BENCH_WAITERS):
+        lb.join_match(f"bench_waiting_{i}")
+
+
+@benchmark("join_match_quick_pair")
+def bench_join_quick():
+    fill_lobby()
+
+    def op():
+        lb.join_match(None)
+        room_id, _, _, _ = lb.join_match(None)  # pairs with the first: _perform_matching creates the room
+        lb._destroy_room(room_id)  # keep the live room count steady
+    return op
+
+
+@benchmark("join_match_room_pair")
+def bench_join_room():
+    fill_lobby()
+    counter = iter(range(1 << 62))
+
+    def op():
+        room = f"bench_private_{next(counter)}"
+        lb.join_match(room)
+        lb.join_match(room)
+        lb._destroy_room(room)
+    return op
+
+
+def subscribe_rooms(rooms: List[str]) -> List[Tuple[str, list]]:
+    out = []
+    for room_id in rooms:
+        subs = [hub.subscribe(room_id, "blue"), hub.subscribe(room_id, "red")]
+        subs += [hub.subscribe(room_id, None) for _ in range(BENCH_SPECTATORS)]
+        out.append((room_id, subs))
+    return out
+
+
+def drain(subs: list) -> None:
+    # stands in for the streaming threads, so queues never fill and evict subscribers
+    for sub in subs:
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+
+
+@benchmark("broadcast_event")
+def bench_broadcast_event():
+    next_room = cycle(subscribe_rooms(make_rooms("event", BENCH_ROOMS)))
+
+    def op():
+        room_id, subs = next_room()
+        game.broadcast(room_id, "opponent_left")
+        drain(subs)
+    return op
+
+
+@benchmark("broadcast_state")
+def bench_broadcast_state():
+    # reveal/next_round pushes: one build_state and serialization per subscribed team view
+    next_room = cycle(subscribe_rooms(make_rooms("push", BENCH_ROOMS, revealed=True)))
+
+    def op():
+        room_id, subs = next_room()
+        game.broadcast(room_id, "reveal")
+        drain(subs)
+    return op
+
+
+def measure(op: Callable[[], None]) -> float:
+    # calibrate a loop count that runs for at least MIN_TIME, then keep the best repeat
+    n = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(n):
+            op()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TIME:
+            break
+        n *= 2 if elapsed < MIN_TIME / 4 else 1 + int(MIN_TIME / max(elapsed, 1e-9))
+    best = n / elapsed
+    for _ in range(REPEATS - 1):
+        start = time.perf_counter()
+        for _ in range(n):
+            op()
+        best = max(best, n / (time.perf_counter() - start))
+    return best
+
+
+def run(names: List[str]) -> Dict[str, float]:
+    # freeze rooms: no phase deadlines firing mid-benchmark
+    phases.handler = None
+    game.DEBUG_MODE = False
+    db.seed_from_room_id = True  # the same schedules on every run
+    results = {}
+    for name in names:
+        op = BENCHMARKS[name]()
+        op()  # warm up
+        results[name] = measure(op)
+        while _bench_rooms:
+            lb._destroy_room(_bench_rooms.pop())
+        print(f"{name:28} {results[name]:12.0f} ops/s")
+    return results
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    print(f"\n{'benchmark':28} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:28} {'-':>12} {current:12.0f}      new")
+            continue
+        change = current / base - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:28} {base:12.0f} {current:12.0f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the hot server paths.")
+    parser.add_argument("--only", default=None, help="Run benchmarks whose name contains this text.")
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baseline.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Allowed throughput loss against the baseline (default: {DEFAULT_TOLERANCE}).",
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    names = [name for name in BENCHMARKS if args.only is None or args.only in name]
+    if not names:
+        sys.exit(f"No benchmark matches {args.only!r}.")
+    results = run(names)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                baseline = json.load(f).get("results", {})
+        baseline.update({name: round(value, 1) for name, value in results.items()})
+        # benchmarks that no longer exist have nothing left to compare against
+        baseline = {name: value for name, value in baseline.items() if name in BENCHMARKS}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(), "results": baseline}, f, indent=1)
+        print(f"\nBaseline written to {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        sys.exit(f"No baseline at {args.baseline}; run with --save first.")
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        regressions = compare(results, json.load(f).get("results", {}), args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
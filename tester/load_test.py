@@ -0,0 +1,385 @@
+# Headless Load Test
+#
+# Drives the real game protocol over plain HTTP with asyncio (no browser, no third-party
+# packages), so one machine can simulate thousands of players:
+#   quick_match -> long poll until matched -> init -> /events SSE stream -> per round:
+#   place_guess, submit, wait for the reveal, agree_next, wait for the next round -> exit
+#
+# Reports p50/p95/p99 latency per endpoint, time to match, and push latency (from the submit
+# that completes a round to the opponent's SSE stream delivering the reveal). Scenario profiles
+# are seeded, so a run can be repeated exactly for capacity planning.
+#
+#   python tester/load_test.py --profile event --base http://127.0.0.1:5000 --json report.json
+#
+# Thousands of players need as many open sockets: raise `ulimit -n` on both ends first.
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Scenario profiles. players: virtual players (paired into rooms by the lobby); ramp: seconds over
+# which they arrive; rounds: rounds played per room (fewer if a team runs out of HP); think: seconds
+# a player takes before each action; private: fraction of players joining named rooms instead of
+# quick match; sse: listen on /events (otherwise poll /api/state like a client without SSE).
+PROFILES = {
+    "smoke": dict(players=20, ramp=2.0, rounds=2, think=(0.1, 0.5), private=0.0, sse=True),
+    "event": dict(players=400, ramp=60.0, rounds=6, think=(2.0, 8.0), private=0.2, sse=True),
+    "peak": dict(players=2000, ramp=30.0, rounds=3, think=(0.5, 3.0), private=0.1, sse=True),
+    "no-sse": dict(players=200, ramp=10.0, rounds=3, think=(0.5, 2.0), private=0.0, sse=False),
+}
+
+MATCH_TIMEOUT = 120.0  # seconds a player waits for an opponent before giving up
+PHASE_TIMEOUT = 60.0   # seconds to wait for a reveal / next round before giving up
+POLL_WAIT = 25         # long-poll wait sent to /api/lobby/poll
+STATE_POLL_INTERVAL = 0.5  # /api/state polling period when SSE is off
+
+
+class Stats():
+
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.match_time: List[float] = []
+        self.push_latency: List[float] = []
+        self.outcomes: Dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, seconds: float, ok: bool) -> None:
+        self.latency[name].append(seconds)
+        if not ok:
+            self.errors[name] += 1
+
+    def report(self) -> dict:
+        def summary(values: List[float]) -> dict:
+            return {"count": len(values), "p50": percentile(values, 50), "p95": percentile(values, 95),
+                    "p99": percentile(values, 99), "max": max(values) if values else None}
+        return {
+            "endpoints": {name: dict(summary(v), errors=self.errors.get(name, 0)) for name, v in sorted(self.latency.items())},
+            "match_time": summary(self.match_time),
+            "push_latency": summary(self.push_latency),
+            "outcomes": dict(self.outcomes),
+        }
+
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class HttpClient():
+    # one keep-alive connection, re-opened whenever the server closes it
+
+    def __init__(self, host: str, port: int, stats: Stats):
+        self.host, self.port, self.stats = host, port, stats
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Optional[dict] = None,
+                      name: Optional[str] = None) -> Tuple[int, dict, bytes]:
+        name = name or path.split("?", 1)[0]
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n").encode()
+        start = time.perf_counter()
+        for attempt in range(2):
+            try:
+                if self.writer is None:
+                    self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+                self.writer.write(head + payload)
+                await self.writer.drain()
+                status, headers, data = await read_response(self.reader)
+                break
+            except (ConnectionError, asyncio.IncompleteReadError, OSError):
+                # stale keep-alive connection: retry once on a fresh one
+                self.close()
+                if attempt:
+                    self.stats.record(name, time.perf_counter() - start, False)
+                    raise
+        if headers.get("connection", "").lower() == "close":
+            self.close()
+        self.stats.record(name, time.perf_counter() - start, status < 400)
+        return status, headers, data
+
+    async def json(self, method: str, path: str, body: Optional[dict] = None, name: Optional[str] = None) -> dict:
+        status, _, data = await self.request(method, path, body, name)
+        try:
+            return json.loads(data) if data else {}
+        except ValueError:
+            return {"error": f"HTTP {status}"}
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def read_head(reader: asyncio.StreamReader) -> Tuple[int, dict]:
+    status_line = await reader.readuntil(b"\r\n")
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        if line == b"\r\n":
+            return status, headers
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+
+
+async def read_response(reader: asyncio.StreamReader) -> Tuple[int, dict, bytes]:
+    status, headers = await read_head(reader)
+    if "content-length" in headers:
+        return status, headers, await reader.readexactly(int(headers["content-length"]))
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                return status, headers, b"".join(chunks)
+            chunks.append(chunk[:-2])
+    if status in (204, 304):
+        return status, headers, b""
+    headers["connection"] = "close"
+    return status, headers, await reader.read()
+
+
+class EventStream():
+    # /events/<room> reader; every pushed state (or refresh ping) lands in `states`
+
+    def __init__(self, host: str, port: int, path: str):
+        self.host, self.port, self.path = host, port, path
+        self.states: "asyncio.Queue[Tuple[float, Optional[dict]]]" = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+
+    async def _run(self) -> None:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(f"GET {self.path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nAccept: text/event-stream\r\n\r\n".encode())
+            await writer.drain()
+            status, headers = await read_head(reader)
+            if status != 200:
+                return
+            chunked = headers.get("transfer-encoding", "").lower() == "chunked"
+            event, data = None, ""
+            async for line in self._lines(reader, chunked):
+                if line.startswith("event: "):
+                    event = line[7:]
+                elif line.startswith("data: "):
+                    data = line[6:]
+                elif line == "" and data:
+                    if event == "state":
+                        self.states.put_nowait((time.perf_counter(), json.loads(data)))
+                    elif data in ("reveal", "next_round"):
+                        self.states.put_nowait((time.perf_counter(), None))  # refresh ping
+                    event, data = None, ""
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _lines(reader: asyncio.StreamReader, chunked: bool):
+        buffer = ""
+        while True:
+            if chunked:
+                size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    return
+                buffer += (await reader.readexactly(size + 2))[:-2].decode("utf-8")
+            else:
+                piece = await reader.read(1 << 14)
+                if not piece:
+                    return
+                buffer += piece.decode("utf-8")
+            while "\n" in buffer:
+                line, buffer = buffer.split("\n", 1)
+                yield line
+
+
+class Player():
+
+    def __init__(self, pid: int, base: str, profile: dict, seed: int, stats: Stats, private_room: Optional[str]):
+        parts = urlsplit(base)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.pid, self.profile, self.stats = pid, profile, stats
+        self.rng = random.Random(seed * 1000003 + pid)
+        self.http = HttpClient(self.host, self.port, stats)
+        self.private_room = private_room
+        self.room = self.team = None
+        self.events: Optional[EventStream] = None
+
+    async def think(self) -> None:
+        lo, hi = self.profile["think"]
+        await asyncio.sleep(self.rng.uniform(lo, hi))
+
+    async def run(self) -> str:
+        try:
+            if not await self.match():
+                return "unmatched"
+            await self.http.json("POST", f"/api/init?room={self.room}")
+            if self.profile["sse"]:
+                self.events = EventStream(self.host, self.port, f"/events/{self.room}?team={self.team}")
+                self.events.start()
+            return await self.play()
+        except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+            return f"error: {type(e).__name__}"
+        finally:
+            if self.events is not None:
+                self.events.stop()
+            self.http.close()
+
+    async def match(self) -> bool:
+        start = time.perf_counter()
+        room_q = f"?room={self.private_room}" if self.private_room else ""
+        body = {"room": self.private_room} if self.private_room else {}
+        res = await self.http.json("POST", f"/api/lobby/quick_match{room_q}", body)
+        channel = res.get("channel")
+        while not res.get("matched"):
+            if res.get("error") or time.perf_counter() - start > MATCH_TIMEOUT:
+                if channel:
+                    await self.http.json("POST", f"/api/lobby/cancel_waiting{room_q}", {"channel": channel})
+                return False
+            res = await self.http.json("POST", f"/api/lobby/poll{room_q}", {"channel": channel, "wait": POLL_WAIT},
+                                       name="/api/lobby/poll (long)")
+        self.room, self.team = res["room"], res["team"]
+        self.stats.match_time.append(time.perf_counter() - start)
+        return True
+
+    def q(self) -> str:
+        return f"?room={self.room}&team={self.team}"
+
+    async def wait_state(self, predicate) -> Optional[dict]:
+        # next state satisfying predicate, from SSE pushes (or polling without SSE)
+        deadline = time.perf_counter() + PHASE_TIMEOUT
+        while time.perf_counter() < deadline:
+            if self.events is not None:
+                try:
+                    _, state = await asyncio.wait_for(self.events.states.get(), deadline - time.perf_counter())
+                except asyncio.TimeoutError:
+                    break
+                if state is None:
+                    state = await self.http.json("GET", f"/api/state{self.q()}")
+            else:
+                await asyncio.sleep(STATE_POLL_INTERVAL)
+                state = await self.http.json("GET", f"/api/state{self.q()}")
+            if predicate(state):
+                return state
+        # pushes may have raced ahead of us: settle with one direct read
+        state = await self.http.json("GET", f"/api/state{self.q()}")
+        return state if predicate(state) else None
+
+    async def play(self) -> str:
+        state = await self.http.json("GET", f"/api/state{self.q()}")
+        for _ in range(self.profile["rounds"]):
+            if state.get("error"):
+                return "error: state"
+            if "winner" in state:
+                break
+            current = state["round"]
+            await self.think()
+            await self.http.json("POST", f"/api/place_guess{self.q()}", {"lat": self.rng.random(), "lon": self.rng.random()})
+            await self.think()
+            submitted_at = time.perf_counter()
+            state = await self.http.json("POST", f"/api/submit{self.q()}")
+            if not state.get("answer_revealed"):
+                state = await self.wait_state(lambda s: s.get("answer_revealed") and s.get("round") == current)
+                if state is None:
+                    return "timeout: reveal"
+            elif self.events is not None:
+                # we completed the round: time until our own push arrives (the opponent's is symmetric)
+                pushed = await self._next_push(lambda s: s.get("answer_revealed"))
+                if pushed is not None:
+                    self.stats.push_latency.append(pushed - submitted_at)
+            if "winner" in state or not state.get("has_next"):
+                break
+            await self.think()
+            state = await self.http.json("POST", f"/api/agree_next{self.q()}")
+            if state.get("round") == current:
+                state = await self.wait_state(lambda s: s.get("round", 0) > current)
+                if state is None:
+                    return "timeout: next_round"
+        await self.http.json("POST", f"/api/exit?room={self.room}")
+        return "finished"
+
+    async def _next_push(self, predicate) -> Optional[float]:
+        try:
+            while True:
+                at, state = await asyncio.wait_for(self.events.states.get(), 5.0)
+                if state is None or predicate(state):
+                    return at
+        except asyncio.TimeoutError:
+            return None
+
+
+async def run_profile(base: str, profile: dict, seed: int) -> Stats:
+    stats = Stats()
+    rng = random.Random(seed)
+    n = profile["players"]
+    # private players come in pairs sharing a room name
+    private_rooms: List[Optional[str]] = []
+    for i in range(0, n - 1, 2):
+        room = f"load-{seed}-{i // 2}" if rng.random() < profile["private"] else None
+        private_rooms += [room, room]
+    private_rooms += [None] * (n - len(private_rooms))
+
+    async def launch(i: int) -> None:
+        await asyncio.sleep(profile["ramp"] * i / max(1, n))
+        outcome = await Player(i, base, profile, seed, stats, private_rooms[i]).run()
+        stats.outcomes[outcome] += 1
+
+    await asyncio.gather(*(launch(i) for i in range(n)))
+    return stats
+
+
+def print_report(report: dict, elapsed: float) -> None:
+    def ms(v: Optional[float]) -> str:
+        return f"{v * 1000:8.1f}" if v is not None else "       -"
+    print(f"\n--- finished in {elapsed:.1f}s ---")
+    print(f"{'endpoint':32} {'count':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, s in report["endpoints"].items():
+        print(f"{name:32} {s['count']:7d} {s['errors']:7d} {ms(s['p50'])} {ms(s['p95'])} {ms(s['p99'])} {ms(s['max'])}")
+    for label in ("match_time", "push_latency"):
+        s = report[label]
+        print(f"{label:32} {s['count']:7d} {'':7} {ms(s['p50'])} {ms(s['p95'])} {ms(s['p99'])} {ms(s['max'])}")
+    print("outcomes:", ", ".join(f"{k}={v}" for k, v in sorted(report["outcomes"].items())))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Headless HTTP load generator for the game server.")
+    parser.add_argument("--base", default="http://127.0.0.1:5000", help="Server base URL.")
+    parser.add_argument("--profile", default="smoke", choices=sorted(PROFILES), help="Scenario profile.")
+    parser.add_argument("--players", type=int, default=None, help="Override the profile's player count.")
+    parser.add_argument("--rounds", type=int, default=None, help="Override the profile's rounds per room.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for arrivals, think times and guesses.")
+    parser.add_argument("--json", default=None, help="Also write the report to this file.")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    profile = dict(PROFILES[args.profile])
+    if args.players is not None:
+        profile["players"] = args.players
+    if args.rounds is not None:
+        profile["rounds"] = args.rounds
+    print(f"--- profile {args.profile}: {profile} seed={args.seed} against {args.base} ---")
+    start = time.perf_counter()
+    stats = asyncio.run(run_profile(args.base, profile, args.seed))
+    report = stats.report()
+    print_report(report, time.perf_counter() - start)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(dict(report, profile=profile, profile_name=args.profile, seed=args.seed, base=args.base), f, indent=1)
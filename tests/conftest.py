@@ -0,0 +1,27 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # data paths are relative to the repo root
+
+import pytest  # noqa: E402
+
+import database as db  # noqa: E402
+import lobby as lb  # noqa: E402
+import store  # noqa: E402
+from scheduler import phases  # noqa: E402
+
+if db.catalogue is None:
+    db.init_database()
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    # every test starts with empty in-memory stores, no background reaper and no phase deadlines
+    monkeypatch.setattr(db, "rooms", store.open_room_store("memory"))
+    monkeypatch.setattr(lb, "lobby_store", store.open_lobby_store(lb.LobbyState, "memory", shards=lb.LOBBY_SHARDS))
+    monkeypatch.setattr(lb, "ensure_reaper", lambda: None)
+    monkeypatch.setattr(phases, "handler", None)
+    monkeypatch.setattr(db, "catalogue", db.catalogue)
+    monkeypatch.setattr(db, "catalogues", dict(db.catalogues))
@@ -0,0 +1,21 @@
+import assets
+import app as game
+
+
+def test_unknown_digests_do_not_walk_static_each_time(monkeypatch):
+    walks = []
+    real_walk = assets.os.walk
+    monkeypatch.setattr(assets.os, "walk", lambda top: walks.append(top) or real_walk(top))
+    monkeypatch.setattr(assets, "_indexed_at", None)
+    client = game.app.test_client()
+    for i in range(20):
+        assert client.get(f"/a/{i:016x}.jpg").status_code == 404
+    assert len(walks) == 1
+
+
+def test_indexed_asset_is_served_immutable():
+    assets.index_static()
+    rel = next(iter(assets._digests))
+    resp = game.app.test_client().get(assets.asset_url(rel))
+    assert resp.status_code == 200
+    assert resp.headers["Cache-Control"] == assets.immutable_cache_control
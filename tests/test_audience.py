@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+import app as game
+import audience
+import calc
+import database as db
+
+# map coordinates are normalized to [0, 1] on a flat map, so the extremes worth checking are the
+# map edges and corners (there is no antimeridian or pole to wrap around)
+GUESSES = [(0.0, 0.0), (1.0, 1.0), (0.0, 1.0), (0.5, 0.5), (0.25, 0.75), (0.75, 0.25), (1.0, 0.0)]
+
+
+@pytest.mark.parametrize("answer", [(0.5, 0.5), (0.0, 0.0), (1.0, 0.0), (0.1, 0.9)])
+def test_score_guesses_matches_the_scalar_formulas(answer):
+    scored = calc.score_guesses(np.array(GUESSES), answer, 3.0)
+    for i, guess in enumerate(GUESSES):
+        assert scored.distance[i] == pytest.approx(calc.compute_scaled_distance(guess, answer))
+        assert scored.damage[i] == pytest.approx(calc.compute_scaled_damage(guess, answer, 3.0))
+        closer = sum(calc.distance(other, answer) < calc.distance(guess, answer) - 1e-12 for other in GUESSES)
+        assert scored.rank[i] == closer + 1
+
+
+def test_equal_distances_share_a_rank():
+    scored = calc.score_guesses(np.array([(0.0, 0.5), (1.0, 0.5), (0.5, 0.5)]), (0.5, 0.5), 1.0)
+    assert list(scored.rank) == [2, 2, 1]
+    assert len(calc.score_guesses(np.empty((0, 2)), (0.5, 0.5), 1.0).rank) == 0
+
+
+def test_audience_guess_and_result_endpoints(monkeypatch):
+    monkeypatch.setattr(audience, "_books", {})
+    db.init_room("hall")
+    client = game.app.test_client()
+    for member, coord in (("a", (0.1, 0.2)), ("b", (0.9, 0.9)), ("a", (0.4, 0.4))):
+        resp = client.post("/api/audience/guess?room=hall", json={"member": member, "lat": coord[0], "lon": coord[1]})
+        assert resp.status_code == 200
+    assert resp.get_json()["count"] == 2  # a's second guess replaced the first
+    assert client.post("/api/audience/guess?room=hall", json={"member": "c", "lat": 2, "lon": 0}).status_code == 400
+
+    pending = client.get("/api/audience/result?room=hall&member=a").get_json()
+    assert pending == {"round": 1, "revealed": False, "count": 2}
+
+    db.force_answer_reveal("hall")
+    result = client.get("/api/audience/result?room=hall&member=a").get_json()
+    snap = db.get_snapshot("hall")
+    cat = db.catalogue_for(snap.catalogue_version)
+    answer = cat.locations[cat.questions[snap.question_id].location]
+    assert result["revealed"] and result["count"] == 2
+    assert result["you"]["distance"] == pytest.approx(calc.compute_scaled_distance((0.4, 0.4), answer))
+    assert result["you"]["damage"] == pytest.approx(calc.compute_scaled_damage((0.4, 0.4), answer, snap.dmg_mult))
+    assert [entry["rank"] for entry in result["top"]] == sorted(entry["rank"] for entry in result["top"])
+    # guessing is closed after the reveal
+    assert client.post("/api/audience/guess?room=hall", json={"member": "a", "lat": 0.5, "lon": 0.5}).status_code == 400
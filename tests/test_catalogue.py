@@ -0,0 +1,122 @@
+import os
+import shutil
+
+import pytest
+
+import catalogue as catalogue_mod
+import database as db
+
+
+@pytest.fixture
+def data(tmp_path):
+    # private copies of the CSV files, so a test can edit them
+    loc = tmp_path / "locations.csv"
+    que = tmp_path / "questions.csv"
+    shutil.copy(catalogue_mod.loc_sheet_path, loc)
+    shutil.copy(catalogue_mod.que_sheet_path, que)
+    db.install_catalogue(catalogue_mod.open_catalogue(str(loc), str(que), path=str(tmp_path / "catalogue.bin")))
+    return loc, que
+
+
+def drop_question(que, qid: int) -> None:
+    lines = que.read_text(encoding="utf-8-sig").splitlines(keepends=True)
+    que.write_text("".join(line for line in lines if line.split(",", 1)[0] != str(qid)), encoding="utf-8")
+
+
+def test_running_room_keeps_its_version_across_a_reload(data):
+    loc, que = data
+    db.init_room("before")
+    previous = db.catalogue
+    first = db.get_room("before").schedule[0]
+    question = db.get_question_at(0, "before")
+    drop_question(que, first)
+
+    new, stats = catalogue_mod.reload_catalogue(previous, str(loc), str(que), path=None)
+    assert new is not previous and first not in new.questions
+    db.install_catalogue(new)
+
+    assert db.room_catalogue("before") is previous
+    assert db.get_question_at(0, "before") == question
+    db.init_room("after")
+    assert db.get_room("after").catalogue_version == new.content_hash
+    assert set(db.catalogues) == {previous.content_hash, new.content_hash}
+
+    # once its last room is gone, the old version is released
+    db.rooms.pop("before")
+    db.prune_catalogues()
+    assert set(db.catalogues) == {new.content_hash}
+
+
+def test_unchanged_rows_are_not_parsed_again(data):
+    loc, que = data
+    previous = db.catalogue
+    drop_question(que, next(iter(previous.questions)))
+    _, stats = catalogue_mod.reload_catalogue(previous, str(loc), str(que), path=None)
+    assert stats["rows_parsed"] == 0
+
+
+def test_invalid_reload_keeps_the_current_version(data):
+    loc, que = data
+    previous = db.catalogue
+    with open(que, "a", encoding="utf-8") as f:
+        f.write("9999,missing.png,no such place,E\n")
+    with pytest.raises(catalogue_mod.CatalogueError):
+        catalogue_mod.reload_catalogue(previous, str(loc), str(que), path=None)
+    assert db.catalogue is previous
+
+
+def test_reload_endpoint_is_refused_under_several_workers(monkeypatch):
+    import app as game
+    monkeypatch.setattr(game, "DEBUG_MODE", True)
+    monkeypatch.setattr(game, "CATALOGUE_RELOAD_ENDPOINT", False)
+    resp = game.app.test_client().post("/admin/catalogue/reload")
+    assert resp.status_code == 409
+    assert resp.get_json()["version"] == db.catalogue.content_hash
+
+
+def test_snapshot_stays_valid_when_the_checkout_moves(tmp_path, monkeypatch):
+    snapshot = str(tmp_path / "catalogue.bin")
+    catalogue_mod.write_snapshot(catalogue_mod.compile_catalogue(), snapshot)
+    moved = tmp_path / "moved"
+    moved.mkdir()
+    loc = shutil.copy(catalogue_mod.loc_sheet_path, moved / "locations.csv")
+    que = shutil.copy(catalogue_mod.que_sheet_path, moved / "questions.csv")
+
+    def recompile(*args, **kwargs):
+        raise AssertionError("snapshot was not used")
+    monkeypatch.setattr(catalogue_mod, "compile_catalogue", recompile)
+    catalogue_mod.open_catalogue(str(loc), str(que), path=snapshot)
+
+
+@pytest.fixture
+def image():
+    # one referenced image; its mtime is restored afterwards
+    cat = catalogue_mod.open_catalogue()
+    path = os.path.join(catalogue_mod.static_dir, next(iter(cat.questions.values())).image_path)
+    st = os.stat(path)
+    yield path
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def test_an_edited_image_invalidates_the_snapshot(tmp_path, image):
+    snapshot = str(tmp_path / "catalogue.bin")
+    catalogue_mod.write_snapshot(catalogue_mod.compile_catalogue(), snapshot)
+    stamp = catalogue_mod.map_snapshot(snapshot).source_stamp
+    assert stamp == catalogue_mod.source_stamp()
+
+    st = os.stat(image)
+    os.utime(image, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert catalogue_mod.source_stamp() != stamp
+    assert catalogue_mod.open_catalogue(path=snapshot).source_stamp == catalogue_mod.source_stamp()
+
+
+def test_a_replaced_image_is_a_new_version(image):
+    previous = db.catalogue
+    seen = catalogue_mod.source_stamp()
+    st = os.stat(image)
+    os.utime(image, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert catalogue_mod.source_stamp() != seen  # what the watcher polls
+
+    new, stats = catalogue_mod.reload_catalogue(previous, path=None)
+    assert new.content_hash != previous.content_hash
+    assert stats["images_checked"] == 1
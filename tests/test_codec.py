@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+import app as game
+import codec
+import database as db
+from defs import Team
+
+
+def test_orjson_and_stdlib_encode_the_same_state():
+    if "orjson" not in codec.encoders:
+        pytest.skip("orjson is not installed")
+    db.init_room("wire")
+    for team, coord in ((Team.BLUE, (0.2, 1 / 3)), (Team.RED, (0.8, 0.8))):
+        db.set_team_coord(team, coord, "wire")
+        db.set_team_answered(team, True, "wire")
+    state, _ = game.build_state("wire", "blue")
+    assert "damage" in state and any(ord(c) > 127 for c in state["answer_loc"]["name"])
+
+    outputs = {name: encode(state) for name, encode in codec.encoders.items()}
+    for text in outputs.values():
+        assert "\n" not in text  # fits an SSE data: line
+    assert json.loads(outputs["orjson"]) == json.loads(outputs["json"])
+
+
+def test_use_rejects_unknown_encoders():
+    with pytest.raises(ValueError):
+        codec.use("yaml")
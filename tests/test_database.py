@@ -0,0 +1,46 @@
+import pickle
+
+import pytest
+
+import database as db
+
+
+def test_rooms_draw_independent_seeds():
+    seeds = set()
+    for i in range(1000):
+        room_id = f"room_{i}"
+        db.init_room(room_id)
+        seeds.add(db.get_room(room_id).seed)
+    assert len(seeds) == 1000
+
+
+def test_a_recreated_room_gets_a_new_schedule():
+    schedules = set()
+    for _ in range(5):
+        db.init_room("same-name")
+        schedules.add(tuple(db.get_room("same-name").schedule))
+        db.rooms.pop("same-name")
+    assert len(schedules) > 1
+
+
+def test_seed_and_schedule_survive_pickling():
+    db.init_room("pickled")
+    room = db.get_room("pickled")
+    copy = pickle.loads(pickle.dumps(room))
+    assert copy.seed == room.seed
+    assert list(copy.schedule) == list(room.schedule)
+
+
+def test_seed_from_room_id_is_reproducible(monkeypatch):
+    monkeypatch.setattr(db, "seed_from_room_id", True)
+    assert db.room_seed("abc") == db.room_seed("abc")
+    assert db.room_seed("abc") != db.room_seed("acb")  # a real hash, not a character sum
+
+
+def test_new_rooms_are_refused_at_the_cap(monkeypatch):
+    monkeypatch.setattr(db, "max_live_rooms", 2)
+    db.init_room("a")
+    db.init_room("b")
+    with pytest.raises(db.RoomLimitError):
+        db.init_room("c")
+    db.init_room("a")  # an existing room is not a new one
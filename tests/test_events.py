@@ -0,0 +1,29 @@
+import events
+from events import EventHub
+
+
+def test_oldest_subscriber_is_evicted_beyond_the_room_limit():
+    hub = EventHub(heartbeat=3600)
+    subs = [hub.subscribe("r") for _ in range(events.max_subscribers_per_room + 1)]
+    assert hub.subscriber_count("r") == events.max_subscribers_per_room
+    assert subs[0].closed and list(hub.frames(subs[0])) == []
+    assert not subs[1].closed
+
+
+def test_slow_subscriber_is_dropped_when_its_queue_is_full():
+    hub = EventHub(heartbeat=3600)
+    slow = hub.subscribe("r")
+    for i in range(events.subscriber_queue_size + 1):
+        hub.publish("r", str(i))
+    assert slow.closed and hub.subscriber_count("r") == 0
+    # the close marker took the place of a pending frame, so a blocked reader wakes up
+    assert slow.queue.queue[-1] is events._CLOSE
+
+
+def test_stream_asks_for_a_short_reconnect_delay():
+    hub = EventHub(heartbeat=3600)
+    stream = hub.stream(hub.subscribe("r"))
+    assert next(stream) == f"retry: {events.reconnect_retry_ms}\n\n"
+    assert events.reconnect_retry_ms < hub.heartbeat * 1000
+    stream.close()
+    assert hub.subscriber_count("r") == 0
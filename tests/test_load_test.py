@@ -0,0 +1,38 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tester"))
+
+import load_test  # noqa: E402
+
+
+@pytest.fixture
+def base():
+    import app as game
+    server = make_server("127.0.0.1", 0, game.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    thread.join()
+
+
+def test_percentile():
+    assert load_test.percentile([], 50) is None
+    assert load_test.percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert load_test.percentile([float(i) for i in range(101)], 99) == 99.0
+
+
+def test_players_finish_a_game_against_a_live_server(base):
+    # seed 1: one private pair and two quick-match players, one round each
+    profile = dict(players=4, ramp=0.0, rounds=1, think=(0.0, 0.05), private=0.5, sse=True)
+    report = asyncio.run(load_test.run_profile(base, profile, seed=1)).report()
+    assert report["outcomes"] == {"finished": 4}
+    assert all(s["errors"] == 0 for s in report["endpoints"].values())
+    assert report["endpoints"]["/api/submit"]["count"] == 4
+    assert report["push_latency"]["count"] >= 1
@@ -0,0 +1,142 @@
+import threading
+import time
+
+import database as db
+import lobby as lb
+from defs import Team, max_hp
+
+
+def play_to_the_end(room_id: str) -> None:
+    # what the app does when a game is decided: reveal, apply damage, mark the room ended
+    for team in Team:
+        db.set_team_coord(team, (0.9, 0.9), room_id)
+        db.set_team_answered(team, True, room_id)
+    db.apply_round_damage(1, {Team.BLUE: 126.0, Team.RED: 44.0}, room_id)
+    lb.mark_stale_room(room_id)
+
+
+def test_rematch_in_ended_private_room_starts_a_new_game():
+    lb.join_match("rematch")
+    room_id, _, _, _ = lb.join_match("rematch")
+    assert room_id == "rematch"
+    first_epoch = db.get_room(room_id).epoch
+    play_to_the_end(room_id)
+    assert lb.room_status(room_id) == lb.RoomStatus.ENDED
+
+    # same name again, well within ROOM_ENDED_TTL
+    lb.join_match("rematch")
+    room_id, _, _, err = lb.join_match("rematch")
+    assert err is None and room_id == "rematch"
+    snap = db.get_snapshot(room_id)
+    assert db.get_room(room_id).epoch != first_epoch
+    assert snap.team_hp == (max_hp, max_hp)
+    assert snap.round_index == 0 and not snap.answer_revealed
+    assert lb.room_status(room_id) == lb.RoomStatus.IN_GAME
+    assert lb.room_game(room_id) == db.get_room(room_id).epoch
+    with lb.lobby_store.transaction(lb.room_shard(room_id)) as lobby:
+        assert room_id not in lobby.ended_rooms
+
+
+def test_reaper_destroys_a_rematch_once_it_ends(monkeypatch):
+    lb.join_match("rematch")
+    lb.join_match("rematch")
+    play_to_the_end("rematch")
+    lb.join_match("rematch")
+    lb.join_match("rematch")
+
+    monkeypatch.setattr(lb, "ROOM_ENDED_TTL", 0.0)
+    lb.reap_rooms()
+    assert "rematch" in db.rooms  # the running rematch is not reaped
+
+    lb.mark_stale_room("rematch")
+    assert lb.reap_rooms() == 1
+    assert "rematch" not in db.rooms
+    assert lb.room_status("rematch") == lb.RoomStatus.EMPTY
+
+
+def test_rematch_made_by_another_worker_replaces_the_old_room(monkeypatch):
+    # serve.py: the lobby runs in one worker, the room is owned by another (created on /api/init)
+    lb.join_match("split")
+    lb.join_match("split")
+    play_to_the_end("split")
+    stale_epoch = db.get_room("split").epoch
+
+    monkeypatch.setattr(lb, "owns_room", lambda room_id: False)
+    lb.join_match("split")
+    lb.join_match("split")
+    assert db.get_room("split").epoch == stale_epoch  # not touched by the lobby worker
+
+    import app as game
+    monkeypatch.setattr(lb, "owns_room", lb._owns_every_room)
+    state = game.app.test_client().post("/api/init?room=split&team=blue").get_json()
+    assert db.get_room("split").epoch == lb.room_game("split")
+    assert state["hp"] == {"blue": max_hp, "red": max_hp}
+    assert state["round"] == 1 and not state["answer_revealed"]
+
+
+def test_quick_match_pairs_the_oldest_waiters_and_skips_cancelled_ones():
+    _, cancelled, _, _ = lb.join_match(None)
+    lb.cancel_waiting(cancelled)
+    _, first, _, _ = lb.join_match(None)
+    room_id, _, team, err = lb.join_match(None)
+    assert err is None and room_id is not None and team is not None
+    partner_room, partner_team = lb.check_match_status(first)
+    assert partner_room == room_id and {team, partner_team} == set(Team)
+    assert lb.room_status(room_id) == lb.RoomStatus.IN_GAME
+    assert lb.check_match_status(cancelled) == (None, None)
+
+
+def test_concurrent_quick_and_room_joins_all_pair_up():
+    # quick match takes shard 0 then the new room's shard; room joins take only their own shard
+    joined = []
+
+    def join(room_id):
+        joined.append(lb.join_match(room_id))
+    threads = [threading.Thread(target=join, args=(None,)) for _ in range(40)]
+    threads += [threading.Thread(target=join, args=(f"r{i % 20}",)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert not any(thread.is_alive() for thread in threads)
+    assert all(err is None for _, _, _, err in joined)
+    with lb.lobby_store.transaction(0) as lobby:
+        assert not lobby.quick_match_queue and not lobby.waiting
+    assert all(lb.room_status(f"r{i}") == lb.RoomStatus.IN_GAME for i in range(20))
+
+
+def held_poll(channel_id, timeout=5.0):
+    # wait_for_match on a thread; returns (thread, result holder)
+    result = {}
+
+    def poll():
+        started = time.monotonic()
+        result["match"] = lb.wait_for_match(channel_id, timeout)
+        result["seconds"] = time.monotonic() - started
+    thread = threading.Thread(target=poll)
+    thread.start()
+    return thread, result
+
+
+def test_long_poll_returns_as_soon_as_a_partner_joins():
+    _, channel_id, _, _ = lb.join_match("poll")
+    thread, result = held_poll(channel_id)
+    time.sleep(0.1)
+    room_id, _, _, _ = lb.join_match("poll")
+    thread.join(timeout=5)
+    assert result["match"] == (room_id, Team.BLUE)
+    assert result["seconds"] < 1.0
+
+
+def test_cancel_releases_a_held_poll():
+    _, channel_id, _, _ = lb.join_match("poll")
+    thread, result = held_poll(channel_id)
+    time.sleep(0.1)
+    lb.cancel_waiting(channel_id)
+    thread.join(timeout=5)
+    assert result["match"] == (None, None) and result["seconds"] < 1.0
+
+
+def test_long_poll_times_out_without_a_match():
+    _, channel_id, _, _ = lb.join_match("poll")
+    assert lb.wait_for_match(channel_id, 0.2) == (None, None)
@@ -0,0 +1,49 @@
+import threading
+import time
+
+import database as db
+from defs import Team
+from scheduler import PhaseScheduler
+
+
+def test_deadlines_fire_in_deadline_order_after_the_grace():
+    fired = []
+    done = threading.Event()
+    phases = PhaseScheduler(grace=0.05)
+
+    def handler(room_id, token):
+        fired.append((room_id, time.time()))
+        if len(fired) == 3:
+            done.set()
+    phases.handler = handler
+    now = time.time()
+    phases.schedule("late", now + 0.3, ("late",))
+    phases.schedule("early", now + 0.1, ("early",))
+    phases.schedule("middle", now + 0.2, ("middle",))
+    assert done.wait(5)
+    assert [room_id for room_id, _ in fired] == ["early", "middle", "late"]
+    assert fired[0][1] >= now + 0.1 + 0.05
+    assert phases.pending() == 0
+
+
+def test_nothing_is_scheduled_without_a_handler():
+    phases = PhaseScheduler()
+    phases.schedule("r", time.time(), ())
+    assert phases.pending() == 0
+
+
+def test_guess_deadline_submits_the_missing_teams_once():
+    import app as game
+    db.init_room("late")
+    db.set_team_coord(Team.BLUE, (0.2, 0.3), "late")
+    db.set_team_answered(Team.BLUE, True, "late")
+    token = db.get_phase_token("late")
+
+    game.on_phase_deadline("late", token)
+    snap = db.get_snapshot("late")
+    assert snap.answer_revealed
+    assert db.get_room("late").team_coord[Team.RED.slot] == game.default_guess
+    assert db.get_room("late").team_coord[Team.BLUE.slot] == (0.2, 0.3)
+    # the room moved on: the same deadline coming due again changes nothing
+    assert db.get_phase_token("late") != token
+    assert not db.expire_guess_phase(token, (0.5, 0.5), "late")
@@ -0,0 +1,109 @@
+import json
+import shutil
+
+import pytest
+
+import app as game
+import catalogue as catalogue_mod
+import codec
+import database as db
+from defs import Team, max_hp
+
+
+def reveal(room_id: str) -> None:
+    for team, coord in ((Team.BLUE, (0.2, 0.2)), (Team.RED, (0.8, 0.8))):
+        db.set_team_coord(team, coord, room_id)
+        db.set_team_answered(team, True, room_id)
+
+
+def new_room(room_id: str) -> str:
+    db.init_room(room_id)
+    db.reset_round_status(room_id)
+    return room_id
+
+
+def test_reveal_applies_damage_once():
+    room_id = new_room("dmg")
+    reveal(room_id)
+    first, etag = game.build_state(room_id, "blue")
+    again, etag_again = game.build_state(room_id, "red")
+    assert first["hp"] == again["hp"]
+    assert first["hp"]["blue"] == max_hp - first["damage"]["blue"]
+    assert etag.split(".")[:2] == etag_again.split(".")[:2]
+    assert etag == game.state_etag(room_id, "blue")
+
+
+def test_body_and_etag_come_from_the_same_snapshot(monkeypatch):
+    room_id = new_room("race")
+    reveal(room_id)
+    real = db.apply_round_damage
+
+    def advance_in_between(round_number, damage, room_id):
+        # another request applies this round and moves the room on before we get the lock
+        real(round_number, damage, room_id)
+        db.advance_round(round_number - 1, room_id)
+        return real(round_number, damage, room_id)
+
+    monkeypatch.setattr(db, "apply_round_damage", advance_in_between)
+    state, etag = game.build_state(room_id, "blue")
+    assert etag == game.state_etag(room_id, "blue")
+    assert state["round"] == 2 and not state["answer_revealed"]
+    assert "damage" not in state
+    # the stale caller did not charge round 1's damage to round 2
+    assert db.get_room(room_id).last_damage_applied_round is None
+
+
+def test_not_modified_after_a_state_read():
+    room_id = new_room("etag")
+    client = game.app.test_client()
+    resp = client.get(f"/api/state?room={room_id}&team=blue")
+    assert resp.status_code == 200
+    again = client.get(f"/api/state?room={room_id}&team=blue", headers={"If-None-Match": resp.headers["ETag"]})
+    assert again.status_code == 304
+    db.set_team_coord(Team.BLUE, (0.5, 0.5), room_id)
+    assert client.get(f"/api/state?room={room_id}&team=blue", headers={"If-None-Match": resp.headers["ETag"]}).status_code == 200
+
+
+def uncached_state(room_id: str, team_value: str) -> dict:
+    # the whole view with the static part rebuilt instead of taken from the fragment cache
+    fragment, state, _ = game.build_state_parts(room_id, team_value)
+    snap = db.get_snapshot(room_id)
+    rebuilt = game.static_fragment.__wrapped__(snap.catalogue_version, snap.question_id, snap.dmg_mult, game.DEBUG_MODE)
+    return json.loads(codec.dumps({**rebuilt.fields, **state}))
+
+
+@pytest.mark.parametrize("revealed", [False, True])
+def test_spliced_state_equals_the_uncached_build(revealed):
+    room_id = new_room("splice")
+    if revealed:
+        reveal(room_id)
+    client = game.app.test_client()
+    client.get(f"/api/state?room={room_id}&team=blue")  # fill the fragment cache
+    body = client.get(f"/api/state?room={room_id}&team=blue").get_json()
+    expected = uncached_state(room_id, "blue")
+    body.pop("phase_remaining_seconds"), expected.pop("phase_remaining_seconds")
+    assert body == expected
+
+
+def test_a_catalogue_reload_gives_new_fragments(tmp_path):
+    room_id = new_room("pinned")
+    snap = db.get_snapshot(room_id)
+    before = game.static_fragment(snap.catalogue_version, snap.question_id, snap.dmg_mult, False)
+
+    # same question id, new comment
+    loc, que = tmp_path / "locations.csv", tmp_path / "questions.csv"
+    shutil.copy(catalogue_mod.loc_sheet_path, loc)
+    rows = []
+    for line in open(catalogue_mod.que_sheet_path, encoding="utf-8-sig").read().splitlines():
+        fields = line.split(",")
+        if fields[0] == str(snap.question_id):
+            line = ",".join(fields[:4] + ["edited"])
+        rows.append(line + "\n")
+    que.write_text("".join(rows), encoding="utf-8")
+    new, _ = catalogue_mod.reload_catalogue(db.catalogue, str(loc), str(que), path=None)
+    db.install_catalogue(new)
+
+    after = game.static_fragment(new.content_hash, snap.question_id, snap.dmg_mult, False)
+    assert after.fields["question_comment"] == "edited" != before.fields["question_comment"]
+    # the running room still renders its pinned version
+    assert game.build_state(room_id, "blue")[0]["question_comment"] == before.fields["question_comment"]
@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+import store
+
+
+class Counter():
+    # minimal stored object: the memory store locks on `lock`, the SQLite store pickles it
+
+    def __init__(self):
+        self.n = 0
+        self.lock = threading.RLock()
+
+    def __getstate__(self):
+        return {"n": self.n}
+
+    def __setstate__(self, state):
+        self.n = state["n"]
+        self.lock = threading.RLock()
+
+
+class Lobby():
+
+    def __init__(self):
+        self.waiting = []
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def url(request, tmp_path):
+    return "memory" if request.param == "memory" else f"sqlite:///{tmp_path / 'rooms.db'}"
+
+
+def test_room_store_basics(url):
+    rooms = store.open_room_store(url)
+    rooms.setdefault("a", Counter())
+    with rooms.transaction("a") as room:
+        room.n = 5
+    assert rooms.setdefault("a", Counter()).n == 5  # never replaces a stored room
+    assert "a" in rooms and rooms.ids() == ["a"]
+    assert rooms.pop("a").n == 5
+    assert "a" not in rooms and len(rooms) == 0
+    with pytest.raises(KeyError):
+        with rooms.transaction("a"):
+            pass
+
+
+def test_room_transactions_do_not_lose_updates(url):
+    rooms = store.open_room_store(url)
+    rooms.setdefault("a", Counter())
+
+    def bump():
+        for _ in range(50):
+            with rooms.transaction("a") as room:
+                room.n += 1
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert rooms["a"].n == 200
+
+
+def test_sqlite_rooms_are_shared_and_roll_back(tmp_path):
+    url = f"sqlite:///{tmp_path / 'rooms.db'}"
+    rooms, other_worker = store.open_room_store(url), store.open_room_store(url)
+    rooms.setdefault("a", Counter())
+    with rooms.transaction("a") as room:
+        room.n = 1
+        with rooms.transaction("a") as nested:  # re-entrant: same object, written back once
+            assert nested is room
+    assert other_worker["a"].n == 1
+    with pytest.raises(ValueError):
+        with rooms.transaction("a") as room:
+            room.n = 2
+            raise ValueError
+    assert other_worker["a"].n == 1
+
+
+def test_lobby_shards_are_independent(url):
+    lobby = store.open_lobby_store(Lobby, url, shards=4)
+    shard = lobby.shard_for("some room")
+    assert shard == lobby.shard_for("some room") and 1 <= shard < 4
+    assert lobby.shard_for(None) == 0
+    # shard 0 first, then a room shard: the only nesting order the lobby uses
+    with lobby.transaction(0) as queue:
+        queue.waiting.append("p1")
+        with lobby.transaction(shard) as room:
+            room.waiting.append("p2")
+    with lobby.transaction(0) as queue, lobby.transaction(shard) as room:
+        assert queue.waiting == ["p1"] and room.waiting == ["p2"]
@@ -0,0 +1,27 @@
+import threading
+
+import lockstats
+import metrics
+
+
+def test_counts_from_finished_threads_are_kept():
+    name = "ggg_http_requests_total"
+    before = metrics._tables.merged().counters.get((name, ()), 0)
+    threads = [threading.Thread(target=metrics.inc, args=(name,)) for _ in range(2 * metrics.fold_every + 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics._tables.merged().counters[(name, ())] == before + len(threads)
+    assert len(metrics._tables._registry) <= 1  # finished threads were folded away
+
+
+def test_lockstats_reset_clears_every_thread(monkeypatch):
+    monkeypatch.setattr(lockstats, "enabled", True)
+    thread = threading.Thread(target=lockstats.record, args=("room", "r1", "f", 0.01, 0.02))
+    thread.start()
+    thread.join()
+    lockstats.record("room", "r2", "f", 0.01, 0.02)
+    assert {row["name"] for row in lockstats.report()["locks"]["room"]["by_lock"]} == {"r1", "r2"}
+    lockstats.reset()
+    assert lockstats.report()["locks"] == {}
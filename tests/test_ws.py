@@ -0,0 +1,66 @@
+import json
+import threading
+
+import app as game
+import database as db
+from defs import Team
+from events import hub
+
+
+class FakeSocket():
+
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def send(self, data: str) -> None:
+        with self._cond:
+            self.sent.append(json.loads(data))
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        self.closed = True
+
+    def wait_for(self, count: int) -> list:
+        with self._cond:
+            assert self._cond.wait_for(lambda: len(self.sent) >= count, timeout=5)
+            return self.sent
+
+
+def test_state_then_deltas_over_one_sender():
+    db.init_room("ws")
+    ws = FakeSocket()
+    sub = hub.subscribe("ws", "blue")
+    sender = threading.Thread(target=game.ws_sender, args=(ws, sub, "ws", "blue"))
+    sender.start()
+
+    hub.send(sub, ("sync", None))
+    first = ws.wait_for(1)[0]
+    assert first["type"] == "state" and first["state"]["round"] == 1
+
+    assert game.ws_apply("ws", Team.BLUE, {"op": "place_guess", "lat": 0.3, "lon": 0.4}) is None
+    hub.send(sub, ("sync", 7))
+    delta = ws.wait_for(2)[1]
+    assert delta["type"] == "delta" and delta["seq"] == 7
+    assert delta["etag"] != first["etag"] and delta["set"]
+
+    hub.send(sub, ("error", 8, "Unknown op"))
+    assert ws.wait_for(3)[2] == {"type": "error", "seq": 8, "error": "Unknown op"}
+
+    hub.disconnect(sub)
+    sender.join(timeout=5)
+    assert ws.closed and hub.subscriber_count("ws") == 0
+
+
+def test_invalid_actions_are_rejected():
+    db.init_room("ws")
+    assert game.ws_apply("ws", Team.BLUE, {"op": "dance"}) == "Unknown op"
+    assert game.ws_apply("ws", None, {"op": "submit"}) == "Missing team"
+    assert game.ws_apply("ws", Team.RED, {"op": "place_guess", "lat": "north"}) == "Invalid coordinates"
+    assert game.ws_apply("ws", Team.RED, {"op": "sync"}) is None
+
+
+def test_state_delta():
+    assert game.state_delta({"a": 1, "b": 2}, {"a": 1, "b": 3, "c": 4}) == ({"b": 3, "c": 4}, [])
+    assert game.state_delta({"a": 1, "gone": 0}, {"a": 1}) == ({}, ["gone"])
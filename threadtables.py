@@ -0,0 +1,70 @@
+import threading
+from typing import Callable, Generic, List, Optional, TypeVar
+
+# Per-thread tables merged on read, shared by metrics.py and lockstats.py.
+#
+# Hot paths write only to their own thread's table (a threading.local, no lock taken); a reader
+# merges every thread's table. The threaded server runs each request on a fresh thread, so the
+# tables of finished threads are folded into one `retired` table (on every read, and every
+# `fold_every` registrations) to keep the registry small. A finished thread never writes again,
+# so reading its table without a lock is safe.
+#
+# A table is any object with a `thread` attribute, `merge_into(other)` (add its contents into
+# `other`) and `clear()`.
+
+T = TypeVar("T")
+
+
+class ThreadTables(Generic[T]):
+
+    def __init__(self, factory: Callable[[Optional[threading.Thread]], T], fold_every: int = 256,
+                 after_fold: Optional[Callable[[T], None]] = None):
+        self._factory = factory
+        self._fold_every = fold_every
+        # called with the retired table after each fold (e.g. to bound its size)
+        self._after_fold = after_fold
+        self._local = threading.local()
+        self._registry: List[T] = []
+        self._lock = threading.Lock()
+        self._registrations = 0
+        self._retired = factory(None)
+
+    def mine(self) -> T:
+        table = getattr(self._local, "table", None)
+        if table is None:
+            table = self._local.table = self._factory(threading.current_thread())
+            with self._lock:
+                self._registry.append(table)
+                self._registrations += 1
+                if self._registrations % self._fold_every == 0:
+                    self._fold_finished()
+        return table
+
+    def _fold_finished(self) -> None:
+        # caller holds self._lock
+        alive = []
+        for table in self._registry:
+            if table.thread.is_alive():
+                alive.append(table)
+            else:
+                table.merge_into(self._retired)
+        self._registry[:] = alive
+        if self._after_fold is not None:
+            self._after_fold(self._retired)
+
+    def merged(self) -> T:
+        # a fresh table holding everything recorded so far
+        merged = self._factory(None)
+        with self._lock:
+            self._fold_finished()
+            self._retired.merge_into(merged)
+            tables = list(self._registry)
+        for table in tables:
+            table.merge_into(merged)
+        return merged
+
+    def clear(self) -> None:
+        with self._lock:
+            for table in self._registry:
+                table.clear()
+            self._retired = self._factory(None)
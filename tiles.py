@@ -0,0 +1,131 @@
+import json
+import math
+import os
+import shutil
+from typing import Dict, Optional, Tuple
+
+from flask import Response
+
+import assets
+
+# Multi-resolution tile pyramid (XYZ layout) for large map images.
+#
+# `python tiles.py` cuts static/media/ref_map.jpg into 256px JPEG tiles:
+#   static/tiles/<map>/<version>/<z>/<x>_<y>.jpg   z = 0 (whole map in one tile) .. max_zoom (full size)
+#   static/tiles/<map>/meta.json                   current version, source size, tile size, max_zoom
+# <version> is the source image digest, so tile URLs are immutable. Tiles only cover the map; the
+# game's normalized [0, 1] coordinates (lat = y / height, lon = x / width) are unaffected.
+
+tile_dir = "tiles"  # relative to static/
+tile_size = 256
+tile_quality = 85
+
+# map name -> source image, relative to static/
+tiled_maps = {
+    "ref_map": "media/ref_map.jpg",
+}
+
+# map name -> (meta.json mtime, meta)
+_meta_cache: Dict[str, Tuple[float, dict]] = {}
+
+
+def meta_path(map_name: str) -> str:
+    return os.path.join(assets.static_dir, tile_dir, map_name, "meta.json")
+
+
+def load_meta(map_name: str) -> Optional[dict]:
+    path = meta_path(map_name)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    cached = _meta_cache.get(map_name)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    _meta_cache[map_name] = (mtime, meta)
+    return meta
+
+
+def build_tiles(map_name: str, force: bool = False) -> dict:
+    # Pillow is only needed for this build step, not for serving
+    from PIL import Image
+
+    source = os.path.join(assets.static_dir, tiled_maps[map_name])
+    version = assets.file_digest(source)[:assets.digest_length]
+    previous = load_meta(map_name)
+    out_root = os.path.join(assets.static_dir, tile_dir, map_name)
+    if not force and previous and previous.get("version") == version and os.path.isdir(os.path.join(out_root, version)):
+        return previous
+
+    with Image.open(source) as img:
+        img.load()
+        img = img.convert("RGB")
+        width, height = img.size
+        max_zoom = max(0, math.ceil(math.log2(max(width, height) / tile_size)))
+        for z in range(max_zoom + 1):
+            scale = 2 ** (z - max_zoom)
+            level = img if z == max_zoom else img.resize(
+                (max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+            cols = math.ceil(level.width / tile_size)
+            rows = math.ceil(level.height / tile_size)
+            level_dir = os.path.join(out_root, version, str(z))
+            os.makedirs(level_dir, exist_ok=True)
+            for x in range(cols):
+                for y in range(rows):
+                    box = (x * tile_size, y * tile_size,
+                           min((x + 1) * tile_size, level.width), min((y + 1) * tile_size, level.height))
+                    level.crop(box).save(os.path.join(level_dir, f"{x}_{y}.jpg"),
+                                         format="JPEG", quality=tile_quality, optimize=True, progressive=True)
+            print(f"[INFO] {map_name} z={z}: {level.width}x{level.height}, {cols * rows} tiles")
+
+    meta = {"version": version, "width": width, "height": height, "tile_size": tile_size, "max_zoom": max_zoom,
+            "url": f"/tiles/{map_name}/{version}/{{z}}/{{x}}_{{y}}.jpg"}
+    with open(meta_path(map_name), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+
+    # drop pyramids of previous source versions
+    for name in os.listdir(out_root):
+        if name != version and os.path.isdir(os.path.join(out_root, name)):
+            shutil.rmtree(os.path.join(out_root, name))
+    return meta
+
+
+def send_meta(map_name: str) -> Response:
+    meta = load_meta(map_name) if map_name in tiled_maps else None
+    if meta is None:
+        return Response(json.dumps({"error": "No tiles built"}), status=404, mimetype="application/json")
+    resp = Response(json.dumps(meta), mimetype="application/json")
+    # small and changes when tiles are rebuilt: revalidate every time
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.set_etag(meta["version"])
+    return resp
+
+
+def send_tile(map_name: str, version: str, z: int, name: str) -> Response:
+    if map_name not in tiled_maps or "/" in version or "\\" in version or "/" in name or "\\" in name:
+        return Response("Not Found", status=404)
+    path = os.path.join(assets.static_dir, tile_dir, map_name, version, str(z), name)
+    if not os.path.isfile(path):
+        return Response("Not Found", status=404)
+    # the version segment is the source digest, so a tile URL never changes content
+    return assets.send_immutable(path, f"{version}-{z}-{os.path.splitext(name)[0]}")
+
+
+def parse_args():
+    import argparse
+    parser = argparse.ArgumentParser(description="Cut map images into a multi-resolution tile pyramid.")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rebuild even if the source image is unchanged.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    for map_name in tiled_maps:
+        meta = build_tiles(map_name, force=args.force)
+        print(f"{map_name}: {meta['width']}x{meta['height']}, zoom 0..{meta['max_zoom']}, version {meta['version']}")